@@ -136,11 +136,8 @@ export async function* askQuestionStream(
 export type DeleteResponse = {
   success: boolean;
   message: string;
-  deleted_from: {
-    supabase: boolean;
-    qdrant: boolean;
-    neo4j: boolean;
-  };
+  status: string;
+  job_id: string;
 };
 
 export async function deleteRepository(
@@ -1,8 +1,8 @@
 import os
-from supabase import create_client, Client
+from supabase import create_client, Client, acreate_client, AsyncClient
 import voyageai
-from qdrant_client import QdrantClient
-from neo4j import GraphDatabase
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,4 +24,126 @@ neo4j_driver = GraphDatabase.driver(
     auth=("neo4j", os.getenv("NEO4J_PASSWORD"))
 )
 
-github_token = os.getenv("GITHUB_TOKEN", "")
\ No newline at end of file
+# Async clients for the request path (/api/ask), so a question never blocks the event loop
+async_vo = voyageai.AsyncClient(api_key=os.getenv("VOYAGE_API_KEY"))
+
+async_qdrant = AsyncQdrantClient(
+    url=os.getenv("QDRANT_URL"),
+    api_key=os.getenv("QDRANT_API_KEY")
+)
+
+async_neo4j_driver = AsyncGraphDatabase.driver(
+    os.getenv("NEO4J_URI"),
+    auth=("neo4j", os.getenv("NEO4J_PASSWORD"))
+)
+
+_async_supabase: AsyncClient | None = None
+
+async def get_async_supabase() -> AsyncClient:
+    # acreate_client is a coroutine, so the async client is created on first use
+    global _async_supabase
+    if _async_supabase is None:
+        _async_supabase = await acreate_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        )
+    return _async_supabase
+
+github_token = os.getenv("GITHUB_TOKEN", "")
+
+# Rows per UNWIND statement / pending rows before GraphWriter flushes
+graph_batch_size = int(os.getenv("GRAPH_BATCH_SIZE", "1000"))
+
+# Repo deletion: Neo4j nodes per transaction, and per job progress update
+graph_delete_batch_size = int(os.getenv("GRAPH_DELETE_BATCH_SIZE", "5000"))
+graph_delete_chunk_size = int(os.getenv("GRAPH_DELETE_CHUNK_SIZE", "50000"))
+
+# Embedding requests: texts and estimated tokens per request, requests in flight
+embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+embed_batch_tokens = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# Max vectors kept in the shared embedding cache (about 6 KB each), 0 disables it
+embed_cache_max_entries = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# Syntax-aware chunking: merge small symbols up to the target, split anything over the max
+chunk_target_chars = int(os.getenv("CHUNK_TARGET_CHARS", "1000"))
+chunk_max_chars = int(os.getenv("CHUNK_MAX_CHARS", "2000"))
+
+# Cached clones under DATA_DIR/git_mirrors: total size before least recently used
+# clones are evicted, and the partial-clone filter (empty for full clones)
+git_mirror_max_bytes = int(os.getenv("GIT_MIRROR_MAX_BYTES", str(20 * 1024 ** 3)))
+git_mirror_filter = os.getenv("GIT_MIRROR_FILTER", "blob:none")
+
+# Files larger than this (bytes) are not indexed
+scan_max_file_bytes = int(os.getenv("SCAN_MAX_FILE_BYTES", "1000000"))
+
+# Ingestion pipeline: bounded queue length per stage and workers per stage
+ingest_queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+ingest_read_concurrency = int(os.getenv("INGEST_READ_CONCURRENCY", "4"))
+ingest_upsert_concurrency = int(os.getenv("INGEST_UPSERT_CONCURRENCY", "2"))
+
+# Job queue: worker processes, running jobs across all workers, attempts per job,
+# seconds between polls/heartbeats and before a silent worker's job is reclaimed
+job_workers = int(os.getenv("JOB_WORKERS", "2"))
+job_max_running = int(os.getenv("JOB_MAX_RUNNING", "2"))
+job_max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+job_poll_seconds = float(os.getenv("JOB_POLL_SECONDS", "2"))
+job_heartbeat_seconds = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+job_lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+# /api/ask caches for query embeddings and retrieval results; 0 disables them
+ask_cache_max_entries = int(os.getenv("ASK_CACHE_MAX_ENTRIES", "1024"))
+ask_cache_ttl_seconds = float(os.getenv("ASK_CACHE_TTL_SECONDS", "600"))
+
+# Semantic /api/ask cache: questions kept per repo (0 disables), repos kept
+# (least recently asked about are dropped first) and the cosine similarity at
+# which a new question reuses a stored question's results
+semantic_cache_max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+semantic_cache_max_repos = int(os.getenv("SEMANTIC_CACHE_MAX_REPOS", "64"))
+semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+# Cached rows from the Supabase repos table
+repo_cache_ttl_seconds = float(os.getenv("REPO_CACHE_TTL_SECONDS", "15"))
+repo_cache_max_entries = int(os.getenv("REPO_CACHE_MAX_ENTRIES", "4096"))
+
+# Per-step /api/ask timeouts (seconds); a slow graph expansion is skipped, not fatal
+ask_repo_timeout = float(os.getenv("ASK_REPO_TIMEOUT", "5"))
+ask_embed_timeout = float(os.getenv("ASK_EMBED_TIMEOUT", "10"))
+ask_search_timeout = float(os.getenv("ASK_SEARCH_TIMEOUT", "10"))
+ask_graph_timeout = float(os.getenv("ASK_GRAPH_TIMEOUT", "5"))
+
+# Hybrid /api/ask retrieval: candidates taken from Qdrant and from the lexical
+# index, the reciprocal-rank-fusion constant, and how many fused hits are kept
+ask_vector_limit = int(os.getenv("ASK_VECTOR_LIMIT", "20"))
+ask_lexical_limit = int(os.getenv("ASK_LEXICAL_LIMIT", "20"))
+ask_rrf_k = int(os.getenv("ASK_RRF_K", "60"))
+ask_top_k = int(os.getenv("ASK_TOP_K", "6"))
+
+# Token budget for the code context packed into the /api/ask prompt
+ask_context_tokens = int(os.getenv("ASK_CONTEXT_TOKENS", "6000"))
+
+# Rows each ranked graph expansion query (defines, calls, callers) may return
+ask_graph_limit = int(os.getenv("ASK_GRAPH_LIMIT", "20"))
+
+# Adjacency snapshots kept memory-mapped in the API process (least recently used dropped)
+graph_snapshot_max_loaded = int(os.getenv("GRAPH_SNAPSHOT_MAX_LOADED", "64"))
+
+# Qdrant collection profile for new collections: small, large or archive (see
+# app/utils/collection_profiles.py). Changing it rebuilds a repo's collection on its next analysis.
+qdrant_collection_profile = os.getenv("QDRANT_COLLECTION_PROFILE", "small")
+
+# "per_repo" (a repo_<id> collection each) or "shared" (one collection for all
+# repos, partitioned by a tenant-indexed repo_id); see migrate_collections.py
+qdrant_storage_mode = os.getenv("QDRANT_STORAGE_MODE", "per_repo")
+qdrant_shared_collection = os.getenv("QDRANT_SHARED_COLLECTION", "repos_shared")
+
+# Local state (manifests, caches, indexes) lives under this directory
+data_dir = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+# Prometheus metrics at /api/metrics; METRICS_ENABLED=0 makes all instrumentation a no-op.
+# API and worker processes share samples through files in METRICS_DIR (clear it on redeploy).
+# TRACING_ENABLED=1 also records a span per ingest stage and /ask step (OpenTelemetry if installed, else logs)
+metrics_enabled = os.getenv("METRICS_ENABLED", "1") != "0"
+metrics_dir = os.getenv("METRICS_DIR", os.path.join(data_dir, "metrics"))
+tracing_enabled = os.getenv("TRACING_ENABLED", "0") == "1"
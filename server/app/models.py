@@ -6,12 +6,29 @@ from typing import Optional
 # This is what Next.js will send
 class AnalyzeRequest(BaseModel):
     repo_id: UUID          
+    priority: int = 0      # higher runs first in the job queue
     # github_url and branch are already stored in Supabase row
 
 class AnalyzeResponse(BaseModel):
     repo_id: UUID
     status: str = "queued"
     message: str = "Ingestion started in background"
+    job_id: Optional[str] = None
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    repo_id: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    error: Optional[str] = None
+    progress: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 # For chat
 class AskRequest(BaseModel):
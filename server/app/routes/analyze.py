@@ -1,7 +1,7 @@
 # backend/app/routes/analyze.py
 from fastapi import APIRouter, HTTPException
-from app.config import supabase
-from app.services.ingestion import ingest_repo
+from app.services.repo_cache import repo_cache
+from app.services.jobs import job_queue
 from app.models import AnalyzeRequest, AnalyzeResponse
 import asyncio
 import logging
@@ -9,45 +9,24 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Store background tasks to prevent garbage collection and retrieve exceptions
-background_tasks = set()
-
-
-def task_done_callback(task: asyncio.Task) -> None:
-    """
-    Callback to handle completed background tasks and log any exceptions.
-    """
-    background_tasks.discard(task)
-    try:
-        # Retrieve the result to check for exceptions
-        task.result()
-    except Exception as e:
-        logger.error(f"Background task failed with exception: {e}", exc_info=True)
-
 
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def start_analysis(payload: AnalyzeRequest):
     repo_id = payload.repo_id
 
-    # Debug: Log the repo_id being searched
-    logger.info(f"Searching for repo_id: {repo_id} (type: {type(repo_id)})")
-    logger.info(f"String version: {str(repo_id)}")
-
-    # First, let's see what's in the repos table
-    all_repos = supabase.table("repos").select("*").execute()
-    logger.info(f"All repos in database: {all_repos.data}")
-
-    repo = supabase.table("repos").select("id").eq("id", str(repo_id)).execute()
-    logger.info(f"Query result: {repo.data}")
-
-    if not repo.data:
+    repo = await asyncio.to_thread(repo_cache.get_sync, str(repo_id))
+    if repo is None:
         raise HTTPException(404, f"Repo not found. Searched for: {str(repo_id)}")
+    if repo.get("status") == "deleting":
+        raise HTTPException(409, "Repo is being deleted")
 
-    supabase.table("repos").update({"status": "cloning"}).eq("id", str(repo_id)).execute()
+    # A ready repo stays queryable while it is re-indexed; progress is on its
+    # job (GET /api/repos/{repo_id}/job)
+    if repo.get("status") != "ready":
+        await asyncio.to_thread(repo_cache.update, str(repo_id), {"status": "cloning"})
 
-    # Create background task with proper exception handling
-    task = asyncio.create_task(ingest_repo(repo_id))
-    background_tasks.add(task)
-    task.add_done_callback(task_done_callback)
+    # Ingestion runs in the worker pool (python worker.py); the API only enqueues
+    job = await asyncio.to_thread(job_queue.enqueue, "ingest", str(repo_id), payload.priority)
+    logger.info(f"Queued ingest job {job['id']} for repo {repo_id} (status: {job['status']})")
 
-    return AnalyzeResponse(repo_id=repo_id, message="Ingestion started")
+    return AnalyzeResponse(repo_id=repo_id, status=job["status"], job_id=job["id"], message="Ingestion queued")
@@ -1,57 +1,164 @@
 # backend/app/routes/ask.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.config import qdrant, vo, supabase
-from app.services.ingestion import neo4j_driver
+from app.config import (
+    async_qdrant, async_vo, async_neo4j_driver,
+    ask_cache_max_entries, ask_cache_ttl_seconds,
+    ask_repo_timeout, ask_embed_timeout, ask_search_timeout, ask_graph_timeout, ask_graph_limit,
+    ask_vector_limit, ask_lexical_limit, ask_rrf_k, ask_top_k
+)
+from app.services.blob_store import blob_store
+from app.services.cache import TTLCache
+from app.services.graph import EXPANSION_QUERIES, format_expansion
+from app.services.graph_snapshot import graph_snapshots
+from app.services.lexical_index import lexical_index
+from app.services.context_packer import pack_context, format_context
+from app.services.vector import get_collection_profile, query_filter
+from app.utils.collection_profiles import search_params
+from app.services.index_version import get_index_version
+from app.services.semantic_cache import semantic_cache
+from app.services.repo_cache import repo_cache
+from app.services.metrics import ask_step, ASK_STEP_SECONDS, ASK_REQUESTS, ASK_ERRORS
 import google.generativeai as genai
+import asyncio
+import logging
 import os
 import json
+import time
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+EMBED_MODEL = "voyage-code-2"
+
+ANSWER_MODEL = "gemini-2.0-flash-lite"
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "max_output_tokens": 2048,
+}
+
+_answer_model = None
+
+def get_answer_model():
+    """The Gemini model answers are generated with, created once (main.py does it at startup)"""
+    global _answer_model
+    if _answer_model is None:
+        _answer_model = genai.GenerativeModel(ANSWER_MODEL, generation_config=GENERATION_CONFIG)
+    return _answer_model
+
+query_embedding_cache = TTLCache("query_embedding", ask_cache_max_entries, ask_cache_ttl_seconds)
+retrieval_cache = TTLCache("retrieval", ask_cache_max_entries, ask_cache_ttl_seconds)
+
 class AskRequest(BaseModel):
     repo_id: str
     question: str
 
-@router.post("/ask")
-async def ask_codebase(payload: AskRequest):
-    repo = supabase.table("repos").select("qdrant_collection,status").eq("id", payload.repo_id).single().execute().data
-    if repo["status"] != "ready":
-        raise HTTPException(400, "Repo not ready")
+def point_text(payload: dict) -> str:
+    """Load a hit's text from the blob store (older indexes kept it in the payload)"""
+    if "blob" in payload:
+        return blob_store.read_text(payload["blob"], payload["start_byte"], payload["end_byte"])
+    return payload.get("content", "")
 
-    collection = repo["qdrant_collection"]
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
 
-    # 1. Vector search (reduced from 15 to 10 for faster results)
-    query_emb = vo.embed([payload.question], model="voyage-code-2").embeddings[0]
-    results = qdrant.query_points(collection_name=collection, query=query_emb, limit=10)
-
-    context_chunks = "\n\n".join([f"[File: {point.payload['file_path']}]\n{point.payload['content']}" for point in results.points])
-
-    # 2. Graph expansion (with limit to prevent expensive traversals)
-    files = list({point.payload['file_path'] for point in results.points})
-    with neo4j_driver.session() as session:
-        graph_result = session.run("""
-            MATCH (f:File)-[*0..2]-(related)
-            WHERE f.path IN $files AND f.repo_id = $repo_id
-            RETURN f.path AS path, labels(related) AS labels, related.name AS name
-            LIMIT 50
-        """, files=files, repo_id=payload.repo_id)
-
-        graph_context = "\n".join([f"{r['path']} → {r['labels']} {r['name'] or ''}" for r in graph_result])
-
-    # 3. Gemini 2.0 Flash with streaming
-    model = genai.GenerativeModel(
-        'gemini-2.0-flash-lite',
-        generation_config={
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "max_output_tokens": 2048,
-        }
+async def with_timeout(awaitable, seconds: float, step: str):
+    try:
+        return await asyncio.wait_for(awaitable, timeout=seconds)
+    except asyncio.TimeoutError:
+        logger.warning(f"/ask {step} timed out after {seconds}s")
+        ASK_ERRORS.labels("timeout").inc()
+        raise HTTPException(504, f"Timed out during {step}")
+
+async def embed_query(question: str) -> list[float]:
+    # Embeddings only depend on the text, so they're shared across repos
+    key = (EMBED_MODEL, normalize_question(question))
+    query_emb = query_embedding_cache.get(key)
+    if query_emb is None:
+        with ask_step("embed"):
+            query_emb = (await async_vo.embed([question], model=EMBED_MODEL)).embeddings[0]
+        query_embedding_cache.set(key, query_emb)
+    return query_emb
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int = ask_rrf_k) -> list[dict]:
+    """Merge ranked hit lists by summing 1 / (k + rank) per point id"""
+    fused = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0, "payload": hit["payload"]})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)
+
+async def search_hybrid(repo_id: str, collection: str, question: str, query_emb: list[float]) -> list[dict]:
+    # Vector and lexical (BM25) search run concurrently and are fused by rank
+    vector_results, lexical_hits = await asyncio.gather(
+        async_qdrant.query_points(
+            collection_name=collection, query=query_emb, limit=ask_vector_limit,
+            search_params=search_params(get_collection_profile(repo_id)),
+            query_filter=query_filter(repo_id, collection)
+        ),
+        asyncio.to_thread(lexical_index.search, repo_id, question, ask_lexical_limit),
     )
+    vector_hits = [{"id": str(point.id), "score": point.score, "payload": point.payload} for point in vector_results.points]
+    return reciprocal_rank_fusion([vector_hits, lexical_hits])[:ask_top_k]
+
+async def run_expansion(kind: str, repo_id: str, files: list[str]) -> list[str]:
+    async with async_neo4j_driver.session() as session:
+        result = await session.run(EXPANSION_QUERIES[kind], files=files, repo_id=repo_id, limit=ask_graph_limit)
+        return [format_expansion(kind, r) async for r in result]
+
+async def expand_graph(repo_id: str, version: int, files: list[str]) -> str:
+    # 2. Graph expansion from the repo's adjacency snapshot, or Neo4j if it has none
+    found, snapshot = graph_snapshots.get_loaded(repo_id, version)
+    if not found:
+        # First question since a (re-)index: loading the snapshot reads and parses the file
+        snapshot = await asyncio.to_thread(graph_snapshots.get, repo_id, version)
+    if snapshot is not None:
+        rows = snapshot.expand(files, ask_graph_limit)
+        return "\n".join(format_expansion(kind, r) for kind in EXPANSION_QUERIES for r in rows[kind])
+
+    # Bounded, index-backed queries run concurrently, listed in rank order
+    results = await asyncio.gather(*(run_expansion(kind, repo_id, files) for kind in EXPANSION_QUERIES))
+    return "\n".join(line for lines in results for line in lines)
 
-    prompt = f"""You are a code expert. Answer the user's question directly and concisely.
+async def search_context(repo_id: str, collection: str, question: str, query_emb: list[float]) -> list[dict]:
+    # 1. Hybrid search; only the fused top hits have their text loaded
+    with ask_step("search", repo_id):
+        hits = await with_timeout(search_hybrid(repo_id, collection, question, query_emb), ask_search_timeout, "search")
+    with ask_step("load_text", repo_id):
+        texts = await asyncio.to_thread(lambda: [point_text(hit["payload"]) for hit in hits])
+    return [{**hit, "text": text} for hit, text in zip(hits, texts)]
+
+async def expand_and_cache(repo_id: str, version: int, question: str, query_emb: list[float], hits: list[dict]) -> str:
+    """
+    Graph expansion for the retrieved files, run while the answer's sources
+    are already streaming. The complete retrieval is then cached per (repo,
+    index version, normalized question), so a re-index or delete invalidates
+    it; near-duplicate questions are matched by embedding.
+    """
+    files = list({hit["payload"]['file_path'] for hit in hits})
+    try:
+        with ask_step("graph", repo_id):
+            graph_context = await asyncio.wait_for(expand_graph(repo_id, version, files), timeout=ask_graph_timeout)
+    except asyncio.TimeoutError:
+        # Answer without relationships rather than failing the request; don't cache it
+        logger.warning(f"/ask graph expansion timed out after {ask_graph_timeout}s for repo {repo_id}")
+        return ""
+    except Exception as e:
+        # Neo4j errors degrade the same way; the stream has already started
+        logger.warning(f"/ask graph expansion failed for repo {repo_id}: {e}")
+        return ""
+
+    retrieval = {"hits": hits, "graph_context": graph_context}
+    retrieval_cache.set((repo_id, version, normalize_question(question)), retrieval)
+    semantic_cache.add(repo_id, version, query_emb, retrieval)
+    return graph_context
+
+def build_prompt(question: str, context_chunks: str, graph_context: str) -> str:
+    return f"""You are a code expert. Answer the user's question directly and concisely.
 
 # Code Context
 
@@ -64,7 +171,7 @@ async def ask_codebase(payload: AskRequest):
 Include the most relevant code snippets from the context above that help answer the question. Reference them using `file.ext:line` format.
 
 # Question
-{payload.question}
+{question}
 
 # Instructions
 - Answer directly - get to the point quickly
@@ -77,32 +184,114 @@ Include the most relevant code snippets from the context above that help answer
 
 Answer:"""
 
-    
+@router.get("/ask/cache")
+async def ask_cache_stats():
+    return {
+        "query_embedding": query_embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "repos": repo_cache.stats(),
+    }
+
+@router.post("/ask")
+async def ask_codebase(payload: AskRequest, request: Request):
+    started = time.perf_counter()
+    version = get_index_version(payload.repo_id)
+    key = (payload.repo_id, version, normalize_question(payload.question))
+    retrieval = retrieval_cache.get(key)
+
+    # The repo lookup and the query embedding don't depend on each other
+    embed_task = None
+    if retrieval is None:
+        embed_task = asyncio.create_task(with_timeout(embed_query(payload.question), ask_embed_timeout, "query embedding"))
+    try:
+        with ask_step("repo", payload.repo_id):
+            repo = await with_timeout(repo_cache.get(payload.repo_id), ask_repo_timeout, "repo lookup")
+        if repo is None:
+            raise HTTPException(404, "Repo not found")
+        if repo["status"] != "ready":
+            raise HTTPException(400, "Repo not ready")
+    except BaseException:
+        if embed_task is not None:
+            embed_task.cancel()
+        raise
+
+    collection = repo["qdrant_collection"]
+
+    if retrieval is None:
+        query_emb = await embed_task
+        # Rephrasings of a recent question reuse its results
+        retrieval = semantic_cache.lookup(payload.repo_id, version, query_emb)
+        if retrieval is not None:
+            ASK_REQUESTS.labels("semantic_cache").inc()
+            retrieval_cache.set(key, retrieval)
+    else:
+        ASK_REQUESTS.labels("retrieval_cache").inc()
+
+    graph_task = None
+    if retrieval is not None:
+        hits, graph_context = retrieval["hits"], retrieval["graph_context"]
+    else:
+        ASK_REQUESTS.labels("search").inc()
+        hits = await search_context(payload.repo_id, collection, payload.question, query_emb)
+        # 2. Graph expansion runs while the sources go out
+        graph_task = asyncio.create_task(expand_and_cache(payload.repo_id, version, payload.question, query_emb, hits))
+        graph_context = None
+
+    # Merge overlapping chunks, drop repeated text and cap the prompt size
+    with ask_step("pack", payload.repo_id):
+        sections, context_stats = pack_context(hits)
+        context_chunks = format_context(sections)
+    logger.info(f"/ask context for repo {payload.repo_id}: {context_stats}")
 
     # Streaming generator
     async def generate_stream():
+        chunks = None
         try:
-            sources = [point.payload['file_path'] for point in results.points[:5]]
+            sources = list(dict.fromkeys(section.file_path for section in sections))[:5]
 
             # Send sources first
-            yield json.dumps({"type": "sources", "data": sources}) + "\n"
+            yield json.dumps({"type": "sources", "data": sources, "context": context_stats}) + "\n"
+
+            prompt = build_prompt(payload.question, context_chunks, graph_context if graph_task is None else await graph_task)
 
-            # Stream the answer with timeout handling
-            response = model.generate_content(
-                prompt,
-                stream=True,
-                request_options={"timeout": 60}  # 60 second timeout
-            )
+            # 3. Gemini streams on the event loop, so slow answers don't hold up other requests
+            first_token = True
+            with ask_step("generate", payload.repo_id):
+                response = await get_answer_model().generate_content_async(
+                    prompt,
+                    stream=True,
+                    request_options={"timeout": 60}  # 60 second timeout
+                )
 
-            for chunk in response:
-                if chunk.text:
-                    yield json.dumps({"type": "content", "data": chunk.text}) + "\n"
+                chunks = aiter(response)
+                async for chunk in chunks:
+                    # Stop generating for a client that has gone away
+                    if await request.is_disconnected():
+                        logger.info(f"/ask client disconnected, stopping generation for repo {payload.repo_id}")
+                        ASK_ERRORS.labels("disconnected").inc()
+                        return
+                    if chunk.text:
+                        if first_token:
+                            # Time to first token as the client sees it, from the request's start
+                            ASK_STEP_SECONDS.labels("first_token").observe(time.perf_counter() - started)
+                            first_token = False
+                        yield json.dumps({"type": "content", "data": chunk.text}) + "\n"
 
             # Send completion signal
             yield json.dumps({"type": "done"}) + "\n"
+            ASK_STEP_SECONDS.labels("total").observe(time.perf_counter() - started)
 
         except Exception as e:
+            ASK_ERRORS.labels("generate").inc()
             # Send error to client
             yield json.dumps({"type": "error", "data": str(e)}) + "\n"
 
-    return StreamingResponse(generate_stream(), media_type="application/x-ndjson")
\ No newline at end of file
+        finally:
+            # Also runs when the response is cancelled on disconnect
+            if graph_task is not None and not graph_task.done():
+                graph_task.cancel()
+            if chunks is not None:
+                await chunks.aclose()
+
+    return StreamingResponse(generate_stream(), media_type="application/x-ndjson")
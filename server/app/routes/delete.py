@@ -1,8 +1,9 @@
 # backend/app/routes/delete.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.config import qdrant, supabase
-from app.services.ingestion import neo4j_driver
+from app.services.jobs import job_queue
+from app.services.repo_cache import repo_cache
+import asyncio
 import logging
 
 router = APIRouter()
@@ -10,68 +11,31 @@ logger = logging.getLogger(__name__)
 
 class DeleteRequest(BaseModel):
     repo_id: str
+    priority: int = 0
 
 @router.delete("/delete")
 async def delete_repo(payload: DeleteRequest):
     """
-    Delete a repository and all its associated data from:
-    - Supabase (repos table)
-    - Qdrant (vector embeddings collection)
-    - Neo4j (graph nodes and relationships)
+    Mark a repository "deleting" and queue a background job that removes it
+    from Qdrant, Neo4j, local storage and finally Supabase. Progress is
+    reported by GET /api/jobs/{job_id}.
     """
     try:
-        # 1. Get repo details from Supabase
-        repo = supabase.table("repos").select("*").eq("id", payload.repo_id).single().execute()
-
-        if not repo.data:
+        repo_data = await asyncio.to_thread(repo_cache.get_sync, payload.repo_id)
+        if not repo_data:
             raise HTTPException(404, f"Repo not found with id: {payload.repo_id}")
 
-        repo_data = repo.data
-        collection_name = repo_data.get("qdrant_collection")
-
-        logger.info(f"Deleting repo {payload.repo_id} with collection {collection_name}")
-
-        # 2. Delete from Qdrant (if collection exists)
-        if collection_name:
-            try:
-                qdrant.delete_collection(collection_name=collection_name)
-                logger.info(f"Deleted Qdrant collection: {collection_name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete Qdrant collection {collection_name}: {e}")
-                # Continue even if Qdrant deletion fails
-
-        # 3. Delete from Neo4j (all nodes and relationships for this repo)
-        try:
-            with neo4j_driver.session() as session:
-                result = session.run("""
-                    MATCH (n)
-                    WHERE n.repo_id = $repo_id
-                    DETACH DELETE n
-                    RETURN count(n) as deleted_count
-                """, repo_id=payload.repo_id)
-
-                deleted_count = result.single()["deleted_count"]
-                logger.info(f"Deleted {deleted_count} nodes from Neo4j for repo {payload.repo_id}")
-        except Exception as e:
-            logger.warning(f"Failed to delete from Neo4j: {e}")
-            # Continue even if Neo4j deletion fails
+        await asyncio.to_thread(repo_cache.update, payload.repo_id, {"status": "deleting"})
 
-        # 4. Delete from Supabase (do this last to ensure we have the data if other deletions fail)
-        try:
-            supabase.table("repos").delete().eq("id", payload.repo_id).execute()
-            logger.info(f"Deleted repo {payload.repo_id} from Supabase")
-        except Exception as e:
-            logger.error(f"Failed to delete from Supabase: {e}")
-            raise HTTPException(500, f"Failed to delete repo from database: {str(e)}")
+        # The worker stops any running ingestion of the repo before deleting it
+        job = await asyncio.to_thread(job_queue.enqueue, "delete", payload.repo_id, payload.priority)
+        logger.info(f"Queued delete job {job['id']} for repo {payload.repo_id} (status: {job['status']})")
 
         return {
             "success": True,
-            "message": f"Successfully deleted repo {payload.repo_id} from all databases",
-            "deleted_from": {
-                "supabase": True,
-                "qdrant": bool(collection_name),
-                "neo4j": True
-            }
+            "message": f"Deletion of repo {payload.repo_id} queued",
+            "status": "deleting",
+            "job_id": job["id"],
         }
 
     except HTTPException:
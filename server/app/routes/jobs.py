@@ -0,0 +1,38 @@
+# backend/app/routes/jobs.py
+from fastapi import APIRouter, HTTPException
+from app.services.jobs import job_queue
+from app.models import JobStatus
+import asyncio
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    return JobStatus(**job)
+
+
+@router.get("/repos/{repo_id}/job", response_model=JobStatus)
+async def get_latest_repo_job(repo_id: str):
+    job = await asyncio.to_thread(job_queue.latest_for_repo, repo_id)
+    if job is None:
+        raise HTTPException(404, f"No jobs for repo: {repo_id}")
+    return JobStatus(**job)
+
+
+@router.delete("/jobs/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job. Queued jobs are cancelled immediately; running jobs are
+    flagged and stopped by their worker within one heartbeat.
+    """
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    logger.info(f"Cancel requested for job {job_id} (status: {job['status']})")
+    return JobStatus(**job)
@@ -0,0 +1,18 @@
+# backend/app/routes/metrics.py
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from app.config import metrics_enabled
+from app.services.metrics import render_metrics, CONTENT_TYPE_LATEST
+import asyncio
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint, aggregated over the API and worker processes"""
+    if not metrics_enabled:
+        raise HTTPException(404, "Metrics are disabled")
+    # Reads one file per process that has written samples
+    body = await asyncio.to_thread(render_metrics)
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,169 @@
+# backend/app/services/blob_store.py
+"""
+Local content-addressed blob store for source text.
+
+Qdrant payloads only carry a blob key and a byte range; the file text lives
+here, compressed in independent blocks so a snippet read only decompresses
+the blocks it overlaps. Blob files are read through mmap.
+
+Layout: DATA_DIR/blobs/<key[:2]>/<key>, key = sha256 of the raw bytes.
+Which repos reference which blob is tracked in DATA_DIR/blobs/refs.sqlite3
+so deleting a repo only removes blobs no other repo uses.
+"""
+from app.config import data_dir
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"CIPB"
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+BLOCK_SIZE = 64 * 1024
+
+# magic, codec, block_size, block count, raw length
+HEADER = struct.Struct("<4sBIIQ")
+# compressed offset, compressed length (per block)
+BLOCK_ENTRY = struct.Struct("<QI")
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, "refs.sqlite3"), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS blob_refs (
+                    key TEXT NOT NULL,
+                    repo_id TEXT NOT NULL,
+                    PRIMARY KEY (key, repo_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_repo ON blob_refs (repo_id)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, data: bytes, repo_id: str) -> str:
+        """Store data (if new) and record that repo_id references it"""
+        key = hashlib.sha256(data).hexdigest()
+
+        # Reference first so a concurrent garbage collection can't remove it
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR IGNORE INTO blob_refs (key, repo_id) VALUES (?, ?)", (key, repo_id))
+            conn.commit()
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_encode(data))
+            os.replace(tmp_path, path)
+        return key
+
+    def read(self, key: str, start: int = 0, end: int | None = None) -> bytes:
+        """Return raw bytes [start, end) of a blob, decompressing only the blocks needed"""
+        with open(self.path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, codec, block_size, block_count, raw_length = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"Corrupt blob {key}")
+
+            end = raw_length if end is None else min(end, raw_length)
+            if start >= end:
+                return b""
+
+            first, last = start // block_size, (end - 1) // block_size
+            parts = []
+            for block in range(first, last + 1):
+                offset, length = BLOCK_ENTRY.unpack_from(mm, HEADER.size + block * BLOCK_ENTRY.size)
+                parts.append(_decompress(codec, mm[offset:offset + length]))
+            data = b"".join(parts)
+            base = first * block_size
+            return data[start - base:end - base]
+
+    def read_text(self, key: str, start: int = 0, end: int | None = None) -> str:
+        return self.read(key, start, end).decode("utf-8", errors="ignore")
+
+    def set_repo_refs(self, repo_id: str, keys: set[str]) -> int:
+        """
+        Make keys the complete set of blobs repo_id references, dropping
+        blobs that no repo references any more. Returns blobs removed.
+        """
+        with self._lock:
+            conn = self._connect()
+            current = {row[0] for row in conn.execute("SELECT key FROM blob_refs WHERE repo_id = ?", (repo_id,))}
+            stale = current - set(keys)
+            conn.executemany("DELETE FROM blob_refs WHERE key = ? AND repo_id = ?", [(key, repo_id) for key in stale])
+            conn.commit()
+        return self._collect(stale)
+
+    def release_repo(self, repo_id: str) -> int:
+        """Drop every reference held by repo_id and garbage-collect unused blobs"""
+        return self.set_repo_refs(repo_id, set())
+
+    def _collect(self, keys: set[str]) -> int:
+        removed = 0
+        with self._lock:
+            conn = self._connect()
+            for key in keys:
+                if conn.execute("SELECT 1 FROM blob_refs WHERE key = ? LIMIT 1", (key,)).fetchone():
+                    continue
+                try:
+                    os.remove(self.path(key))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        if removed:
+            logger.info(f"Garbage-collected {removed} blobs")
+        return removed
+
+
+def _encode(data: bytes) -> bytes:
+    codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+    compressor = zstandard.ZstdCompressor(level=3) if codec == CODEC_ZSTD else None
+
+    blocks = []
+    for i in range(0, len(data), BLOCK_SIZE):
+        raw = data[i:i + BLOCK_SIZE]
+        blocks.append(compressor.compress(raw) if compressor else zlib.compress(raw, 6))
+
+    header = HEADER.pack(MAGIC, codec, BLOCK_SIZE, len(blocks), len(data))
+    offset = HEADER.size + BLOCK_ENTRY.size * len(blocks)
+    entries = []
+    for block in blocks:
+        entries.append(BLOCK_ENTRY.pack(offset, len(block)))
+        offset += len(block)
+    return header + b"".join(entries) + b"".join(blocks)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Blob was written with zstandard, which is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+blob_store = BlobStore(os.path.join(data_dir, "blobs"))
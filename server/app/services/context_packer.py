@@ -0,0 +1,143 @@
+# backend/app/services/context_packer.py
+"""
+Packs retrieved hits into the code context of the /api/ask prompt.
+
+Hits are grouped by file. Overlapping or adjacent chunks of a file (window
+chunks overlap, syntax chunks of one region often come back together) are
+merged by byte range into one section, and a full_file hit is dropped when
+chunks of the same file were retrieved, since it only repeats them. Sections
+are then admitted in score order until the token budget is spent; one that
+doesn't fit is cut at a line boundary if enough budget is left.
+
+The prompt lists files in order of their best section and each file's
+sections in source order.
+"""
+from app.config import ask_context_tokens
+from app.services.embedding import estimate_tokens
+from dataclasses import dataclass
+
+# Don't bother adding a truncated section smaller than this
+MIN_SECTION_TOKENS = 100
+CHARS_PER_TOKEN = 3
+
+
+@dataclass
+class Section:
+    file_path: str
+    score: float
+    text: str
+    start_byte: int | None = None
+    end_byte: int | None = None
+    start_line: int | None = None
+    end_line: int | None = None
+
+    @property
+    def data(self) -> bytes:
+        return self.text.encode()
+
+    def header(self) -> str:
+        if self.start_line:
+            return f"[File: {self.file_path}:{self.start_line}-{self.end_line}]"
+        return f"[File: {self.file_path}]"
+
+
+def _merge_file(sections: list[Section]) -> list[Section]:
+    """Merge byte-overlapping or adjacent sections of one file"""
+    ranged = sorted((s for s in sections if s.start_byte is not None), key=lambda s: s.start_byte)
+    merged = []
+    for section in ranged:
+        last = merged[-1] if merged else None
+        if last is None or section.start_byte > last.end_byte:
+            merged.append(section)
+            continue
+        if section.end_byte > last.end_byte:
+            last.text = (last.data + section.data[last.end_byte - section.start_byte:]).decode(errors="ignore")
+            last.end_byte = section.end_byte
+        last.score = max(last.score, section.score)
+        if section.start_line:
+            last.start_line = min(last.start_line or section.start_line, section.start_line)
+            last.end_line = max(last.end_line or section.end_line, section.end_line)
+
+    # Older indexes have no byte ranges; only drop exact repeats there
+    seen = {section.text for section in merged}
+    for section in sections:
+        if section.start_byte is None and section.text not in seen:
+            seen.add(section.text)
+            merged.append(section)
+    return merged
+
+
+def _truncate(section: Section, max_tokens: int) -> Section | None:
+    cut = section.text.rfind("\n", 0, max_tokens * CHARS_PER_TOKEN)
+    if cut <= 0:
+        return None
+    text = section.text[:cut + 1]
+    end_line = section.start_line + text.count("\n") - 1 if section.start_line else None
+    return Section(section.file_path, section.score, text, section.start_byte, None, section.start_line, end_line)
+
+
+def pack_context(hits: list[dict], max_tokens: int = ask_context_tokens) -> tuple[list[Section], dict]:
+    """
+    Return the sections to put in the prompt and stats comparing their size
+    with joining every hit as-is.
+    """
+    by_file = {}
+    for hit in hits:
+        payload = hit["payload"]
+        section = Section(
+            file_path=payload["file_path"],
+            score=hit["score"],
+            text=hit["text"],
+            start_byte=payload.get("start_byte"),
+            end_byte=payload.get("end_byte"),
+            start_line=payload.get("start_line"),
+            end_line=payload.get("end_line"),
+        )
+        by_file.setdefault(section.file_path, {"chunks": [], "full": []})
+        by_file[section.file_path]["full" if payload.get("type") == "full_file" else "chunks"].append(section)
+
+    candidates = []
+    for files in by_file.values():
+        if files["chunks"]:
+            sections = _merge_file(files["chunks"])
+            # The full-file hit repeats these chunks; let it vouch for them instead
+            best_full = max((s.score for s in files["full"]), default=None)
+            if best_full is not None:
+                best = max(sections, key=lambda s: s.score)
+                best.score = max(best.score, best_full)
+        else:
+            sections = _merge_file(files["full"])
+        candidates.extend(sections)
+
+    packed, used = [], 0
+    for section in sorted(candidates, key=lambda s: s.score, reverse=True):
+        tokens = estimate_tokens(section.text)
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used
+            section = _truncate(section, remaining) if remaining >= MIN_SECTION_TOKENS else None
+            if section is None:
+                continue
+            tokens = estimate_tokens(section.text)
+        packed.append(section)
+        used += tokens
+
+    # Files in order of their best section, sections in source order
+    file_rank = {}
+    for section in packed:
+        file_rank.setdefault(section.file_path, len(file_rank))
+    packed.sort(key=lambda s: (file_rank[s.file_path], s.start_byte if s.start_byte is not None else 0))
+
+    raw_tokens = sum(estimate_tokens(hit["text"]) for hit in hits)
+    stats = {
+        "hits": len(hits),
+        "sections": len(packed),
+        "raw_tokens": raw_tokens,
+        "packed_tokens": used,
+        "saved_tokens": raw_tokens - used,
+        "budget": max_tokens,
+    }
+    return packed, stats
+
+
+def format_context(sections: list[Section]) -> str:
+    return "\n\n".join(f"{section.header()}\n{section.text}" for section in sections)
@@ -0,0 +1,102 @@
+# backend/app/services/deletion.py
+"""
+Background repo deletion, run by the worker pool as a "delete" job.
+
+/api/delete only marks the repo "deleting" and queues the job. The job
+waits for any ingestion of the repo to stop, then removes its vectors, its
+Neo4j nodes label by label in bounded chunks (each committed in batches),
+its local state (indexes, cached clone) and finally the Supabase row. Every step can be repeated,
+so a job picked up again after a crash or retry resumes where it left off.
+"""
+from app.config import qdrant, supabase, neo4j_driver, graph_delete_chunk_size, job_heartbeat_seconds
+from app.services.graph import GRAPH_LABELS, delete_repo_nodes
+from app.services.manifest import delete_manifest
+from app.services.blob_store import blob_store
+from app.services.git_mirror import git_mirrors
+from app.services.graph_snapshot import graph_snapshots
+from app.services.lexical_index import lexical_index
+from app.services.vector import drop_repo_points, delete_collection_profile
+from app.services.index_version import bump_index_version
+from app.services.repo_cache import repo_cache
+from app.services.jobs import job_queue
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def wait_for_ingestion(repo_id: str) -> None:
+    """Ask a running ingestion of the repo to stop and wait until it has"""
+    while True:
+        job = await asyncio.to_thread(job_queue.latest_for_repo, repo_id, "ingest")
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+        await asyncio.to_thread(job_queue.cancel, job["id"])
+        await asyncio.sleep(job_heartbeat_seconds)
+
+
+def mirror_in_use(repo: dict) -> bool:
+    """Whether another repos row points at the same owner/repo as this one"""
+    rows = (
+        supabase.table("repos").select("id")
+        .eq("owner", repo["owner"]).eq("repo", repo["repo"])
+        .limit(2).execute().data
+    )
+    return any(str(row["id"]) != str(repo["id"]) for row in rows)
+
+
+async def delete_repo(repo_id: str, progress: dict) -> None:
+    repo_id = str(repo_id)
+    await wait_for_ingestion(repo_id)
+
+    repo = await asyncio.to_thread(repo_cache.get_sync, repo_id, True)
+    if repo is None:
+        # The row goes last, so the rest was already removed by an earlier attempt
+        logger.info(f"Repo {repo_id} is already deleted")
+        progress["step"] = "done"
+        return
+    # A cancelled ingestion may have overwritten the status
+    await asyncio.to_thread(repo_cache.update, repo_id, {"status": "deleting"})
+
+    try:
+        collection_name = repo.get("qdrant_collection")
+        if collection_name:
+            progress["step"] = "qdrant"
+            await asyncio.to_thread(drop_repo_points, qdrant, repo_id, collection_name)
+            logger.info(f"Deleted Qdrant points of repo {repo_id} from {collection_name}")
+
+        progress["step"] = "neo4j"
+        deleted = progress.setdefault("nodes_deleted", {})
+        for label in GRAPH_LABELS:
+            while True:
+                count = await asyncio.to_thread(delete_repo_nodes, neo4j_driver, repo_id, label, graph_delete_chunk_size)
+                deleted[label] = deleted.get(label, 0) + count
+                if count < graph_delete_chunk_size:
+                    break
+            logger.info(f"Deleted {deleted[label]} {label} nodes of repo {repo_id}")
+
+        # Forget the ingestion manifest and local indexes so a re-added repo is
+        # indexed from scratch, and invalidate cached /api/ask results
+        progress["step"] = "local"
+        delete_manifest(repo_id)
+        graph_snapshots.delete(repo_id)
+        lexical_index.delete(repo_id)
+        delete_collection_profile(repo_id)
+        # The clone is shared by every row (any user's) for the same GitHub repo;
+        # if others remain it stays, and LRU eviction reclaims it once unused
+        if repo.get("owner") and repo.get("repo") and not await asyncio.to_thread(mirror_in_use, repo):
+            await asyncio.to_thread(git_mirrors.remove, f"{repo['owner']}/{repo['repo']}")
+        progress["blobs_removed"] = await asyncio.to_thread(blob_store.release_repo, repo_id)
+        bump_index_version(repo_id)
+
+        # Last, so a failed attempt still has the row to retry from
+        progress["step"] = "supabase"
+        await asyncio.to_thread(lambda: supabase.table("repos").delete().eq("id", repo_id).execute())
+        repo_cache.invalidate(repo_id)
+        progress["step"] = "done"
+        logger.info(f"Deleted repo {repo_id}: {progress}")
+
+    except Exception as e:
+        # Stays "deleting"; the job is retried and /api/delete can queue it again
+        repo_cache.update(repo_id, {"error_message": f"Deletion failed: {e}"[:500]})
+        raise
@@ -0,0 +1,150 @@
+# backend/app/services/embedding.py
+"""
+Voyage embedding helpers.
+
+embed_with_retry() sends a single request with rate-limit backoff.
+EmbeddingBatcher packs chunks from many files into requests bounded by text
+count and estimated tokens, sends several of them concurrently and maps the
+vectors back to the keys the chunks were added with. Texts already in the
+shared embedding cache never reach Voyage.
+"""
+from app.config import vo, embed_batch_size, embed_batch_tokens, embed_concurrency
+from app.services.embedding_cache import EmbeddingCache, embedding_cache
+from app.services.metrics import EMBED_REQUEST_SECONDS, EMBED_TEXTS, EMBED_RETRIES, EMBED_BACKOFF_SECONDS
+from voyageai.error import RateLimitError
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = "voyage-code-2"
+
+
+def embed_with_retry(texts, model=EMBED_MODEL, max_retries=5):
+    """
+    Embed texts with exponential backoff retry logic for rate limits.
+    """
+
+    started = time.perf_counter()
+    for attempt in range(max_retries):
+        try:
+            embeddings = vo.embed(texts, model=model).embeddings
+            EMBED_TEXTS.inc(len(texts))
+            EMBED_REQUEST_SECONDS.labels("ok").observe(time.perf_counter() - started)
+            return embeddings
+        except RateLimitError as e:
+            if attempt == max_retries - 1:
+                logger.error(f"Max retries reached for embedding. Error: {e}")
+                EMBED_REQUEST_SECONDS.labels("rate_limited").observe(time.perf_counter() - started)
+                raise
+
+            # Exponential backoff: 2^attempt seconds (2, 4, 8, 16, 32...)
+            wait_time = 2 ** (attempt + 1)
+            logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds... (attempt {attempt + 1}/{max_retries})")
+            EMBED_RETRIES.inc()
+            EMBED_BACKOFF_SECONDS.inc(wait_time)
+            time.sleep(wait_time)
+        except Exception as e:
+            logger.error(f"Unexpected error during embedding: {e}")
+            EMBED_REQUEST_SECONDS.labels("error").observe(time.perf_counter() - started)
+            raise
+
+    raise Exception("Failed to embed after all retries")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; code averages roughly 3 characters per token"""
+    return len(text) // 3 + 1
+
+
+def plan_batches(texts: list[str], max_texts: int, max_tokens: int) -> list[list[int]]:
+    """
+    Group text indices into requests of at most max_texts texts and
+    max_tokens estimated tokens. A text that alone exceeds the token budget
+    gets a request of its own (Voyage truncates it server-side).
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_texts or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingBatcher:
+    """
+    Collects (key, text) pairs across files and embeds them in token-budgeted
+    batches. flush() returns {key: vector} for everything added since the
+    last flush.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBED_MODEL,
+        max_texts: int = embed_batch_size,
+        max_tokens: int = embed_batch_tokens,
+        concurrency: int = embed_concurrency,
+        cache: EmbeddingCache | None = embedding_cache,
+    ):
+        self.model = model
+        self.max_texts = max(1, max_texts)
+        self.max_tokens = max(1, max_tokens)
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.keys = []
+        self.texts = []
+        self.requests = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self.texts)
+
+    def add(self, key, text: str) -> None:
+        self.keys.append(key)
+        self.texts.append(text)
+
+    async def flush(self) -> dict:
+        if not self.texts:
+            return {}
+
+        keys, texts = self.keys, self.texts
+        self.keys, self.texts = [], []
+
+        cached = [None] * len(texts)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+
+        # Only unique texts that missed the cache are sent to Voyage
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        embedded = {}
+        if missing:
+            batches = plan_batches(missing, self.max_texts, self.max_tokens)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def embed_batch(indices):
+                async with semaphore:
+                    # embed_with_retry is blocking, keep it off the event loop
+                    return await asyncio.to_thread(embed_with_retry, [missing[i] for i in indices], self.model)
+
+            results = await asyncio.gather(*(embed_batch(indices) for indices in batches))
+            self.requests += len(batches)
+
+            for indices, embeddings in zip(batches, results):
+                for i, embedding in zip(indices, embeddings):
+                    embedded[missing[i]] = embedding
+
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put_many, self.model, missing, [embedded[text] for text in missing])
+
+        vectors = {}
+        for key, text, vector in zip(keys, texts, cached):
+            vectors[key] = vector if vector is not None else embedded[text]
+        logger.debug(f"Embedded {len(texts)} texts, {len(missing)} sent to Voyage")
+        return vectors
@@ -0,0 +1,116 @@
+# backend/app/services/embedding_cache.py
+"""
+Content-addressed embedding cache shared by every repo in the deployment.
+
+Vectors are keyed by sha256(model, text) and stored as float32 blobs in a
+local SQLite database, so forks, branches and vendored copies of the same
+code only pay for Voyage once. The cache is capped at a number of entries
+and evicts the least recently used ones first.
+"""
+from app.config import data_dir, embed_cache_max_entries
+from array import array
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Evict a little below the cap so we don't run a DELETE on every insert
+EVICT_SLACK = 0.05
+
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8", errors="ignore")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            # WAL lets several API/worker processes read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """Return the cached vector for each text, or None on a miss"""
+        if not self.enabled or not texts:
+            return [None] * len(texts)
+
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+                conn.commit()
+
+        hits = len(found)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        if not self.enabled or not texts:
+            return
+
+        now = time.time()
+        rows = [(cache_key(model, text), array("f", vector).tobytes(), now) for text, vector in zip(texts, vectors)]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows)
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                evict = count - int(self.max_entries * (1 - EVICT_SLACK))
+                conn.execute("""
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+                    )
+                """, (evict,))
+                logger.info(f"Evicted {evict} embeddings from cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "max_entries": self.max_entries}
+
+
+embedding_cache = EmbeddingCache(os.path.join(data_dir, "embedding_cache.sqlite3"), embed_cache_max_entries)
@@ -0,0 +1,232 @@
+# backend/app/services/git_mirror.py
+"""
+Persistent local clones of analyzed repos, so re-analysis fetches instead of
+cloning from scratch.
+
+Each owner/repo gets one shallow, partial clone (--filter=blob:none where
+the server supports it; blobs of the checked-out tree are fetched in one
+batch at checkout). Re-analysis fetches the branch tip and force-checks it
+out in place, which only rewrites files that changed. Clones are evicted
+least recently used first once their total size exceeds the disk quota.
+
+Layout under DATA_DIR/git_mirrors:
+    <owner>/<repo>/       the clone and its working tree
+    <owner>/<repo>.lock   flock held while a worker uses the clone
+    <owner>/<repo>.json   {"last_access", "bytes"} for eviction
+
+The token is never written to disk: the stored remote URL has no
+credentials and the auth header is passed through git's environment.
+Any git URL works, including file:// for local testing.
+"""
+from app.config import data_dir, git_mirror_max_bytes, git_mirror_filter
+from app.services.metrics import INGEST_STAGE_SECONDS
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+import asyncio
+import base64
+import fcntl
+import git
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+# GitHub's rules: owners are alphanumeric with single inner hyphens, repo names
+# [A-Za-z0-9._-]. "." and ".." are never valid, so keys can't leave the root.
+OWNER_NAME = re.compile(r"[A-Za-z0-9](?:-?[A-Za-z0-9]){0,38}")
+REPO_NAME = re.compile(r"[A-Za-z0-9._-]{1,100}")
+
+
+def _auth_env(token: str) -> dict:
+    if not token:
+        return {}
+    credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+    return {
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraHeader",
+        "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+        "GIT_TERMINAL_PROMPT": "0",
+    }
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class GitMirrorCache:
+    def __init__(self, root: str, max_bytes: int, blob_filter: str = ""):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_filter = blob_filter
+
+    def path(self, key: str) -> str:
+        """Clone directory for an "owner/repo" key; raises ValueError for anything that isn't one"""
+        owner, _, name = key.partition("/")
+        if not OWNER_NAME.fullmatch(owner) or not REPO_NAME.fullmatch(name) or name in (".", ".."):
+            raise ValueError(f"Not a valid GitHub owner/repo: {key!r}")
+        return self._inside_root(os.path.join(self.root, owner, name))
+
+    def _inside_root(self, path: str) -> str:
+        # Every clone, rmtree and lock goes through here, so a bad key or a
+        # symlink can never point them outside the mirror root
+        root = os.path.realpath(self.root)
+        if not os.path.realpath(path).startswith(root + os.sep):
+            raise ValueError(f"Git mirror path {path} is outside {self.root}")
+        return path
+
+    @contextmanager
+    def _locked(self, path: str, blocking: bool = True) -> Iterator[bool]:
+        self._inside_root(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _clone(self, url: str, path: str, branch: str, env: dict) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+        options = {"depth": 1, "branch": branch, "single_branch": True}
+        if self.blob_filter:
+            options["filter"] = self.blob_filter
+        git.Repo.clone_from(url, path, env=env, **options)
+
+    def _update(self, url: str, path: str, branch: str, env: dict) -> None:
+        repo = git.Repo(path)
+        with repo.git.custom_environment(**env):
+            repo.git.remote("set-url", "origin", url)
+            options = {"depth": 1}
+            if self.blob_filter:
+                options["filter"] = self.blob_filter
+            repo.git.fetch("origin", f"+refs/heads/{branch}:refs/remotes/origin/{branch}", **options)
+            repo.git.checkout("--force", "--detach", f"origin/{branch}")
+            repo.git.clean("-ffdx")
+            # Older shallow tips become unreachable after each fetch
+            repo.git.gc("--auto", "--quiet")
+
+    @contextmanager
+    def checkout(self, key: str, url: str, branch: str = "main", token: str = "") -> Iterator[str]:
+        """
+        Yield a working tree of `branch` for the "owner/repo" key, fetched
+        from url. The clone stays locked for the duration of the block.
+        """
+        path = self.path(key)
+        env = _auth_env(token)
+        with self._locked(path):
+            started = time.monotonic()
+            if os.path.isdir(os.path.join(path, ".git")):
+                try:
+                    self._update(url, path, branch, env)
+                    logger.info(f"Fetched {key}@{branch} into cached clone in {time.monotonic() - started:.1f}s")
+                except (git.GitCommandError, git.InvalidGitRepositoryError, git.NoSuchPathError) as e:
+                    # History rewritten, branch renamed or a broken clone: start over
+                    logger.warning(f"Fetch of cached clone {key} failed, re-cloning: {e}")
+                    self._clone(url, path, branch, env)
+            else:
+                self._clone(url, path, branch, env)
+                logger.info(f"Cloned {key}@{branch} in {time.monotonic() - started:.1f}s")
+
+            INGEST_STAGE_SECONDS.labels("clone").observe(time.monotonic() - started)
+            self._record_access(path)
+            yield path
+
+        self.evict(keep=path)
+
+    @asynccontextmanager
+    async def checkout_async(self, key: str, url: str, branch: str = "main", token: str = "") -> AsyncIterator[str]:
+        """
+        checkout() for async callers: waiting for the lock, git and eviction
+        run in a thread so they don't block the event loop (and with it the
+        worker's job heartbeats).
+        """
+        manager = self.checkout(key, url, branch=branch, token=token)
+        # If this is cancelled mid-clone, the lock is released when the
+        # abandoned generator is garbage collected
+        path = await asyncio.to_thread(manager.__enter__)
+        try:
+            yield path
+        except BaseException as e:
+            if not await asyncio.to_thread(manager.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await asyncio.to_thread(manager.__exit__, None, None, None)
+
+    def _record_access(self, path: str) -> None:
+        tmp_path = f"{path}.json.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_access": time.time(), "bytes": _dir_size(path)}, f)
+        os.replace(tmp_path, f"{path}.json")
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for owner in os.listdir(self.root):
+            owner_dir = os.path.join(self.root, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for name in os.listdir(owner_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(owner_dir, name), "r") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                entries.append((meta.get("last_access", 0), meta.get("bytes", 0), os.path.join(owner_dir, name[:-5])))
+        return entries
+
+    def evict(self, keep: str | None = None) -> int:
+        """Remove least recently used clones until the total fits the quota; returns clones removed"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Skip clones another worker is using right now
+            with self._locked(path, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                try:
+                    os.remove(f"{path}.json")
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+            logger.info(f"Evicted cached clone {path} ({size} bytes)")
+        return removed
+
+    def remove(self, key: str) -> None:
+        try:
+            path = self.path(key)
+        except ValueError:
+            return  # never had a clone
+        with self._locked(path):
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.remove(f"{path}.json")
+            except FileNotFoundError:
+                pass
+
+
+git_mirrors = GitMirrorCache(os.path.join(data_dir, "git_mirrors"), git_mirror_max_bytes, git_mirror_filter)
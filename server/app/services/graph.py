@@ -0,0 +1,309 @@
+# backend/app/services/graph.py
+"""
+Batched Neo4j writes for the code knowledge graph.
+
+extract_structure() only collects records; GraphWriter buffers them across
+files and flushes each label with a single parameterized UNWIND statement
+inside one explicit transaction.
+
+ensure_graph_schema() creates the constraints and indexes every MERGE/MATCH
+here relies on, and EXPANSION_QUERIES are the depth-capped queries /api/ask
+uses to pull relationships for the files it retrieved.
+"""
+from neo4j import Driver
+from app.config import graph_batch_size, graph_delete_batch_size
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Uniqueness constraints come with backing indexes. CALLS targets are merged on
+# (repo_id, name) without a file_path, so Function also gets a plain index on that.
+GRAPH_SCHEMA = [
+    "CREATE CONSTRAINT file_repo_path IF NOT EXISTS FOR (f:File) REQUIRE (f.repo_id, f.path) IS UNIQUE",
+    "CREATE CONSTRAINT function_repo_file_name IF NOT EXISTS FOR (n:Function) REQUIRE (n.repo_id, n.file_path, n.name) IS UNIQUE",
+    "CREATE CONSTRAINT class_repo_file_name IF NOT EXISTS FOR (n:Class) REQUIRE (n.repo_id, n.file_path, n.name) IS UNIQUE",
+    "CREATE INDEX function_repo_name IF NOT EXISTS FOR (n:Function) ON (n.repo_id, n.name)",
+    # Whole-repo deletion looks nodes up by repo_id alone
+    "CREATE INDEX file_repo IF NOT EXISTS FOR (n:File) ON (n.repo_id)",
+    "CREATE INDEX function_repo IF NOT EXISTS FOR (n:Function) ON (n.repo_id)",
+    "CREATE INDEX class_repo IF NOT EXISTS FOR (n:Class) ON (n.repo_id)",
+]
+
+# Every label ingestion writes, in the order a repo's nodes are deleted
+GRAPH_LABELS = ("Function", "Class", "File")
+
+# Used when a constraint can't be created (e.g. duplicates from before the
+# constraint existed) so lookups are still index-backed
+GRAPH_SCHEMA_FALLBACK = {
+    "file_repo_path": "CREATE INDEX file_repo_path_idx IF NOT EXISTS FOR (f:File) ON (f.repo_id, f.path)",
+    "function_repo_file_name": "CREATE INDEX function_repo_file_name_idx IF NOT EXISTS FOR (n:Function) ON (n.repo_id, n.file_path, n.name)",
+    "class_repo_file_name": "CREATE INDEX class_repo_file_name_idx IF NOT EXISTS FOR (n:Class) ON (n.repo_id, n.file_path, n.name)",
+}
+
+# Ranked graph expansion for /api/ask, each query anchored on an index seek of
+# the retrieved files and capped at $limit rows:
+#   defines - symbols the retrieved files contain
+#   calls   - functions they call, with up to 3 files defining that name
+#   callers - other files calling functions the retrieved files define
+EXPANSION_QUERIES = {
+    "defines": """
+        UNWIND $files AS path
+        MATCH (f:File {repo_id: $repo_id, path: path})-[:CONTAINS]->(s)
+        RETURN f.path AS path, labels(s)[0] AS label, s.name AS name
+        LIMIT $limit
+    """,
+    "calls": """
+        UNWIND $files AS path
+        MATCH (f:File {repo_id: $repo_id, path: path})-[:CALLS]->(c:Function)
+        OPTIONAL MATCH (d:Function {repo_id: $repo_id, name: c.name})
+        WHERE d.file_path IS NOT NULL AND d.file_path <> path
+        WITH f, c, collect(DISTINCT d.file_path)[..3] AS defined_in
+        RETURN f.path AS path, c.name AS name, defined_in
+        LIMIT $limit
+    """,
+    "callers": """
+        UNWIND $files AS path
+        MATCH (f:File {repo_id: $repo_id, path: path})-[:CONTAINS]->(d:Function)
+        MATCH (caller:File)-[:CALLS]->(:Function {repo_id: $repo_id, name: d.name})
+        WHERE caller.repo_id = $repo_id AND caller.path <> path
+        WITH f, d, collect(DISTINCT caller.path)[..5] AS callers
+        RETURN f.path AS path, d.name AS name, callers
+        LIMIT $limit
+    """,
+}
+
+
+def ensure_graph_schema(driver: Driver) -> None:
+    """
+    Create graph constraints and indexes if missing; safe to call on every
+    start. Failures (including an unreachable Neo4j) are logged, not raised:
+    queries still work without the schema, only slower.
+    """
+    missing = []
+    with driver.session() as session:
+        for statement in GRAPH_SCHEMA:
+            name = statement.split()[2]
+            try:
+                session.run(statement).consume()
+                continue
+            except Exception as e:
+                logger.warning(f"Could not create {name}: {e}")
+            if name not in GRAPH_SCHEMA_FALLBACK:
+                missing.append(name)
+                continue
+            try:
+                session.run(GRAPH_SCHEMA_FALLBACK[name]).consume()
+            except Exception as e:
+                logger.warning(f"Could not create fallback index for {name}: {e}")
+                missing.append(name)
+    if missing:
+        logger.error(f"Neo4j schema is incomplete, missing {missing}; it is retried on the next start")
+    else:
+        logger.info("Neo4j schema is up to date")
+
+
+def format_expansion(kind: str, record) -> str:
+    if kind == "defines":
+        return f"{record['path']} → defines {record['label']} {record['name']}"
+    if kind == "calls":
+        defined_in = f" (defined in {', '.join(record['defined_in'])})" if record["defined_in"] else ""
+        return f"{record['path']} → calls {record['name']}{defined_in}"
+    return f"{record['path']} ← {record['name']} is called from {', '.join(record['callers'])}"
+
+
+# Order matters: Function/Class/CALLS rows MATCH the File nodes written first
+GRAPH_QUERIES = {
+    "files": """
+        UNWIND $rows AS row
+        MERGE (f:File {path: row.path, repo_id: row.repo_id})
+        SET f.language = row.language
+    """,
+    "functions": """
+        UNWIND $rows AS row
+        MATCH (f:File {path: row.file_path, repo_id: row.repo_id})
+        MERGE (func:Function {name: row.name, file_path: row.file_path, repo_id: row.repo_id})
+        MERGE (f)-[:CONTAINS]->(func)
+    """,
+    "classes": """
+        UNWIND $rows AS row
+        MATCH (f:File {path: row.file_path, repo_id: row.repo_id})
+        MERGE (cls:Class {name: row.name, file_path: row.file_path, repo_id: row.repo_id})
+        MERGE (f)-[:CONTAINS]->(cls)
+    """,
+    "calls": """
+        UNWIND $rows AS row
+        MATCH (f:File {path: row.file_path, repo_id: row.repo_id})
+        MERGE (called:Function {name: row.name, repo_id: row.repo_id})
+        MERGE (f)-[:CALLS]->(called)
+    """,
+}
+
+
+class GraphWriter:
+    """
+    Buffers File, Function, Class, CONTAINS and CALLS records in memory and
+    writes them to Neo4j in batches.
+
+    Call add() once per extracted file and flush() at the end; add() flushes
+    on its own once batch_size rows are pending.
+    """
+
+    def __init__(self, driver: Driver, batch_size: int = graph_batch_size):
+        self.driver = driver
+        self.batch_size = max(1, batch_size)
+        self.rows = {label: [] for label in GRAPH_QUERIES}
+        self.flushes = []  # rows written per label, one dict per flush
+
+    @property
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self.rows.values())
+
+    def add(self, structure: dict | None) -> None:
+        """Queue the records returned by extract_structure() for one file."""
+        if not structure:
+            return
+
+        path = structure["path"]
+        repo_id = structure["repo_id"]
+        self.rows["files"].append({"path": path, "repo_id": repo_id, "language": structure["language"]})
+
+        # MERGE is idempotent, so repeated names in one file only cost extra rows
+        for key in ("functions", "classes", "calls"):
+            for name in dict.fromkeys(structure[key]):
+                self.rows[key].append({"name": name, "file_path": path, "repo_id": repo_id})
+
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> dict:
+        """
+        Write all pending rows in one transaction and return the row count
+        written per label.
+        """
+        counts = {label: len(rows) for label, rows in self.rows.items()}
+        if not any(counts.values()):
+            return counts
+
+        with self.driver.session() as session:
+            with session.begin_transaction() as tx:
+                for label, query in GRAPH_QUERIES.items():
+                    rows = self.rows[label]
+                    for i in range(0, len(rows), self.batch_size):
+                        tx.run(query, rows=rows[i:i + self.batch_size]).consume()
+                tx.commit()
+
+        self.rows = {label: [] for label in GRAPH_QUERIES}
+        self.flushes.append(counts)
+        logger.info(f"Flushed graph batch: {counts}")
+        return counts
+
+
+# Incremental updates. CALLS edges point at Function nodes merged by name, so
+# a changed or deleted file must not take the symbols it defines down with
+# it: other files' calls to them would be lost for good, since unchanged
+# files are never re-extracted.
+FILE_UPDATE_QUERIES = {
+    # Calls made by the files, and name-only call targets nothing calls any more
+    "calls": """
+        UNWIND $paths AS path
+        MATCH (:File {path: path, repo_id: $repo_id})-[call:CALLS]->(target:Function)
+        DELETE call
+        WITH DISTINCT target
+        WHERE target.file_path IS NULL AND NOT EXISTS { ()-[:CALLS]->(target) }
+        DELETE target
+    """,
+    "contains": """
+        UNWIND $paths AS path
+        MATCH (:File {path: path, repo_id: $repo_id})-[contains:CONTAINS]->()
+        DELETE contains
+    """,
+    "files": """
+        UNWIND $paths AS path
+        MATCH (f:File {path: path, repo_id: $repo_id})
+        DETACH DELETE f
+        RETURN count(f) AS deleted_count
+    """,
+    # Symbols of the files that no File CONTAINS any more. Functions other
+    # files still call become name-only call targets, keeping those edges;
+    # everything else is deleted.
+    "unlink": """
+        UNWIND $paths AS path
+        MATCH (n:Function {repo_id: $repo_id, file_path: path})
+        WHERE NOT EXISTS { ()-[:CONTAINS]->(n) } AND EXISTS { ()-[:CALLS]->(n) }
+        REMOVE n.file_path
+    """,
+    **{
+        f"prune_{label.lower()}": f"""
+        UNWIND $paths AS path
+        MATCH (n:{label} {{repo_id: $repo_id, file_path: path}})
+        WHERE NOT EXISTS {{ ()-[:CONTAINS]->(n) }}
+        DETACH DELETE n
+    """
+        for label in ("Function", "Class")
+    },
+}
+
+PRUNE_STEPS = ("unlink", "prune_function", "prune_class")
+
+
+def _update_files(driver: Driver, repo_id: str, paths: list[str], steps: tuple, batch_size: int) -> int:
+    """Run FILE_UPDATE_QUERIES steps over paths, one transaction per batch; returns File nodes deleted"""
+    deleted = 0
+    with driver.session() as session:
+        for i in range(0, len(paths), batch_size):
+            with session.begin_transaction() as tx:
+                for step in steps:
+                    record = tx.run(FILE_UPDATE_QUERIES[step], paths=paths[i:i + batch_size], repo_id=repo_id).single()
+                    if step == "files" and record:
+                        deleted += record["deleted_count"]
+                tx.commit()
+    return deleted
+
+
+def delete_file_nodes(driver: Driver, repo_id: str, paths: list[str], batch_size: int = graph_batch_size) -> int:
+    """
+    Remove File nodes for the given paths with the calls they make and the
+    Function/Class nodes they CONTAIN, except functions other files still
+    call. Used when files disappear between ingestions and before a rebuild.
+    """
+    return _update_files(driver, repo_id, paths, ("calls", "files") + PRUNE_STEPS, batch_size)
+
+
+def unlink_file_edges(driver: Driver, repo_id: str, paths: list[str], batch_size: int = graph_batch_size) -> None:
+    """
+    Drop the CONTAINS and CALLS edges of changed files before their new
+    version is written. Their nodes stay, so GraphWriter's MERGEs reuse them
+    and calls from unchanged files survive; call prune_file_symbols() for
+    the same paths once the new version is flushed.
+    """
+    _update_files(driver, repo_id, paths, ("calls", "contains"), batch_size)
+
+
+def prune_file_symbols(driver: Driver, repo_id: str, paths: list[str], batch_size: int = graph_batch_size) -> None:
+    """Remove symbols the changed files no longer define (see FILE_UPDATE_QUERIES)"""
+    _update_files(driver, repo_id, paths, PRUNE_STEPS, batch_size)
+
+
+def delete_repo_nodes(
+    driver: Driver,
+    repo_id: str,
+    label: str,
+    max_nodes: int,
+    batch_size: int = graph_delete_batch_size,
+) -> int:
+    """
+    Delete up to max_nodes nodes with this label of a repo, committing every
+    batch_size nodes, and return how many were deleted. Call until it
+    returns 0; each call is safe to repeat after a crash.
+    """
+    if label not in GRAPH_LABELS:
+        raise ValueError(f"Unknown graph label: {label}")
+    # CALL ... IN TRANSACTIONS needs an auto-commit transaction, i.e. session.run
+    with driver.session() as session:
+        record = session.run(f"""
+            MATCH (n:{label} {{repo_id: $repo_id}})
+            WITH n LIMIT $max_nodes
+            CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(*) AS deleted_count
+        """, repo_id=repo_id, max_nodes=max_nodes, batch_size=batch_size).single()
+    return record["deleted_count"] if record else 0
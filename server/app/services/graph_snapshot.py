@@ -0,0 +1,260 @@
+# backend/app/services/graph_snapshot.py
+"""
+Per-repo adjacency snapshot of the code graph, for /api/ask graph context.
+
+The graph only changes when ingest_repo runs, so at the end of ingestion the
+repo's File/Function/Class graph is exported from Neo4j into one local file:
+symbol tables (file paths, symbol names) plus CSR integer arrays
+
+    defines  file -> (name, kind) for symbols the file CONTAINS
+    calls    file -> names it CALLS
+    defs     name -> files defining a Function with that name
+    callers  name -> files calling that name
+
+The API memory-maps a snapshot the first time a repo is asked about and
+answers the same three ranked lookups as EXPANSION_QUERIES without a Neo4j
+round trip. Loaded snapshots are keyed by index version, so a re-index is
+picked up on the next question.
+
+File layout: MAGIC, u32 header length, JSON header (symbol tables and array
+offsets), then the arrays, each 8-byte aligned.
+"""
+from app.config import data_dir, graph_snapshot_max_loaded
+from collections import OrderedDict
+from neo4j import Driver
+import json
+import logging
+import mmap
+import numpy as np
+import os
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CIPG"
+FORMAT_VERSION = 1
+KIND_FUNCTION = 0
+KIND_CLASS = 1
+KIND_LABELS = {KIND_FUNCTION: "Function", KIND_CLASS: "Class"}
+
+OFFSET_DTYPE = np.int64
+ID_DTYPE = np.int32
+
+EXPORT_QUERY = """
+    MATCH (f:File {repo_id: $repo_id})
+    OPTIONAL MATCH (f)-[r:CONTAINS|CALLS]->(n)
+    RETURN f.path AS path, type(r) AS rel, labels(n)[0] AS label, n.name AS name
+"""
+
+
+def _csr(rows: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(rows) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    values = np.fromiter((value for row in rows for value in row), dtype=ID_DTYPE, count=int(offsets[-1]))
+    return offsets, values
+
+
+def build_arrays(edges) -> tuple[dict, dict]:
+    """
+    Build symbol tables and CSR arrays from (path, rel, label, name) rows,
+    where rel is "CONTAINS", "CALLS" or None for a file with no edges.
+    """
+    defines, calls = {}, {}
+    for path, rel, label, name in edges:
+        defines.setdefault(path, {})
+        calls.setdefault(path, {})
+        if rel == "CONTAINS" and name is not None:
+            defines[path][(name, KIND_CLASS if label == "Class" else KIND_FUNCTION)] = None
+        elif rel == "CALLS" and name is not None:
+            calls[path][name] = None
+
+    files = sorted(defines)
+    names = sorted({name for symbols in defines.values() for name, _ in symbols} | {name for called in calls.values() for name in called})
+    name_ids = {name: i for i, name in enumerate(names)}
+
+    define_rows, kind_rows, call_rows = [], [], []
+    defs = [[] for _ in names]
+    callers = [[] for _ in names]
+    for file_id, path in enumerate(files):
+        symbols = list(defines[path])
+        define_rows.append([name_ids[name] for name, _ in symbols])
+        kind_rows.append([kind for _, kind in symbols])
+        call_rows.append([name_ids[name] for name in calls[path]])
+        for name, kind in symbols:
+            if kind == KIND_FUNCTION:
+                defs[name_ids[name]].append(file_id)
+        for name in calls[path]:
+            callers[name_ids[name]].append(file_id)
+
+    arrays = {}
+    arrays["defines_offsets"], arrays["defines_values"] = _csr(define_rows)
+    arrays["defines_kinds"] = np.fromiter((kind for row in kind_rows for kind in row), dtype=np.int8, count=len(arrays["defines_values"]))
+    arrays["calls_offsets"], arrays["calls_values"] = _csr(call_rows)
+    arrays["defs_offsets"], arrays["defs_values"] = _csr(defs)
+    arrays["callers_offsets"], arrays["callers_values"] = _csr(callers)
+    return {"files": files, "names": names}, arrays
+
+
+def write_snapshot(path: str, repo_id: str, tables: dict, arrays: dict) -> int:
+    """Write the snapshot atomically and return its size in bytes"""
+    header = {"format": FORMAT_VERSION, "repo_id": repo_id, **tables, "arrays": {}}
+    # Array offsets depend on the header length, so lay them out relative to the data start
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [offset, len(array), array.dtype.str]
+        offset += (array.nbytes + 7) & ~7
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    data_start = (len(MAGIC) + 4 + len(header_bytes) + 7) & ~7
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b"\0" * (((array.nbytes + 7) & ~7) - array.nbytes))
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class GraphSnapshot:
+    """A memory-mapped snapshot; arrays are zero-copy views into the file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Corrupt graph snapshot {path}")
+        (header_length,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mm[header_start:header_start + header_length])
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph snapshot format in {path}")
+
+        data_start = (header_start + header_length + 7) & ~7
+        self.files = header["files"]
+        self.names = header["names"]
+        self._file_ids = {path: i for i, path in enumerate(self.files)}
+        self._arrays = {
+            name: np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+            for name, (offset, count, dtype) in header["arrays"].items()
+        }
+
+    def _row(self, name: str, i: int) -> np.ndarray:
+        offsets = self._arrays[f"{name}_offsets"]
+        return self._arrays[f"{name}_values"][offsets[i]:offsets[i + 1]]
+
+    def expand(self, files: list[str], limit: int) -> dict[str, list[dict]]:
+        """
+        Same rows, per kind, as running EXPANSION_QUERIES against Neo4j:
+        defines, calls (with up to 3 other defining files) and callers (up to 5).
+        """
+        file_ids = [(path, self._file_ids[path]) for path in files if path in self._file_ids]
+        kinds = self._arrays["defines_kinds"]
+        offsets = self._arrays["defines_offsets"]
+        result = {"defines": [], "calls": [], "callers": []}
+
+        for path, file_id in file_ids:
+            for j in range(offsets[file_id], offsets[file_id + 1]):
+                if len(result["defines"]) >= limit:
+                    break
+                name_id = self._arrays["defines_values"][j]
+                result["defines"].append({"path": path, "label": KIND_LABELS[int(kinds[j])], "name": self.names[name_id]})
+
+            for name_id in self._row("calls", file_id):
+                if len(result["calls"]) >= limit:
+                    break
+                defined_in = [self.files[i] for i in self._row("defs", name_id) if i != file_id][:3]
+                result["calls"].append({"path": path, "name": self.names[name_id], "defined_in": defined_in})
+
+            for j in range(offsets[file_id], offsets[file_id + 1]):
+                if len(result["callers"]) >= limit:
+                    break
+                if kinds[j] != KIND_FUNCTION:
+                    continue
+                name_id = self._arrays["defines_values"][j]
+                callers = [self.files[i] for i in self._row("callers", name_id) if i != file_id][:5]
+                if callers:
+                    result["callers"].append({"path": path, "name": self.names[name_id], "callers": callers})
+        return result
+
+
+class GraphSnapshotStore:
+    def __init__(self, root: str, max_loaded: int):
+        self.root = root
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()  # repo_id -> (index version, snapshot or None)
+        self._lock = threading.Lock()
+
+    def path(self, repo_id: str) -> str:
+        return os.path.join(self.root, f"{repo_id}.graph")
+
+    def build(self, driver: Driver, repo_id: str) -> dict:
+        """Export the repo's graph from Neo4j into a fresh snapshot"""
+        repo_id = str(repo_id)
+        with driver.session() as session:
+            edges = [
+                (r["path"], r["rel"], r["label"], r["name"])
+                for r in session.run(EXPORT_QUERY, repo_id=repo_id)
+            ]
+        tables, arrays = build_arrays(edges)
+        size = write_snapshot(self.path(repo_id), repo_id, tables, arrays)
+        stats = {"files": len(tables["files"]), "names": len(tables["names"]), "edges": len(edges), "bytes": size}
+        logger.info(f"Built graph snapshot for repo {repo_id}: {stats}")
+        return stats
+
+    def get_loaded(self, repo_id: str, version: int) -> tuple[bool, GraphSnapshot | None]:
+        """
+        (True, snapshot or None) if get() already loaded this version, else
+        (False, None). Never touches the disk, so it's safe on the event loop.
+        """
+        repo_id = str(repo_id)
+        with self._lock:
+            loaded = self._loaded.get(repo_id)
+            if loaded is not None and loaded[0] == version:
+                self._loaded.move_to_end(repo_id)
+                return True, loaded[1]
+        return False, None
+
+    def get(self, repo_id: str, version: int) -> GraphSnapshot | None:
+        """
+        The repo's snapshot, loaded on first use, or None if none was built.
+        Loading maps the file and parses its symbol tables; call it from a
+        thread when the snapshot may not be loaded yet.
+        """
+        repo_id = str(repo_id)
+        found, snapshot = self.get_loaded(repo_id, version)
+        if found:
+            return snapshot
+
+        snapshot = None
+        try:
+            snapshot = GraphSnapshot(self.path(repo_id))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not load graph snapshot for repo {repo_id}: {e}")
+
+        with self._lock:
+            self._loaded[repo_id] = (version, snapshot)
+            self._loaded.move_to_end(repo_id)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return snapshot
+
+    def delete(self, repo_id: str) -> None:
+        repo_id = str(repo_id)
+        try:
+            os.remove(self.path(repo_id))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._loaded.pop(repo_id, None)
+
+
+graph_snapshots = GraphSnapshotStore(os.path.join(data_dir, "graph_snapshots"), graph_snapshot_max_loaded)
@@ -0,0 +1,39 @@
+# backend/app/services/index_version.py
+"""
+Per-repo index version, bumped whenever a repo is re-ingested or deleted.
+
+Caches in the API process include the version in their keys, so results
+computed against an older index are never served. The version is a small
+file on local disk because ingestion runs in separate worker processes.
+"""
+from app.config import data_dir
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+VERSION_DIR = os.path.join(data_dir, "index_versions")
+
+
+def _version_path(repo_id: str) -> str:
+    return os.path.join(VERSION_DIR, str(repo_id))
+
+
+def get_index_version(repo_id: str) -> int:
+    try:
+        with open(_version_path(repo_id), "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_index_version(repo_id: str) -> int:
+    version = get_index_version(repo_id) + 1
+    os.makedirs(VERSION_DIR, exist_ok=True)
+    path = _version_path(repo_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+    logger.info(f"Index version for repo {repo_id} is now {version}")
+    return version
@@ -1,162 +1,332 @@
-from app.config import supabase, vo, qdrant, neo4j_driver, github_token
+from app.config import (
+    qdrant, neo4j_driver, github_token, embed_batch_size, embed_concurrency,
+    ingest_queue_size, ingest_read_concurrency, ingest_upsert_concurrency,
+    chunk_target_chars, chunk_max_chars
+)
 from uuid import UUID
-import tempfile #create temporary directories and then auto-delete it
-import git 
 from tqdm.asyncio import tqdm_asyncio #shows progress bar in terminal, can be removed while deploying
-from app.utils.tree_sitter import extract_structure
-from qdrant_client.http.models import PointStruct
+from app.utils.tree_sitter import extract_structure, parse_source
+from app.utils.chunking import chunk_source
+from app.utils.scanner import RepoScanner, ScannedFile
+from app.services.graph import GraphWriter, delete_file_nodes, unlink_file_edges, prune_file_symbols
+from app.services.graph_snapshot import graph_snapshots
+from app.services.lexical_index import lexical_index
+from app.services.vector import (
+    point_id, repo_collection, reset_repo_points, drop_repo_points, get_collection_profile, set_collection_profile,
+    target_profile
+)
+from app.services.manifest import load_manifest, save_manifest, content_hash
+from app.services.embedding import EmbeddingBatcher
+from app.services.embedding_cache import embedding_cache
+from app.services.pipeline import Pipeline, Stage
+from app.services.blob_store import blob_store
+from app.services.git_mirror import git_mirrors
+from app.services.index_version import bump_index_version
+from app.services.repo_cache import repo_cache
+from app.services.metrics import ingest_stage, INGEST_RUNS, INGEST_FILES, SCAN_SKIPPED
+from qdrant_client.http.models import PointStruct, PointIdsList
 import asyncio
-import os
-import hashlib
 import logging
-import time
-from voyageai.error import RateLimitError
 logger = logging.getLogger(__name__)
 
+# Bump when chunking or point layout changes so stale manifests force a full rebuild
+INDEX_VERSION = 4
 
-def embed_with_retry(texts, model="voyage-code-2", max_retries=5): 
+
+def build_points(rel: str, blob_key: str, size: int, chunks: list[dict], vectors: dict, repo_id: str) -> list[PointStruct]:
     """
-    Embed texts with exponential backoff retry logic for rate limits.
+    Build the chunk points and the full-file point for one file from the
+    vectors returned by EmbeddingBatcher, keyed by (rel, chunk_index) and
+    (rel, "FULL"). Payloads reference the file text in the blob store by
+    key and byte range instead of carrying it.
     """
+    points = []
+    for i, chunk in enumerate(chunks):
+        points.append(
+            PointStruct(
+                id=point_id(repo_id, rel, i),
+                vector=vectors[(rel, i)],
+                payload={
+                    "blob": blob_key,
+                    "start_byte": chunk["start_byte"],
+                    "end_byte": chunk["end_byte"],
+                    "file_path": rel,
+                    "repo_id": repo_id,
+                    "type": "chunk",
+                    "chunk_index": i,
+                    "start_line": chunk["start_line"],
+                    "end_line": chunk["end_line"]
+                }
+            )
+        )
 
-    for attempt in range(max_retries):
-        try:
-            return vo.embed(texts, model=model).embeddings
-        except RateLimitError as e:
-            if attempt == max_retries - 1:
-                logger.error(f"Max retries reached for embedding. Error: {e}")
-                raise
-
-            # Exponential backoff: 2^attempt seconds (2, 4, 8, 16, 32...)
-            wait_time = 2 ** (attempt + 1)
-            logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds... (attempt {attempt + 1}/{max_retries})")
-            time.sleep(wait_time)
-        except Exception as e:
-            logger.error(f"Unexpected error during embedding: {e}")
-            raise
+    # Full file point
+    points.append(
+        PointStruct(
+            id=point_id(repo_id, rel, "FULL"),
+            vector=vectors[(rel, "FULL")],
+            payload={
+                "blob": blob_key,
+                "start_byte": 0,
+                "end_byte": size,
+                "file_path": rel,
+                "repo_id": repo_id,
+                "type": "full_file"
+            }
+        )
+    )
+    return points
 
-    raise Exception("Failed to embed after all retries")
+async def ingest_repo(repo_id: UUID, progress: dict | None = None):
+    try:
+        with ingest_stage("total", repo_id):
+            await _ingest_repo(repo_id, progress)
+    except asyncio.CancelledError:
+        INGEST_RUNS.labels("cancelled").inc()
+        raise
+    except Exception:
+        INGEST_RUNS.labels("error").inc()
+        raise
+    INGEST_RUNS.labels("ready").inc()
 
-async def ingest_repo(repo_id: UUID):
+async def _ingest_repo(repo_id: UUID, progress: dict | None = None):
+    # A retried job starts over, so does its progress
+    progress = {} if progress is None else progress
+    progress.clear()
+    live = False  # whether the existing index keeps serving /api/ask during this run
     try:
-        repo = supabase.table("repos").select("*").eq("id", str(repo_id)).single().execute().data #fetches repo info from supabase
+        # Blocking client calls run in threads: the worker heartbeats this job's
+        # lease from the same event loop
+        repo = await asyncio.to_thread(repo_cache.get_sync, str(repo_id), True) #fetches repo info from supabase
+        if repo is None:
+            raise ValueError(f"Repo not found: {repo_id}")
+        live = repo.get("status") == "ready"
 
-        collection_name = f"repo_{repo_id}"
+        collection_name = repo_collection(str(repo_id))
+        # Set when the storage mode changed since the last run
+        previous_collection = repo.get("qdrant_collection")
+        if previous_collection == collection_name:
+            previous_collection = None
 
-        qdrant.recreate_collection( # creates new collection in qdrant if already exists, recreates it(deletes old one)
-            collection_name=collection_name,
-            vectors_config={"size": 1536, "distance": "Cosine"}
-        )
+        # Re-analysis only touches files whose content hash changed, so the
+        # collection stays searchable while the update runs. Without a usable
+        # manifest we fall back to rebuilding the collection from scratch.
+        manifest = await asyncio.to_thread(load_manifest, str(repo_id))
+        profile_name = await asyncio.to_thread(target_profile, qdrant, collection_name)
+        previous_files = manifest["files"]
+        rebuild = await asyncio.to_thread(lambda: (
+            manifest["version"] != INDEX_VERSION
+            or previous_collection is not None
+            or not qdrant.collection_exists(collection_name)
+            or not lexical_index.exists(str(repo_id))
+            or get_collection_profile(str(repo_id)) != profile_name
+        ))
+        # An incremental re-index keeps the repo "ready" so it can still be
+        # asked about; progress is reported on its job. A rebuild empties the
+        # index first, so the repo isn't ready until it's done.
+        live = live and not rebuild
+        if not live:
+            await asyncio.to_thread(repo_cache.update, str(repo_id), {"status": "cloning"})
+        if rebuild:
+            await asyncio.to_thread(lexical_index.clear, str(repo_id))
+            # Drops the old collection (or this repo's points in the shared one)
+            await asyncio.to_thread(reset_repo_points, qdrant, str(repo_id), collection_name, profile_name)
+            await asyncio.to_thread(set_collection_profile, str(repo_id), profile_name)
+
+        # Cached clone: re-analysis fetches the branch tip instead of cloning again
+        clone_url = f"https://github.com/{repo['owner']}/{repo['repo']}.git"
+        async with git_mirrors.checkout_async(
+            f"{repo['owner']}/{repo['repo']}", clone_url, branch=repo.get("branch", "main"), token=github_token
+        ) as tmpdir:
 
-        # Directories to skip during analysis
-        EXCLUDED_DIRS = {
-            "node_modules",
-            "venv",
-            ".venv",
-            "env",
-            ".env",
-            "__pycache__",
-            ".git",
-            ".svn",
-            ".hg",
-            "dist",
-            "build",
-            ".next",
-            ".nuxt",
-            "target",
-            "vendor",
-            ".gradle",
-            ".idea",
-            ".vscode",
-            "coverage",
-            ".pytest_cache",
-            ".mypy_cache",
-            ".tox",
-            "site-packages",
-            "bower_components",
-            "jspm_packages",
-        }
-
-        with tempfile.TemporaryDirectory() as tmpdir: #creates temporary directory
-            clone_url = f"https://{github_token}@github.com/{repo['owner']}/{repo['repo']}.git"
-            git.Repo.clone_from(clone_url, tmpdir, depth=1, branch=repo.get("branch", "main")) #depth= 1: clones only latest commit
-
-            files = []
-            for root, _, fs in os.walk(tmpdir):
-                # Skip excluded directories
-                dir_parts = os.path.normpath(root).split(os.sep) #turns folder name to list of strings
-                if any(excluded in dir_parts for excluded in EXCLUDED_DIRS):
-                    continue
-
-                for f in fs:
-                    if f.split(".")[-1] in ["py", "js", "ts", "tsx", "jsx", "go", "java", "rs"]:
-                        files.append(os.path.join(root, f))
-
-            for path in tqdm_asyncio(files, desc="Processing"):
-                rel = os.path.relpath(path, tmpdir)
-                content = open(path, 'r', encoding='utf-8', errors='ignore').read()
+            graph_writer = GraphWriter(neo4j_driver)
+            batcher = EmbeddingBatcher(concurrency=1)  # one request per embed worker
+            current_files = {}  # new manifest entries
+            changed_paths = []  # re-extracted files whose old symbols may need pruning
+            progress_bar = tqdm_asyncio(desc="Processing", unit="file")
+
+            # Changed files get their edges re-extracted (see write_graph). On a
+            # rebuild every previous file counts as changed, so clear them in one go.
+            if rebuild and previous_files:
+                await asyncio.to_thread(delete_file_nodes, neo4j_driver, str(repo_id), list(previous_files))
+
+            # Prunes excluded/ignored directories and skips generated, vendored,
+            # binary, minified and oversized files before they are read
+            scanner = RepoScanner(tmpdir)
+
+            def read_and_chunk(record: ScannedFile):
+                rel = record.rel
+                content = open(record.path, 'r', encoding='utf-8', errors='ignore').read()
 
                 if not content.strip():
-                    continue  # skip empty files
+                    return None  # skip empty files
+
+                file_hash = content_hash(content)
+                previous = previous_files.get(rel)
+                if not rebuild and previous and previous["hash"] == file_hash:
+                    current_files[rel] = previous  # unchanged, keep its points
+                    return None
 
-                # Chunk with overlap
-                chunks = [content[i:i+800] for i in range(0, len(content), 600)]
+                # Parse once: the tree drives both chunking and graph extraction.
+                # Files without a grammar get the overlapping window chunker.
+                tree = parse_source(rel, content)
+                chunks = chunk_source(content, tree, chunk_target_chars, chunk_max_chars)
                 if not chunks:
-                    continue
-
-                # Combine chunks and full file content into a single batch for embedding
-                all_texts = chunks + [content[:800]]
-                all_embeds = embed_with_retry(all_texts)
-
-                chunk_embeds = all_embeds[:len(chunks)]
-                full_emb = all_embeds[-1]
-                # Build points
-                points = []
-                for i, (chunk, emb) in enumerate(zip(chunks, chunk_embeds)):
-                    # Generate UUID from file path and chunk index
-                    point_id = hashlib.md5(f"{rel}#{i}".encode()).hexdigest()
-                    points.append(
-                        PointStruct(
-                            id=point_id,
-                            vector=emb,
-                            payload={
-                                "content": chunk,
-                                "file_path": rel,
-                                "repo_id": str(repo_id),
-                                "type": "chunk",
-                                "chunk_index": i
-                            }
+                    return None
+
+                # The blob key is the same sha256 as the manifest hash
+                data = content.encode()
+                blob_key = blob_store.put(data, str(repo_id))
+
+                return {
+                    "rel": rel,
+                    "content": content,
+                    "blob": blob_key,
+                    "size": len(data),
+                    "hash": file_hash,
+                    "chunks": chunks,
+                    "changed": bool(previous) and not rebuild,
+                    "structure": extract_structure(rel, content, str(repo_id), tree=tree),
+                }
+
+            async def read_stage(record):
+                with ingest_stage("read", repo_id):
+                    item = await asyncio.to_thread(read_and_chunk, record)
+                progress_bar.update(1)
+                progress["files_read"] = progress.get("files_read", 0) + 1
+                return item
+
+            async def embed_stage(items):
+                # Chunks plus the head of each file for its full-file point,
+                # across every file the worker picked up
+                for item in items:
+                    for i, chunk in enumerate(item["chunks"]):
+                        batcher.add((item["rel"], i), chunk["text"])
+                    batcher.add((item["rel"], "FULL"), item["content"][:800])
+                with ingest_stage("embed", repo_id):
+                    vectors = await batcher.flush()
+                for item in items:
+                    item["points"] = build_points(item["rel"], item["blob"], item["size"], item["chunks"], vectors, str(repo_id))
+                    item["content"] = None  # text is in the blob store now
+                return items
+
+            def upsert(item):
+                qdrant.upsert(collection_name=collection_name, points=item["points"])
+                # Chunk points only; full_file points would dominate every BM25 match
+                lexical_index.replace_file(str(repo_id), item["rel"], [
+                    (point.id, point.payload, chunk["text"]) for point, chunk in zip(item["points"], item["chunks"])
+                ])
+
+                # Upsert first, then drop ids the new version no longer uses
+                point_ids = [point.id for point in item["points"]]
+                if item["changed"]:
+                    stale_ids = set(previous_files[item["rel"]]["points"]) - set(point_ids)
+                    if stale_ids:
+                        qdrant.delete(
+                            collection_name=collection_name,
+                            points_selector=PointIdsList(points=list(stale_ids))
                         )
-                    )
+                return point_ids
+
+            async def upsert_stage(item):
+                with ingest_stage("upsert", repo_id):
+                    point_ids = await asyncio.to_thread(upsert, item)
+                current_files[item["rel"]] = {"hash": item["hash"], "points": point_ids}
+                item["points"] = None  # free the vectors before the graph stage
+                return item
+
+            def write_graph(item):
+                if item["changed"]:
+                    # Keeps the file's nodes, so calls into it from unchanged files survive
+                    unlink_file_edges(neo4j_driver, str(repo_id), [item["rel"]])
+                    changed_paths.append(item["rel"])
+                # Graph (Tree-sitter → Neo4j), written in batches by the GraphWriter
+                graph_writer.add(item["structure"])
+
+            async def graph_stage(item):
+                with ingest_stage("graph", repo_id):
+                    await asyncio.to_thread(write_graph, item)
+
+            pipeline = Pipeline(f"ingest:{repo_id}", [
+                Stage("read", read_stage, concurrency=ingest_read_concurrency, queue_size=ingest_queue_size),
+                Stage(
+                    "embed", embed_stage, concurrency=embed_concurrency, queue_size=ingest_queue_size,
+                    batch_weight=lambda item: len(item["chunks"]) + 1, max_batch_weight=embed_batch_size
+                ),
+                Stage("upsert", upsert_stage, concurrency=ingest_upsert_concurrency, queue_size=ingest_queue_size),
+                Stage("graph", graph_stage, concurrency=1, queue_size=ingest_queue_size),  # GraphWriter isn't thread-safe
+            ])
+            await pipeline.run(scanner)
+            progress_bar.close()
+            progress["scan"] = scanner.stats.as_dict()
+            logger.info(f"Scanned repo {repo_id}: {progress['scan']}")
+            for reason, count in scanner.stats.skipped.items():
+                if count:
+                    SCAN_SKIPPED.labels(reason).inc(count)
+
+            logger.info(f"Embedded repo {repo_id} in {batcher.requests} requests, cache: {embedding_cache.stats()}")
+            with ingest_stage("graph_flush", repo_id):
+                await asyncio.to_thread(graph_writer.flush)
+                if changed_paths:
+                    await asyncio.to_thread(prune_file_symbols, neo4j_driver, str(repo_id), changed_paths)
+            logger.info(f"Graph writes for repo {repo_id}: {len(graph_writer.flushes)} flushes, {graph_writer.flushes}")
 
-                # Full file point
-                full_point_id = hashlib.md5(f"{rel}#FULL".encode()).hexdigest()
-                points.append(
-                    PointStruct(
-                        id=full_point_id,
-                        vector=full_emb,
-                        payload={
-                            "content": content,
-                            "file_path": rel,
-                            "repo_id": str(repo_id),
-                            "type": "full_file"
-                        }
+            # Files that disappeared since the last run
+            deleted_paths = [rel for rel in previous_files if rel not in current_files]
+            if deleted_paths:
+                deleted_ids = [point_id for rel in deleted_paths for point_id in previous_files[rel]["points"]]
+                if not rebuild and deleted_ids:
+                    await asyncio.to_thread(
+                        qdrant.delete,
+                        collection_name=collection_name,
+                        points_selector=PointIdsList(points=deleted_ids)
                     )
-                )
+                await asyncio.to_thread(delete_file_nodes, neo4j_driver, str(repo_id), deleted_paths)
+                await asyncio.to_thread(lexical_index.delete_files, str(repo_id), deleted_paths)
 
-                qdrant.upsert(collection_name=collection_name, points=points)
+            changed_count = sum(1 for rel in current_files if current_files[rel] is not previous_files.get(rel))
+            INGEST_FILES.labels("embedded").inc(changed_count)
+            INGEST_FILES.labels("unchanged").inc(len(current_files) - changed_count)
+            INGEST_FILES.labels("deleted").inc(len(deleted_paths))
+            logger.info(
+                f"Repo {repo_id}: {changed_count} files embedded, "
+                f"{len(current_files) - changed_count} unchanged, {len(deleted_paths)} deleted"
+            )
 
-                # Graph (Tree-sitter → Neo4j)
-                extract_structure(rel, content, str(repo_id), neo4j_driver)
+        await asyncio.to_thread(save_manifest, str(repo_id), {"version": INDEX_VERSION, "files": current_files})
 
-        supabase.table("repos").update({
+        # Graph context for /api/ask is served from this snapshot, not Neo4j;
+        # without one it falls back to querying Neo4j, so a failure isn't fatal
+        try:
+            with ingest_stage("snapshot", repo_id):
+                await asyncio.to_thread(graph_snapshots.build, neo4j_driver, str(repo_id))
+        except Exception as e:
+            logger.warning(f"Could not build graph snapshot for repo {repo_id}: {e}")
+            graph_snapshots.delete(str(repo_id))
+
+        # Drop this repo's references to blobs of changed/deleted files
+        await asyncio.to_thread(blob_store.set_repo_refs, str(repo_id), {entry["hash"] for entry in current_files.values()})
+
+        await asyncio.to_thread(repo_cache.update, str(repo_id), {
             "status": "ready",
-            "qdrant_collection": collection_name
-        }).eq("id", str(repo_id)).execute()
-
-    except Exception as e:
-        supabase.table("repos").update({
-            "status": "error",
-            "error_message": str(e)[:500]
-        }).eq("id", str(repo_id)).execute()
-        raise
\ No newline at end of file
+            "qdrant_collection": collection_name,
+            "error_message": None
+        })
+
+        # Vectors now live in the new collection; drop the ones from the old storage mode
+        if previous_collection is not None:
+            await asyncio.to_thread(drop_repo_points, qdrant, str(repo_id), previous_collection)
+
+        # Invalidate cached /api/ask results for this repo
+        bump_index_version(str(repo_id))
+
+    except (Exception, asyncio.CancelledError) as e:
+        message = "Ingestion cancelled" if isinstance(e, asyncio.CancelledError) else str(e)[:500]
+        # A failed re-index leaves the previous (partly updated) index queryable
+        fields = {"error_message": message} if live else {"status": "error", "error_message": message}
+        await asyncio.to_thread(repo_cache.update, str(repo_id), fields)
+        # A failed incremental run may already have changed the index;
+        # answer graph lookups from Neo4j until the next successful run
+        graph_snapshots.delete(str(repo_id))
+        bump_index_version(str(repo_id))
+        raise
\ No newline at end of file
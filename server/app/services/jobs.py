@@ -0,0 +1,223 @@
+# backend/app/services/jobs.py
+"""
+Durable local job queue backed by SQLite.
+
+The API process only enqueues jobs and reads their status; worker processes
+started with `python worker.py` claim and run them. The number of running
+jobs is capped across every worker process, higher priority jobs are claimed
+first, failed jobs are retried with backoff and running jobs whose worker
+stopped heartbeating are handed to another worker.
+"""
+from app.config import data_dir, job_max_running, job_max_attempts, job_lease_seconds
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Autocommit mode; claims take an explicit write lock with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    repo_id TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    progress TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_repo ON jobs (repo_id, kind)")
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, kind: str, repo_id: str, priority: int = 0, max_attempts: int = job_max_attempts) -> dict:
+        """
+        Queue a job, or return the existing queued/running job of the same
+        kind for this repo.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute(
+                    "SELECT * FROM jobs WHERE repo_id = ? AND kind = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                    (repo_id, kind, *ACTIVE_STATUSES)
+                ).fetchone()
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return dict(existing)
+
+                job_id = str(uuid.uuid4())
+                conn.execute(
+                    """INSERT INTO jobs (id, kind, repo_id, priority, status, max_attempts, created_at, available_at)
+                       VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)""",
+                    (job_id, kind, repo_id, priority, max(1, max_attempts), now, now)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id)
+
+    def claim(self, worker: str, max_running: int = job_max_running, lease_seconds: float = job_lease_seconds) -> dict | None:
+        """
+        Atomically claim the next runnable job for this worker, or return None
+        if nothing is runnable or the global running limit is reached.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Requeue jobs whose worker died without finishing them
+                conn.execute(
+                    """UPDATE jobs SET status = 'failed', worker = NULL, finished_at = ?, error = 'Worker lost'
+                       WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts""",
+                    (now, now - lease_seconds)
+                )
+                conn.execute(
+                    """UPDATE jobs SET status = 'queued', worker = NULL, available_at = ?
+                       WHERE status = 'running' AND heartbeat_at < ?""",
+                    (now, now - lease_seconds)
+                )
+
+                running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+                if running >= max_running:
+                    conn.execute("COMMIT")
+                    return None
+
+                job = conn.execute(
+                    """SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ?
+                       ORDER BY priority DESC, created_at LIMIT 1""",
+                    (now,)
+                ).fetchone()
+                if job is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                conn.execute(
+                    """UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                       started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?""",
+                    (worker, now, now, job["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(job["id"])
+
+    def heartbeat(self, job_id: str, worker: str, attempt: int, progress: str | None = None) -> bool:
+        """
+        Refresh the lease held by worker for this attempt; returns True if the
+        worker should stop, because cancellation was requested or the job was
+        handed to another worker after the lease expired.
+        """
+        with self._lock:
+            conn = self._connect()
+            updated = conn.execute(
+                """UPDATE jobs SET heartbeat_at = ?, progress = COALESCE(?, progress)
+                   WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'""",
+                (time.time(), progress, job_id, worker, attempt)
+            ).rowcount
+            if not updated:
+                logger.warning(f"Worker {worker} lost its lease on job {job_id} (attempt {attempt})")
+                return True
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def complete(self, job_id: str, worker: str, attempt: int) -> None:
+        self._finish(job_id, worker, attempt, "succeeded", None)
+
+    def fail(self, job_id: str, worker: str, attempt: int, error: str) -> dict:
+        """Requeue with backoff if attempts remain, otherwise mark it failed"""
+        job = self.get(job_id)
+        if job and job["attempts"] < job["max_attempts"] and not job["cancel_requested"]:
+            backoff = 30 * 2 ** (job["attempts"] - 1)
+            with self._lock:
+                updated = self._connect().execute(
+                    """UPDATE jobs SET status = 'queued', worker = NULL, error = ?, available_at = ?
+                       WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'""",
+                    (error[:500], time.time() + backoff, job_id, worker, attempt)
+                ).rowcount
+            if updated:
+                logger.warning(f"Job {job_id} failed (attempt {job['attempts']}/{job['max_attempts']}), retrying in {backoff}s")
+        else:
+            self._finish(job_id, worker, attempt, "failed", error[:500])
+        return self.get(job_id)
+
+    def mark_cancelled(self, job_id: str, worker: str, attempt: int) -> None:
+        self._finish(job_id, worker, attempt, "cancelled", None)
+
+    def cancel(self, job_id: str) -> dict | None:
+        """
+        Cancel a queued job right away; a running job is flagged and stopped
+        by its worker on the next heartbeat.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (now, job_id)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_for_repo(self, repo_id: str, kind: str | None = None) -> dict | None:
+        query = "SELECT * FROM jobs WHERE repo_id = ?"
+        params = [repo_id]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            row = self._connect().execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def _finish(self, job_id: str, worker: str, attempt: int, status: str, error: str | None) -> None:
+        # Only the worker still holding this attempt's lease may finish it
+        with self._lock:
+            updated = self._connect().execute(
+                """UPDATE jobs SET status = ?, error = ?, finished_at = ?, worker = NULL
+                   WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'""",
+                (status, error, time.time(), job_id, worker, attempt)
+            ).rowcount
+        if not updated:
+            logger.warning(f"Not marking job {job_id} {status}: worker {worker} no longer holds attempt {attempt}")
+
+
+job_queue = JobQueue(os.path.join(data_dir, "jobs.sqlite3"))
@@ -0,0 +1,172 @@
+# backend/app/services/lexical_index.py
+"""
+Per-repo lexical index over chunk text, used next to Qdrant in /api/ask.
+
+Chunks are indexed as code-aware tokens: every identifier is kept whole
+(lowercased) and also split on snake_case and camelCase boundaries, so
+"getUserById" matches questions about "user" and "get_user_by_id" alike.
+Tokens go into an SQLite FTS5 table per repo and are ranked with its
+built-in BM25.
+
+Layout: DATA_DIR/lexical/<repo_id>.sqlite3 with
+    chunk_rows  rowid, point_id, file_path (indexed), payload JSON
+    chunk_fts   FTS5 over the tokens, same rowid
+Rows are replaced per file during ingestion, so incremental runs only touch
+changed files.
+"""
+from app.config import data_dir
+import json
+import logging
+import os
+import re
+import sqlite3
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+WORD_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Question words that would otherwise match comments and docstrings everywhere
+QUERY_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "of", "on", "or", "show", "that", "the", "this", "to", "what",
+    "when", "where", "which", "who", "why", "with", "work", "works", "you",
+}
+MAX_QUERY_TOKENS = 32
+
+
+def code_tokens(text: str) -> list[str]:
+    tokens = []
+    for identifier in IDENTIFIER.findall(text):
+        if len(identifier) < 2:
+            continue
+        tokens.append(identifier.lower())
+        parts = [part.lower() for piece in identifier.split("_") for part in WORD_PART.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+def query_tokens(question: str) -> list[str]:
+    tokens = [token for token in dict.fromkeys(code_tokens(question)) if token not in QUERY_STOPWORDS]
+    return tokens[:MAX_QUERY_TOKENS]
+
+
+class LexicalIndex:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, repo_id: str) -> str:
+        return os.path.join(self.root, f"{repo_id}.sqlite3")
+
+    def exists(self, repo_id: str) -> bool:
+        return os.path.exists(self.path(repo_id))
+
+    def _connect(self, repo_id: str) -> sqlite3.Connection:
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.path(repo_id), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_rows (
+                rowid INTEGER PRIMARY KEY,
+                point_id TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS chunk_rows_file ON chunk_rows (file_path)")
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(tokens, tokenize=\"unicode61 tokenchars '_'\")")
+        return conn
+
+    def _delete_paths(self, conn: sqlite3.Connection, paths: list[str]) -> None:
+        for path in paths:
+            rowids = [(row[0],) for row in conn.execute("SELECT rowid FROM chunk_rows WHERE file_path = ?", (path,))]
+            conn.executemany("DELETE FROM chunk_fts WHERE rowid = ?", rowids)
+            conn.executemany("DELETE FROM chunk_rows WHERE rowid = ?", rowids)
+
+    def replace_file(self, repo_id: str, file_path: str, rows: list[tuple[str, dict, str]]) -> None:
+        """Make (point_id, payload, text) rows the indexed chunks of file_path"""
+        conn = self._connect(repo_id)
+        try:
+            with conn:
+                self._delete_paths(conn, [file_path])
+                for point_id, payload, text in rows:
+                    cursor = conn.execute(
+                        "INSERT INTO chunk_rows (point_id, file_path, payload) VALUES (?, ?, ?)",
+                        (str(point_id), file_path, json.dumps(payload))
+                    )
+                    conn.execute("INSERT INTO chunk_fts (rowid, tokens) VALUES (?, ?)", (cursor.lastrowid, " ".join(code_tokens(text))))
+        finally:
+            conn.close()
+
+    def delete_files(self, repo_id: str, paths: list[str]) -> None:
+        conn = self._connect(repo_id)
+        try:
+            with conn:
+                self._delete_paths(conn, paths)
+        finally:
+            conn.close()
+
+    def clear(self, repo_id: str) -> None:
+        """Empty the index in place; readers may still have the file open"""
+        conn = self._connect(repo_id)
+        try:
+            with conn:
+                conn.execute("DELETE FROM chunk_rows")
+                conn.execute("DELETE FROM chunk_fts")
+        finally:
+            conn.close()
+
+    def rewrite_point_ids(self, repo_id: str, new_id) -> int:
+        """Replace each row's point_id with new_id(payload); used when points move collections"""
+        if not self.exists(repo_id):
+            return 0
+        conn = self._connect(repo_id)
+        try:
+            with conn:
+                rows = conn.execute("SELECT rowid, payload FROM chunk_rows").fetchall()
+                conn.executemany(
+                    "UPDATE chunk_rows SET point_id = ? WHERE rowid = ?",
+                    [(str(new_id(json.loads(payload))), rowid) for rowid, payload in rows]
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def search(self, repo_id: str, question: str, limit: int) -> list[dict]:
+        """Best BM25 matches as {"id", "score", "payload"}; [] without an index"""
+        tokens = query_tokens(question)
+        if not tokens or not self.exists(repo_id):
+            return []
+
+        # Tokens are [a-z0-9_] only, so quoting them is enough to escape FTS5 syntax
+        match = " OR ".join(f'"{token}"' for token in tokens)
+        conn = sqlite3.connect(f"file:{self.path(repo_id)}?mode=ro", uri=True, timeout=5)
+        try:
+            rows = conn.execute("""
+                SELECT r.point_id, r.payload, m.rank
+                FROM (SELECT rowid, rank FROM chunk_fts WHERE chunk_fts MATCH ? ORDER BY rank LIMIT ?) AS m
+                JOIN chunk_rows AS r ON r.rowid = m.rowid
+                ORDER BY m.rank
+            """, (match, limit)).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Lexical search failed for repo {repo_id}: {e}")
+            return []
+        finally:
+            conn.close()
+        # FTS5 ranks are negated BM25 scores; ids in Qdrant's canonical UUID form so fusion can match them
+        return [
+            {"id": str(uuid.UUID(point_id)), "score": -rank, "payload": json.loads(payload)}
+            for point_id, payload, rank in rows
+        ]
+
+    def delete(self, repo_id: str) -> None:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path(repo_id) + suffix)
+            except FileNotFoundError:
+                pass
+
+
+lexical_index = LexicalIndex(os.path.join(data_dir, "lexical"))
@@ -0,0 +1,57 @@
+# backend/app/services/manifest.py
+"""
+Per-repo ingestion manifest: file path -> content hash and Qdrant point IDs.
+
+ingest_repo compares the manifest from the previous run against the freshly
+cloned tree so only added or changed files are re-embedded, and points and
+graph nodes of changed or deleted files can be removed.
+"""
+from app.config import data_dir
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = os.path.join(data_dir, "manifests")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def manifest_path(repo_id: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{repo_id}.json")
+
+
+def load_manifest(repo_id: str) -> dict:
+    """
+    Return {"version": int, "files": {path: {"hash": str, "points": [ids]}}},
+    or an empty manifest if the repo was never ingested.
+    """
+    try:
+        with open(manifest_path(repo_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": None, "files": {}}
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable manifest for repo {repo_id}: {e}")
+        return {"version": None, "files": {}}
+
+
+def save_manifest(repo_id: str, manifest: dict) -> None:
+    # Write then rename so a crash never leaves a half-written manifest
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(repo_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def delete_manifest(repo_id: str) -> None:
+    try:
+        os.remove(manifest_path(repo_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,155 @@
+# backend/app/services/metrics.py
+"""
+Prometheus metrics and optional trace spans for ingestion and /api/ask.
+
+Ingestion runs in worker processes and questions in the API process, so
+prometheus_client runs in multiprocess mode: every process writes its
+samples to files in METRICS_DIR and /api/metrics aggregates them. Clear that
+directory when redeploying, before the API and workers start.
+
+ingest_stage() and ask_step() time a block into a per-stage histogram and,
+with TRACING_ENABLED=1, also record a span carrying the repo_id. With
+METRICS_ENABLED=0 every metric here is a shared no-op object and both
+helpers return a no-op context manager, so instrumented code costs one
+function call per block.
+"""
+from app.config import metrics_enabled, metrics_dir, tracing_enabled
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger("app.trace")
+
+# Seconds; ingestion stages run from milliseconds (one file) to minutes (a clone)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+ASK_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+if metrics_enabled:
+    # Must be set before prometheus_client creates any metric
+    os.makedirs(metrics_dir, exist_ok=True)
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", metrics_dir)
+    from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    from prometheus_client import CONTENT_TYPE_LATEST
+else:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+otel_tracer = None
+if tracing_enabled:
+    try:
+        from opentelemetry import trace
+        otel_tracer = trace.get_tracer("codebase-intelligence")
+    except ImportError:
+        logger.info("opentelemetry is not installed, trace spans go to the app.trace logger")
+
+
+class _NullMetric:
+    """Stands in for every metric when metrics are disabled"""
+
+    def labels(self, *args, **kwargs) -> "_NullMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_METRIC = _NullMetric()
+_NULL_TIMER = _NullTimer()
+
+
+def _histogram(name: str, documentation: str, labels: tuple = (), buckets: tuple = STAGE_BUCKETS):
+    return Histogram(name, documentation, labels, buckets=buckets) if metrics_enabled else _NULL_METRIC
+
+
+def _counter(name: str, documentation: str, labels: tuple = ()):
+    return Counter(name, documentation, labels) if metrics_enabled else _NULL_METRIC
+
+
+# Ingestion
+INGEST_STAGE_SECONDS = _histogram(
+    "cip_ingest_stage_seconds",
+    "Time per ingestion stage: clone, read, embed, upsert and graph per file or batch; graph_flush, snapshot, total per run",
+    ("stage",),
+)
+INGEST_RUNS = _counter("cip_ingest_runs", "Finished ingestions by result (ready, error, cancelled)", ("result",))
+INGEST_FILES = _counter("cip_ingest_files", "Files seen by ingestion by outcome (embedded, unchanged, deleted)", ("outcome",))
+SCAN_SKIPPED = _counter("cip_scan_skipped_files", "Files and directories the scanner skipped, by reason", ("reason",))
+
+# Voyage requests made by embed_with_retry
+EMBED_REQUEST_SECONDS = _histogram(
+    "cip_embed_request_seconds", "Time per embed_with_retry call including retries and backoff, by result (ok, rate_limited, error)", ("result",)
+)
+EMBED_TEXTS = _counter("cip_embed_texts", "Texts sent to Voyage")
+EMBED_RETRIES = _counter("cip_embed_retries", "Voyage requests retried after a rate limit")
+EMBED_BACKOFF_SECONDS = _counter("cip_embed_backoff_seconds", "Time spent sleeping before Voyage retries")
+
+# /api/ask
+ASK_STEP_SECONDS = _histogram(
+    "cip_ask_step_seconds",
+    "Time per /api/ask step: repo, embed, search, load_text, graph, pack, first_token (from request start), generate, total",
+    ("step",),
+    ASK_BUCKETS,
+)
+ASK_REQUESTS = _counter("cip_ask_requests", "Questions by where their retrieval came from (search, retrieval_cache, semantic_cache)", ("retrieval",))
+ASK_ERRORS = _counter("cip_ask_errors", "Failed or abandoned questions by reason (timeout, generate, disconnected)", ("reason",))
+
+
+class _Timer:
+    __slots__ = ("histogram", "name", "attributes", "span", "started")
+
+    def __init__(self, histogram, name: str, attributes: dict):
+        self.histogram = histogram
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        if otel_tracer is not None:
+            self.span = otel_tracer.start_as_current_span(self.name, attributes=self.attributes)
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self.started
+        self.histogram.observe(elapsed)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        elif tracing_enabled:
+            status = "error" if exc_type else "ok"
+            trace_logger.info(f"span {self.name} {status} {elapsed * 1000:.1f}ms {self.attributes}")
+        return False
+
+
+def _timed(histogram, kind: str, step: str, repo_id) -> _Timer | _NullTimer:
+    if not metrics_enabled and not tracing_enabled:
+        return _NULL_TIMER
+    return _Timer(histogram.labels(step), f"{kind}.{step}", {"repo_id": str(repo_id)} if repo_id is not None else {})
+
+
+def ingest_stage(stage: str, repo_id=None) -> _Timer | _NullTimer:
+    """Context manager timing one ingestion stage"""
+    return _timed(INGEST_STAGE_SECONDS, "ingest", stage, repo_id)
+
+
+def ask_step(step: str, repo_id=None) -> _Timer | _NullTimer:
+    """Context manager timing one /api/ask step"""
+    return _timed(ASK_STEP_SECONDS, "ask", step, repo_id)
+
+
+def render_metrics() -> bytes:
+    """Samples from every process, in Prometheus text format"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
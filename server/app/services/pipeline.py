@@ -0,0 +1,146 @@
+# backend/app/services/pipeline.py
+"""
+Small asyncio pipeline used by ingest_repo.
+
+Each stage has its own workers and reads from a bounded queue, so slow
+network-bound stages overlap instead of running one after another, and
+memory stays bounded by the queue sizes. Queue fill is sampled on every put
+so stats() shows which stage is the bottleneck: the stage *after* a queue
+that stays full is the slow one.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: int = 64
+    # Batch stages receive a list of items whose total weight stays under
+    # max_batch_weight (at least one item per call)
+    batch_weight: Callable[[Any], int] | None = None
+    max_batch_weight: int = 0
+
+    queue: asyncio.Queue = field(init=False, repr=False)
+    processed: int = field(default=0, init=False)
+    busy_seconds: float = field(default=0.0, init=False)
+    fill_samples: int = field(default=0, init=False)
+    fill_total: int = field(default=0, init=False)
+    fill_max: int = field(default=0, init=False)
+
+    async def put(self, item) -> None:
+        await self.queue.put(item)
+        size = self.queue.qsize()
+        self.fill_samples += 1
+        self.fill_total += size
+        self.fill_max = max(self.fill_max, size)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue.maxsize,
+            "queue_fill_avg": round(self.fill_total / self.fill_samples / self.queue.maxsize, 3) if self.fill_samples else 0.0,
+            "queue_fill_max": self.fill_max,
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class Pipeline:
+    """
+    Runs items from a (possibly blocking) iterable through a chain of stages.
+    A stage's fn returns the item for the next stage, None to drop it, or a
+    list of items when it is a batch stage.
+    """
+
+    def __init__(self, name: str, stages: list[Stage]):
+        self.name = name
+        self.stages = stages
+
+    async def run(self, source: Iterable) -> dict:
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=max(1, stage.queue_size))
+
+        tasks = [asyncio.create_task(self._feed(source))]
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            workers = [asyncio.create_task(self._work(stage, next_stage)) for _ in range(max(1, stage.concurrency))]
+            tasks.append(asyncio.create_task(self._close_after(workers, next_stage)))
+            tasks.extend(workers)
+
+        try:
+            # Fail fast: the first stage error cancels everything else
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stats = self.stats()
+        logger.info(f"Pipeline {self.name} stats: {stats}")
+        return stats
+
+    def stats(self) -> dict:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    async def _feed(self, source: Iterable) -> None:
+        first = self.stages[0]
+        iterator = iter(source)
+        while True:
+            # Discovery may walk the filesystem, so pull items off-loop
+            item = await asyncio.to_thread(next, iterator, _DONE)
+            if item is _DONE:
+                break
+            await first.put(item)
+        for _ in range(max(1, first.concurrency)):
+            await first.queue.put(_DONE)
+
+    async def _close_after(self, workers: list[asyncio.Task], next_stage: Stage | None) -> None:
+        await asyncio.gather(*workers)
+        if next_stage is not None:
+            for _ in range(max(1, next_stage.concurrency)):
+                await next_stage.queue.put(_DONE)
+
+    async def _work(self, stage: Stage, next_stage: Stage | None) -> None:
+        while True:
+            item = await stage.queue.get()
+            if item is _DONE:
+                return
+
+            if stage.batch_weight is not None:
+                batch, weight = [item], stage.batch_weight(item)
+                finished = False
+                while weight < stage.max_batch_weight and not stage.queue.empty():
+                    extra = stage.queue.get_nowait()
+                    if extra is _DONE:
+                        finished = True
+                        break
+                    batch.append(extra)
+                    weight += stage.batch_weight(extra)
+                item = batch
+            else:
+                finished = False
+
+            started = time.perf_counter()
+            result = await stage.fn(item)
+            stage.busy_seconds += time.perf_counter() - started
+            stage.processed += len(item) if stage.batch_weight is not None else 1
+
+            if next_stage is not None and result is not None:
+                for out in (result if isinstance(result, list) else [result]):
+                    await next_stage.put(out)
+            if finished:
+                return
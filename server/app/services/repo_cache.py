@@ -0,0 +1,90 @@
+# backend/app/services/repo_cache.py
+"""
+Short-lived cache of rows from the Supabase `repos` table.
+
+/api/ask used to make a Supabase round trip per question just to read the
+repo's collection and status. Rows are cached per repo_id with a short TTL;
+routes and jobs write through update(). A status change drops the repo's
+entries, and a lookup that started before the drop doesn't store its
+(older) row, so /api/ask never answers from a repo that has just been
+marked deleting or sent back to ingestion. Keys also carry the repo's
+index version, so when a worker process finishes or fails an ingestion (and
+bumps the version) the API process stops serving the old row immediately.
+
+Callers always get a copy of the row, so nothing mutates a cached entry.
+"""
+from app.config import supabase, get_async_supabase, repo_cache_ttl_seconds, repo_cache_max_entries
+from app.services.cache import TTLCache
+from app.services.index_version import get_index_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RepoCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self._cache = TTLCache("repos", max_entries, ttl_seconds)
+        # Bumped by invalidate(); lookups only store rows read under the same value
+        self._generations = {}
+
+    def _key(self, repo_id: str) -> tuple:
+        return (str(repo_id), get_index_version(str(repo_id)))
+
+    def get_sync(self, repo_id: str, refresh: bool = False) -> dict | None:
+        """Return the repo row, or None if it doesn't exist"""
+        key = self._key(repo_id)
+        row = None if refresh else self._cache.get(key)
+        if row is None:
+            generation = self._generations.get(key[0], 0)
+            rows = supabase.table("repos").select("*").eq("id", str(repo_id)).limit(1).execute().data
+            if not rows:
+                return None
+            row = rows[0]
+            self._store(key, generation, row)
+        return dict(row)
+
+    async def get(self, repo_id: str, refresh: bool = False) -> dict | None:
+        key = self._key(repo_id)
+        row = None if refresh else self._cache.get(key)
+        if row is None:
+            generation = self._generations.get(key[0], 0)
+            client = await get_async_supabase()
+            rows = (await client.table("repos").select("*").eq("id", str(repo_id)).limit(1).execute()).data
+            if not rows:
+                return None
+            row = rows[0]
+            self._store(key, generation, row)
+        return dict(row)
+
+    def _store(self, key: tuple, generation: int, row: dict) -> None:
+        # Skip rows read before an invalidate(); they may predate a status change
+        if self._generations.get(key[0], 0) == generation:
+            self._cache.set(key, row)
+
+    def update(self, repo_id: str, fields: dict) -> None:
+        """
+        Write fields to Supabase and to the cached row, if any. Status
+        changes invalidate instead, so the next lookup reads the new row.
+        """
+        supabase.table("repos").update(fields).eq("id", str(repo_id)).execute()
+        if "status" in fields:
+            self.invalidate(repo_id)
+            return
+        repo_id = str(repo_id)
+        key = self._key(repo_id)
+        # Drop entries for older index versions; refresh the current one
+        self._cache.discard_where(lambda cached_key: cached_key[0] == repo_id and cached_key != key)
+        row = self._cache.get(key)
+        if row is not None:
+            self._cache.set(key, {**row, **fields})
+
+    def invalidate(self, repo_id: str) -> None:
+        repo_id = str(repo_id)
+        self._generations[repo_id] = self._generations.get(repo_id, 0) + 1
+        self._cache.discard_where(lambda key: key[0] == repo_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+repo_cache = RepoCache(repo_cache_ttl_seconds, repo_cache_max_entries)
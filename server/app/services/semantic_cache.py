@@ -0,0 +1,140 @@
+# backend/app/services/semantic_cache.py
+"""
+Per-repo semantic cache for /api/ask retrieval results.
+
+Recent question embeddings are kept, L2-normalised, in a compact float32
+matrix per repo. A new question whose cosine similarity to a stored one is at
+least the threshold reuses that question's retrieval results, so rephrasings
+skip the Qdrant and Neo4j round trips. A repo's entries are dropped as soon
+as its index version changes.
+
+Matrices grow as questions arrive rather than being allocated at full
+capacity, and only the max_repos repos asked about most recently are kept.
+"""
+from app.config import semantic_cache_max_entries, semantic_cache_max_repos, semantic_cache_threshold
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+
+
+# Rows allocated for a repo's first question; doubled as needed up to capacity
+INITIAL_ROWS = 8
+
+
+class _RepoEntries:
+    def __init__(self, version: int, dim: int, capacity: int):
+        self.version = version
+        self.capacity = capacity
+        rows = min(INITIAL_ROWS, capacity)
+        self.matrix = np.zeros((rows, dim), dtype=np.float32)
+        self.last_used = np.zeros(rows, dtype=np.float64)
+        self.results = []
+        self.count = 0
+
+    def append_slot(self) -> int:
+        if self.count == len(self.matrix):
+            rows = min(2 * len(self.matrix), self.capacity)
+            matrix = np.zeros((rows, self.matrix.shape[1]), dtype=np.float32)
+            matrix[:self.count] = self.matrix
+            last_used = np.zeros(rows, dtype=np.float64)
+            last_used[:self.count] = self.last_used
+            self.matrix, self.last_used = matrix, last_used
+        self.results.append(None)
+        self.count += 1
+        return self.count - 1
+
+
+class SemanticCache:
+    def __init__(self, max_entries_per_repo: int, threshold: float, max_repos: int = semantic_cache_max_repos):
+        self.max_entries_per_repo = max_entries_per_repo
+        self.max_repos = max(1, max_repos)
+        self.threshold = threshold
+        self._repos = OrderedDict()  # least recently used repo first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries_per_repo > 0
+
+    def _entries(self, repo_id: str, version: int) -> _RepoEntries | None:
+        entries = self._repos.get(repo_id)
+        if entries is not None and entries.version != version:
+            # Repo was re-indexed: nothing cached for it is valid any more
+            del self._repos[repo_id]
+            return None
+        if entries is not None:
+            self._repos.move_to_end(repo_id)
+        return entries
+
+    def lookup(self, repo_id: str, version: int, embedding: list[float]):
+        """Return cached results for the most similar stored question, or None"""
+        if not self.enabled:
+            return None
+        query = _normalize(embedding)
+        with self._lock:
+            entries = self._entries(repo_id, version)
+            if entries is None or entries.count == 0 or entries.matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = entries.matrix[:entries.count] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entries.last_used[best] = time.monotonic()
+            self.hits += 1
+            return entries.results[best]
+
+    def add(self, repo_id: str, version: int, embedding: list[float], result) -> None:
+        if not self.enabled:
+            return
+        vector = _normalize(embedding)
+        with self._lock:
+            entries = self._entries(repo_id, version)
+            if entries is None or entries.matrix.shape[1] != vector.shape[0]:
+                entries = _RepoEntries(version, vector.shape[0], self.max_entries_per_repo)
+                self._repos[repo_id] = entries
+                self._repos.move_to_end(repo_id)
+                while len(self._repos) > self.max_repos:
+                    self._repos.popitem(last=False)
+
+            if entries.count < self.max_entries_per_repo:
+                slot = entries.append_slot()
+            else:
+                # Replace the least recently used question
+                slot = int(np.argmin(entries.last_used))
+
+            entries.matrix[slot] = vector
+            entries.last_used[slot] = time.monotonic()
+            entries.results[slot] = result
+
+    def invalidate(self, repo_id: str) -> None:
+        with self._lock:
+            self._repos.pop(repo_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "repos": len(self._repos),
+            "entries": sum(entries.count for entries in self._repos.values()),
+            "max_entries_per_repo": self.max_entries_per_repo,
+            "max_repos": self.max_repos,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+semantic_cache = SemanticCache(semantic_cache_max_entries, semantic_cache_threshold, semantic_cache_max_repos)
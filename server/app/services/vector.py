@@ -0,0 +1,190 @@
+# backend/app/services/vector.py
+"""
+Qdrant collection profiles and per-repo vector storage.
+
+A profile (COLLECTION_PROFILES in app/utils/collection_profiles.py) fixes
+how a repo's collection stores vectors: quantization with rescoring, on-disk
+vectors, HNSW m/ef_construct, plus the hnsw_ef and oversampling its
+searches use.
+Every collection also gets keyword payload indexes on file_path and type.
+
+The profile a repo's collection was created with is recorded under
+DATA_DIR/collection_profiles, so searches match the collection even after
+the configured default changes.
+
+With QDRANT_STORAGE_MODE=shared, repos live in one shared collection
+instead of one collection each. Points carry a tenant-indexed repo_id; the
+collection builds its HNSW graph per tenant (payload_m, m=0), searches
+filter on repo_id and deleting a repo deletes its points by filter. The
+shared collection keeps the profile it was created with, recorded next to
+the per-repo ones; repos in it are indexed and searched with that profile
+(target_profile), whatever the configured default is now.
+"""
+from app.config import (
+    data_dir, qdrant_collection_profile, qdrant_storage_mode, qdrant_shared_collection
+)
+from app.utils.collection_profiles import COLLECTION_PROFILES, collection_params
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_INDEXES = ("file_path", "type")
+PROFILE_DIR = os.path.join(data_dir, "collection_profiles")
+
+
+def point_id(repo_id: str, file_path: str, index: int | str) -> str:
+    """Point ID for chunk `index` (or "FULL") of a file, unique across repos"""
+    return hashlib.md5(f"{repo_id}:{file_path}#{index}".encode()).hexdigest()
+
+
+def create_collection(
+    client: QdrantClient,
+    collection_name: str,
+    profile_name: str = qdrant_collection_profile,
+    shared: bool = False,
+) -> None:
+    """(Re)create a collection with the given profile and its payload indexes"""
+    params = collection_params(profile_name, shared)
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **params)
+    if shared:
+        client.create_payload_index(
+            collection_name, field_name="repo_id",
+            field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+        )
+    for field in PAYLOAD_INDEXES:
+        client.create_payload_index(collection_name, field_name=field, field_schema=models.PayloadSchemaType.KEYWORD)
+    if shared:
+        _write_profile(_shared_profile_path(collection_name), profile_name)
+    logger.info(f"Created Qdrant collection {collection_name} with profile {profile_name}{' (shared)' if shared else ''}")
+
+
+def repo_collection(repo_id: str) -> str:
+    """Collection new vectors of repo_id go to under the configured storage mode"""
+    return qdrant_shared_collection if qdrant_storage_mode == "shared" else f"repo_{repo_id}"
+
+
+def is_shared(collection_name: str | None) -> bool:
+    return collection_name == qdrant_shared_collection
+
+
+def repo_filter(repo_id: str) -> models.Filter:
+    return models.Filter(must=[models.FieldCondition(key="repo_id", match=models.MatchValue(value=str(repo_id)))])
+
+
+def query_filter(repo_id: str, collection_name: str) -> models.Filter | None:
+    """Restrict a search to repo_id when its collection is shared"""
+    return repo_filter(repo_id) if is_shared(collection_name) else None
+
+
+def ensure_shared_collection(client: QdrantClient, profile_name: str = qdrant_collection_profile) -> None:
+    if not client.collection_exists(qdrant_shared_collection):
+        create_collection(client, qdrant_shared_collection, profile_name, shared=True)
+
+
+def _profile_matches(profile: dict, config: models.CollectionConfig) -> bool:
+    vectors = config.params.vectors
+    quantization = config.quantization_config
+    quantization_type = (
+        "scalar" if isinstance(quantization, models.ScalarQuantization)
+        else "binary" if isinstance(quantization, models.BinaryQuantization)
+        else None
+    )
+    return (
+        config.hnsw_config.payload_m == profile["hnsw_m"]
+        and config.hnsw_config.ef_construct == profile["hnsw_ef_construct"]
+        and bool(config.hnsw_config.on_disk) == profile["hnsw_on_disk"]
+        and bool(getattr(vectors, "on_disk", False)) == profile["on_disk"]
+        and quantization_type == profile["quantization"]
+    )
+
+
+def shared_collection_profile(client: QdrantClient) -> str | None:
+    """Profile the shared collection was created with, or None if it doesn't exist"""
+    if not client.collection_exists(qdrant_shared_collection):
+        return None
+    path = _shared_profile_path(qdrant_shared_collection)
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    # Created before its profile was recorded: recognise it by its storage settings
+    config = client.get_collection(qdrant_shared_collection).config
+    matches = [name for name, profile in COLLECTION_PROFILES.items() if _profile_matches(profile, config)]
+    if not matches:
+        logger.warning(f"Shared collection {qdrant_shared_collection} matches no collection profile")
+        return None
+    profile_name = qdrant_collection_profile if qdrant_collection_profile in matches else matches[0]
+    _write_profile(path, profile_name)
+    return profile_name
+
+
+def target_profile(client: QdrantClient, collection_name: str) -> str:
+    """
+    Profile a repo's points in collection_name should be indexed with: the
+    shared collection's own profile, or the configured one for collections
+    (re)created per repo.
+    """
+    if is_shared(collection_name):
+        return shared_collection_profile(client) or qdrant_collection_profile
+    return qdrant_collection_profile
+
+
+def reset_repo_points(client: QdrantClient, repo_id: str, collection_name: str, profile_name: str = qdrant_collection_profile) -> None:
+    """Start a repo's vectors from scratch: recreate its collection, or clear its share of the shared one"""
+    if is_shared(collection_name):
+        ensure_shared_collection(client, profile_name)
+        drop_repo_points(client, repo_id, collection_name)
+    else:
+        create_collection(client, collection_name, profile_name)
+
+
+def drop_repo_points(client: QdrantClient, repo_id: str, collection_name: str) -> None:
+    """Delete every point of repo_id: by filter in the shared collection, otherwise the whole collection"""
+    if is_shared(collection_name):
+        if client.collection_exists(collection_name):
+            client.delete(collection_name, points_selector=models.FilterSelector(filter=repo_filter(repo_id)))
+    elif client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+
+
+def _profile_path(repo_id: str) -> str:
+    return os.path.join(PROFILE_DIR, str(repo_id))
+
+
+def _shared_profile_path(collection_name: str) -> str:
+    return os.path.join(PROFILE_DIR, f"collection_{collection_name}")
+
+
+def _write_profile(path: str, profile_name: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(profile_name)
+    os.replace(tmp_path, path)
+
+
+def get_collection_profile(repo_id: str) -> str | None:
+    try:
+        with open(_profile_path(repo_id), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_collection_profile(repo_id: str, profile_name: str) -> None:
+    _write_profile(_profile_path(repo_id), profile_name)
+
+
+def delete_collection_profile(repo_id: str) -> None:
+    try:
+        os.remove(_profile_path(repo_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,75 @@
+# backend/app/services/worker.py
+"""
+Job worker loop, run in processes separate from the API (see worker.py).
+
+Each worker process claims one job at a time from the SQLite job queue,
+runs its handler, heartbeats while it runs and cancels it when the job's
+cancellation flag is set or its lease expired and another worker claimed
+it; only the worker holding the current lease can finish a job. Handlers get a progress dict they may update; it
+is saved with every heartbeat and handed back when a job is retried.
+"""
+from app.config import neo4j_driver, job_poll_seconds, job_heartbeat_seconds
+from app.services.graph import ensure_graph_schema
+from app.services.jobs import job_queue
+from app.services.ingestion import ingest_repo
+from app.services.deletion import delete_repo
+from app.services.repo_cache import repo_cache
+import asyncio
+import json
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+# kind -> coroutine function taking the repo_id and the job's progress dict
+JOB_HANDLERS = {
+    "ingest": ingest_repo,
+    "delete": delete_repo,
+}
+
+
+async def run_job(job: dict) -> None:
+    # The lease this worker holds; a job reclaimed as stale gets another one
+    lease = (job["id"], job["worker"], job["attempts"])
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        await asyncio.to_thread(job_queue.fail, *lease, f"Unknown job kind: {job['kind']}")
+        return
+
+    progress = json.loads(job["progress"]) if job.get("progress") else {}
+    task = asyncio.create_task(handler(job["repo_id"], progress))
+    while not task.done():
+        await asyncio.wait({task}, timeout=job_heartbeat_seconds)
+        if not task.done() and await asyncio.to_thread(job_queue.heartbeat, *lease, json.dumps(progress)):
+            logger.info(f"Cancelling job {job['id']} for repo {job['repo_id']}")
+            task.cancel()
+    await asyncio.to_thread(job_queue.heartbeat, *lease, json.dumps(progress))
+
+    try:
+        task.result()
+    except asyncio.CancelledError:
+        await asyncio.to_thread(job_queue.mark_cancelled, *lease)
+        # Ingestion records its own cancellation on the repo
+        if job["kind"] == "delete":
+            # Partially deleted; only another deletion can finish it
+            await asyncio.to_thread(repo_cache.update, job["repo_id"], {"error_message": "Deletion cancelled"})
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed with exception: {e}", exc_info=True)
+        await asyncio.to_thread(job_queue.fail, *lease, str(e))
+    else:
+        await asyncio.to_thread(job_queue.complete, *lease)
+
+
+async def run_worker(worker_name: str | None = None) -> None:
+    worker_name = worker_name or f"{socket.gethostname()}:{os.getpid()}"
+    await asyncio.to_thread(ensure_graph_schema, neo4j_driver)
+    logger.info(f"Worker {worker_name} started")
+    while True:
+        job = await asyncio.to_thread(job_queue.claim, worker_name)
+        if job is None:
+            await asyncio.sleep(job_poll_seconds)
+            continue
+
+        logger.info(f"Worker {worker_name} running {job['kind']} job {job['id']} for repo {job['repo_id']}")
+        await run_job(job)
@@ -0,0 +1,185 @@
+# backend/app/utils/chunking.py
+"""
+Chunking for embeddings.
+
+Files with a tree-sitter grammar are split on syntax node boundaries
+(functions, classes, methods): nodes that fit in max_chars stay whole,
+oversized ones are split along their children and finally by lines, and
+neighbouring small pieces are merged up to target_chars. Other files fall
+back to the fixed overlapping window chunker.
+
+Every chunk is {"text", "start_line", "end_line", "start_byte", "end_byte"}
+with 1-based, inclusive lines and byte offsets into the UTF-8 encoded file.
+Chunks start on their first line of code, so line ranges don't include the
+blank lines between definitions.
+
+The size limits are passed in (ingestion reads them from app.config), which
+keeps this module free of service clients and importable on its own.
+"""
+from bisect import bisect_right
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fallback window size and stride (chars); windows overlap by SIZE - STRIDE
+WINDOW_SIZE = 800
+WINDOW_STRIDE = 600
+
+
+def _line_starts(data: bytes) -> list[int]:
+    starts = [0]
+    pos = data.find(b"\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = data.find(b"\n", pos + 1)
+    return starts
+
+
+def _split_lines(data: bytes, start: int, end: int, max_bytes: int) -> list[tuple[int, int]]:
+    """Split [start, end) at line breaks so pieces fit max_bytes; hard-split very long lines"""
+    pieces = []
+    while end - start > max_bytes:
+        cut = data.rfind(b"\n", start, start + max_bytes)
+        cut = cut + 1 if cut > start else start + max_bytes
+        pieces.append((start, cut))
+        start = cut
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+
+def _split_node(node, data: bytes, start: int, end: int, max_bytes: int) -> list[tuple[int, int]]:
+    """
+    Cover [start, end) with pieces of at most max_bytes that end on child
+    boundaries of node. Text between children is attached to the child after it.
+    Walks the tree with an explicit stack, so deeply nested code can't hit
+    the recursion limit.
+    """
+    pieces = []
+    # (node, start, end) to split along the node's children, or (None, start, end) to split by lines
+    stack = [(node, start, end)]
+    while stack:
+        node, start, end = stack.pop()
+        if node is None:
+            pieces.extend(_split_lines(data, start, end, max_bytes))
+            continue
+        if end - start <= max_bytes:
+            pieces.append((start, end))
+            continue
+
+        parts = []
+        pos = start
+        for child in node.children:
+            child_end = min(child.end_byte, end)
+            if child_end <= pos:
+                continue
+            parts.append((child, pos, child_end))
+            pos = child_end
+
+        if not parts:
+            # A leaf (long string, comment) with nothing to split along
+            parts.append((None, start, end))
+        elif pos < end:
+            parts.append((None, pos, end))
+        stack.extend(reversed(parts))
+    return pieces
+
+
+def _code_start(data: bytes, start: int, end: int) -> int:
+    """Start of the first line in [start, end) with non-whitespace on it, or end if there is none"""
+    code = start + len(data[start:end]) - len(data[start:end].lstrip())
+    if code >= end:
+        return end
+    line_start = data.rfind(b"\n", start, code)
+    return start if line_start == -1 else line_start + 1
+
+
+def _snap_to_code(data: bytes, pieces: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Move each piece's start forward past the blank lines in front of it, so
+    that gap text (newlines, indentation) goes with the piece before and
+    every piece starts on a line of code or comment. Pieces stay contiguous.
+    """
+    snapped = []
+    start = _code_start(data, pieces[0][0], pieces[0][1]) if pieces else 0
+    for i, (_, end) in enumerate(pieces):
+        if i + 1 < len(pieces):
+            end = _code_start(data, end, pieces[i + 1][1])
+        if end > start:
+            snapped.append((start, end))
+            start = end
+    return snapped
+
+
+def _merge(pieces: list[tuple[int, int]], target_bytes: int) -> list[tuple[int, int]]:
+    merged = []
+    for start, end in pieces:
+        if merged and (end - merged[-1][0]) <= target_bytes:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def syntax_chunks(
+    content: str,
+    tree,
+    target_chars: int,
+    max_chars: int,
+) -> list[dict]:
+    data = content.encode()
+    root = tree.root_node
+    pieces = _split_node(root, data, 0, len(data), max(1, max_chars))
+    # Trailing text after the root node (e.g. final newline) goes with the last piece
+    if pieces and pieces[-1][1] < len(data):
+        pieces[-1] = (pieces[-1][0], len(data))
+
+    line_starts = _line_starts(data)
+    chunks = []
+    for start, end in _merge(_snap_to_code(data, pieces), max(1, target_chars)):
+        text = data[start:end].decode(errors="ignore")
+        if not text.strip():
+            continue
+        # Lines cover the code only, not the blank lines trailing the chunk
+        code_end = start + len(data[start:end].rstrip())
+        chunks.append({
+            "text": text,
+            "start_line": bisect_right(line_starts, start),
+            "end_line": bisect_right(line_starts, max(start, code_end - 1)),
+            "start_byte": start,
+            "end_byte": end,
+        })
+    return chunks
+
+
+def window_chunks(content: str) -> list[dict]:
+    """Fixed-size overlapping windows, used when no grammar is available"""
+    chunks = []
+    line = 1  # line number at the start of the current window
+    offset = 0  # byte offset of the current window
+    for i in range(0, len(content), WINDOW_STRIDE):
+        text = content[i:i + WINDOW_SIZE]
+        chunks.append({
+            "text": text,
+            "start_line": line,
+            "end_line": line + text.count("\n", 0, max(0, len(text) - 1)),
+            "start_byte": offset,
+            "end_byte": offset + len(text.encode()),
+        })
+        line += content.count("\n", i, i + WINDOW_STRIDE)
+        offset += len(content[i:i + WINDOW_STRIDE].encode())
+    return chunks
+
+
+def chunk_source(content: str, tree, target_chars: int, max_chars: int) -> list[dict]:
+    """Syntax-aware chunks when the file was parsed, overlapping windows otherwise"""
+    if tree is not None:
+        try:
+            chunks = syntax_chunks(content, tree, target_chars, max_chars)
+        except Exception as e:
+            # A chunking bug shouldn't fail the whole ingest; windows still index the file
+            logger.warning(f"Syntax chunking failed, using windows: {e}")
+            chunks = None
+        if chunks:
+            return chunks
+    return window_chunks(content)
@@ -0,0 +1,82 @@
+# backend/app/utils/collection_profiles.py
+"""
+Qdrant collection profiles and the collection/search parameters they map to.
+
+A profile fixes how a collection stores vectors (quantization with
+rescoring, on-disk vectors, HNSW m/ef_construct) and the hnsw_ef and
+oversampling its searches use. The configured default is
+QDRANT_COLLECTION_PROFILE in app/config.py; app/services/vector.py creates
+and tracks the collections.
+
+Only builds qdrant_client models, so benchmarks can import it without the
+service clients app.config creates.
+"""
+from qdrant_client.http import models
+
+VECTOR_SIZE = 1536  # voyage-code-2
+
+# Changing a repo's profile rebuilds its collection on the next analysis.
+#   small   - vectors and HNSW in RAM, int8 scalar quantization
+#   large   - original vectors on disk, int8 copy in RAM, denser graph
+#   archive - everything on disk except a binary-quantized copy, oversampled and rescored
+COLLECTION_PROFILES = {
+    "small": {
+        "on_disk": False, "quantization": "scalar", "hnsw_m": 16, "hnsw_ef_construct": 100,
+        "hnsw_on_disk": False, "hnsw_ef": 64, "oversampling": 1.5,
+    },
+    "large": {
+        "on_disk": True, "quantization": "scalar", "hnsw_m": 32, "hnsw_ef_construct": 200,
+        "hnsw_on_disk": False, "hnsw_ef": 128, "oversampling": 2.0,
+    },
+    "archive": {
+        "on_disk": True, "quantization": "binary", "hnsw_m": 16, "hnsw_ef_construct": 100,
+        "hnsw_on_disk": True, "hnsw_ef": 64, "oversampling": 3.0,
+    },
+}
+
+
+def get_profile(name: str) -> dict:
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown Qdrant collection profile: {name}")
+    return COLLECTION_PROFILES[name]
+
+
+def _quantization_config(profile: dict):
+    if profile["quantization"] == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile["quantization"] == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def collection_params(profile_name: str, shared: bool = False) -> dict:
+    """Keyword arguments for QdrantClient.create_collection under a profile"""
+    profile = get_profile(profile_name)
+    if shared:
+        # One HNSW graph per repo instead of a global one; searches always filter by repo
+        hnsw_config = models.HnswConfigDiff(
+            m=0, payload_m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"], on_disk=profile["hnsw_on_disk"]
+        )
+    else:
+        hnsw_config = models.HnswConfigDiff(
+            m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"], on_disk=profile["hnsw_on_disk"]
+        )
+    return {
+        "vectors_config": models.VectorParams(size=VECTOR_SIZE, distance=models.Distance.COSINE, on_disk=profile["on_disk"]),
+        "hnsw_config": hnsw_config,
+        "quantization_config": _quantization_config(profile),
+        "on_disk_payload": profile["on_disk"],
+    }
+
+
+def search_params(profile_name: str | None) -> models.SearchParams | None:
+    """Search parameters matching a profile; None (server defaults) for unknown collections"""
+    if profile_name not in COLLECTION_PROFILES:
+        return None
+    profile = COLLECTION_PROFILES[profile_name]
+    quantization = None
+    if profile["quantization"]:
+        quantization = models.QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"])
+    return models.SearchParams(hnsw_ef=profile["hnsw_ef"], quantization=quantization)
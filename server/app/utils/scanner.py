@@ -0,0 +1,264 @@
+# backend/app/utils/scanner.py
+"""
+Repository scanner: finds the files worth indexing in a cloned repo.
+
+The walk prunes excluded and .gitignore'd directories before descending
+into them, follows .gitignore files at every level (last matching rule wins,
+deeper files override shallower ones) and skips files .gitattributes marks
+linguist-generated or linguist-vendored. Candidate files are then checked
+cheaply: extension, size from the directory entry, and the first few KB for
+NUL bytes (binary) or very long lines (minified).
+
+RepoScanner is a generator of ScannedFile(path, rel, size, language)
+records; its stats count what was kept and why everything else was skipped.
+"""
+from app.config import scan_max_file_bytes
+from app.utils.tree_sitter import LANG_MAP
+from dataclasses import dataclass, field, asdict
+from typing import Iterator, NamedTuple
+import os
+import re
+
+# Directories never worth descending into
+EXCLUDED_DIRS = {
+    "node_modules",
+    "venv",
+    ".venv",
+    "env",
+    ".env",
+    "__pycache__",
+    ".git",
+    ".svn",
+    ".hg",
+    "dist",
+    "build",
+    ".next",
+    ".nuxt",
+    "target",
+    "vendor",
+    ".gradle",
+    ".idea",
+    ".vscode",
+    "coverage",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".tox",
+    "site-packages",
+    "bower_components",
+    "jspm_packages",
+}
+
+# Build outputs and codegen that slip past the directory rules
+GENERATED_SUFFIXES = (
+    ".min.js", "-min.js", ".bundle.js", ".chunk.js",
+    "_pb2.py", "_pb2_grpc.py", ".pb.go", ".gen.go", ".generated.ts",
+)
+
+HEADER_BYTES = 8192
+# A header averaging longer lines than this is minified or machine-written
+MINIFIED_LINE_LENGTH = 300
+
+
+class ScannedFile(NamedTuple):
+    path: str      # absolute path
+    rel: str       # path relative to the repo root, "/"-separated
+    size: int
+    language: str  # tree-sitter grammar name
+
+
+@dataclass
+class ScanStats:
+    files: int = 0
+    bytes: int = 0
+    skipped: dict = field(default_factory=lambda: {
+        "excluded_dirs": 0,
+        "gitignored": 0,
+        "generated": 0,
+        "vendored": 0,
+        "unsupported": 0,
+        "symlinks": 0,
+        "oversized": 0,
+        "binary": 0,
+        "minified": 0,
+    })
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _translate(pattern: str) -> str:
+    """Regex for a gitignore-style glob; '*' and '?' stop at '/', '**' doesn't"""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            chars = pattern[i + 1:end]
+            out.append("[" + ("^" + chars[1:] if chars.startswith("!") else chars) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def _compile(pattern: str) -> tuple[re.Pattern, bool]:
+    """Compile a pattern relative to its file's directory; returns (regex, dir_only)"""
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A slash anywhere but the end anchors the pattern to the file's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    prefix = "" if anchored else "(?:.*/)?"
+    # Matching a directory also matches everything under it
+    return re.compile(f"^{prefix}{_translate(pattern)}(?:/.*)?$"), dir_only
+
+
+class _Rules:
+    """Rules from every .gitignore / .gitattributes seen so far, root first"""
+
+    def __init__(self):
+        self.ignore = []      # (base, regex, dir_only, negate)
+        self.attributes = []  # (base, regex, {attribute: bool})
+
+    @staticmethod
+    def _relative(base: str, rel: str) -> str | None:
+        if not base:
+            return rel
+        return rel[len(base) + 1:] if rel.startswith(base + "/") else None
+
+    def load(self, directory: str, base: str) -> None:
+        for line in _read_lines(os.path.join(directory, ".gitignore")):
+            negate = line.startswith("!")
+            regex, dir_only = _compile(line[1:] if negate else line)
+            self.ignore.append((base, regex, dir_only, negate))
+
+        for line in _read_lines(os.path.join(directory, ".gitattributes")):
+            pattern, *attrs = line.split()
+            values = {}
+            for attr in attrs:
+                name, _, value = attr.lstrip("-!").partition("=")
+                if name in ("linguist-generated", "linguist-vendored"):
+                    values[name] = not attr.startswith(("-", "!")) and value.lower() not in ("false", "0")
+            if values:
+                self.attributes.append((base, _compile(pattern)[0], values))
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        result = False
+        for base, regex, dir_only, negate in self.ignore:
+            sub = self._relative(base, rel)
+            if sub is None or (dir_only and not is_dir):
+                continue
+            if regex.match(sub):
+                result = not negate
+        return result
+
+    def attribute(self, rel: str, name: str) -> bool:
+        result = False
+        for base, regex, values in self.attributes:
+            if name in values:
+                sub = self._relative(base, rel)
+                if sub is not None and regex.match(sub):
+                    result = values[name]
+        return result
+
+
+def _read_lines(path: str) -> list[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines = [line.rstrip("\n").rstrip() for line in f]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def _content_skip_reason(path: str) -> str | None:
+    """Cheap header check: 'binary', 'minified' or None"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+    except OSError:
+        return "binary"
+    if b"\0" in head:
+        return "binary"
+    if len(head) >= HEADER_BYTES // 2 and len(head) / (head.count(b"\n") + 1) > MINIFIED_LINE_LENGTH:
+        return "minified"
+    return None
+
+
+class RepoScanner:
+    def __init__(self, root: str, max_file_bytes: int = scan_max_file_bytes):
+        self.root = root
+        self.max_file_bytes = max_file_bytes
+        self.stats = ScanStats()
+
+    def __iter__(self) -> Iterator[ScannedFile]:
+        # Every rule is scoped to its base directory, so they can accumulate over the walk
+        rules = _Rules()
+        stack = [(self.root, "")]
+        while stack:
+            directory, base = stack.pop()
+            rules.load(directory, base)
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                rel = f"{base}/{entry.name}" if base else entry.name
+                if entry.is_symlink():
+                    self.stats.skipped["symlinks"] += 1
+                elif entry.is_dir():
+                    if entry.name in EXCLUDED_DIRS:
+                        self.stats.skipped["excluded_dirs"] += 1
+                    elif rules.ignored(rel, True):
+                        self.stats.skipped["gitignored"] += 1
+                    else:
+                        subdirs.append((entry.path, rel))
+                elif entry.is_file():
+                    record = self._check_file(entry, rel, rules)
+                    if record is not None:
+                        yield record
+            stack.extend(reversed(subdirs))
+
+    def _check_file(self, entry: os.DirEntry, rel: str, rules: _Rules) -> ScannedFile | None:
+        skipped = self.stats.skipped
+        extension = os.path.splitext(entry.name)[1][1:].lower()
+        language = LANG_MAP.get(extension)
+        if language is None:
+            skipped["unsupported"] += 1
+            return None
+        if rules.ignored(rel, False):
+            skipped["gitignored"] += 1
+            return None
+        if entry.name.endswith(GENERATED_SUFFIXES) or rules.attribute(rel, "linguist-generated"):
+            skipped["generated"] += 1
+            return None
+        if rules.attribute(rel, "linguist-vendored"):
+            skipped["vendored"] += 1
+            return None
+
+        size = entry.stat().st_size
+        if size > self.max_file_bytes:
+            skipped["oversized"] += 1
+            return None
+        reason = _content_skip_reason(entry.path)
+        if reason is not None:
+            skipped[reason] += 1
+            return None
+
+        self.stats.files += 1
+        self.stats.bytes += size
+        return ScannedFile(entry.path, rel, size, language)
@@ -15,10 +15,16 @@ Extracts:
 - Function nodes (includes methods, arrow functions)
 - Class nodes (includes interfaces, structs, enums, traits)
 - CONTAINS relationships (File -> Function/Class)
+- CALLS relationships (File -> called Function)
+
+Records are returned to the caller; writing them to Neo4j is handled by
+app.services.graph.
+
+Each grammar is loaded once, parsers are cached per thread and node matching
+runs as precompiled tree-sitter queries inside the C library.
 """
-from tree_sitter import Language, Parser
-from neo4j import Driver
-import re
+from tree_sitter import Language, Parser, Query, QueryCursor
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,246 +68,202 @@ try:
 except ImportError:
     pass
 
-def walk_tree(node):
-    """Generator that yields all nodes in the tree"""
-    yield node
-    for child in node.children:
-        yield from walk_tree(child)
-
-def extract_structure(file_path: str, content: str, repo_id: str, driver: Driver):
+LANG_MAP = {
+    "py": "python",
+    "js": "javascript",
+    "jsx": "javascript",
+    "ts": "typescript",
+    "tsx": "typescript",
+    "go": "go",
+    "java": "java",
+    "rs": "rust"
+}
+
+# Captures: @function -> Function node, @class -> Class node, @call -> CALLS target
+QUERY_SOURCES = {
+    "python": """
+        (function_definition name: (identifier) @function)
+        (class_definition name: (identifier) @class)
+        (call function: (identifier) @call)
+    """,
+    "javascript": """
+        (function_declaration name: (_) @function)
+        (function_expression name: (_) @function)
+        (method_definition name: (_) @function)
+        (variable_declarator name: (_) @function value: [(arrow_function) (function_expression)])
+        (class_declaration name: (_) @class)
+    """,
+    "go": """
+        (function_declaration name: (_) @function)
+        (method_declaration name: (_) @function)
+        (type_spec name: (_) @class)
+    """,
+    "java": """
+        (method_declaration name: (_) @function)
+        (class_declaration name: (_) @class)
+        (interface_declaration name: (_) @class)
+    """,
+    "rust": """
+        (function_item name: (_) @function)
+        (function_signature_item name: (_) @function)
+        (struct_item name: (_) @class)
+        (enum_item name: (_) @class)
+        (trait_item name: (_) @class)
+        (impl_item type: (_) @class)
+    """,
+}
+QUERY_SOURCES["typescript"] = QUERY_SOURCES["javascript"]
+
+CAPTURE_KEYS = {"function": "functions", "class": "classes", "call": "calls"}
+
+
+class LanguageRegistry:
+    """
+    Loads each grammar and compiles its query once per process.
+
+    Parsers and query cursors are not thread-safe, so those are cached per
+    thread instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._languages = {}
+        self._queries = {}
+        self._local = threading.local()
+
+    def language(self, lang_name: str) -> Language | None:
+        if lang_name in self._languages:
+            return self._languages[lang_name]
+
+        with self._lock:
+            if lang_name not in self._languages:
+                language = None
+                lang_module = HAS_LANGUAGES.get(lang_name)
+                if lang_module is not None:
+                    try:
+                        if lang_name == "typescript":
+                            language = Language(lang_module.language_typescript())
+                        else:
+                            language = Language(lang_module.language())
+                    except Exception as e:
+                        logger.warning(f"Failed to load {lang_name} grammar: {e}")
+                self._languages[lang_name] = language
+        return self._languages[lang_name]
+
+    def query(self, lang_name: str) -> Query | None:
+        if lang_name in self._queries:
+            return self._queries[lang_name]
+
+        language = self.language(lang_name)
+        with self._lock:
+            if lang_name not in self._queries:
+                query = None
+                if language is not None:
+                    try:
+                        query = Query(language, QUERY_SOURCES[lang_name])
+                    except Exception as e:
+                        logger.warning(f"Failed to compile {lang_name} query: {e}")
+                self._queries[lang_name] = query
+        return self._queries[lang_name]
+
+    def parser(self, lang_name: str) -> Parser | None:
+        parsers = self._thread_cache("parsers")
+        if lang_name not in parsers:
+            language = self.language(lang_name)
+            parsers[lang_name] = Parser(language) if language is not None else None
+        return parsers[lang_name]
+
+    def cursor(self, lang_name: str) -> QueryCursor | None:
+        cursors = self._thread_cache("cursors")
+        if lang_name not in cursors:
+            query = self.query(lang_name)
+            cursors[lang_name] = QueryCursor(query) if query is not None else None
+        return cursors[lang_name]
+
+    def _thread_cache(self, name: str) -> dict:
+        cache = getattr(self._local, name, None)
+        if cache is None:
+            cache = {}
+            setattr(self._local, name, cache)
+        return cache
+
+
+registry = LanguageRegistry()
+
+
+def detect_language(file_path: str) -> str | None:
+    """Return the grammar name for a path, or None if it isn't supported"""
+    return LANG_MAP.get(file_path.rsplit('.', 1)[-1].lower())
+
+
+def parse_source(file_path: str, content: str):
+    """
+    Parse a file with its cached per-thread parser. Returns the tree, or None
+    when the language is unsupported or parsing fails. The tree can be shared
+    by the chunker and extract_structure so each file is parsed once.
+    """
     if not HAS_LANGUAGES:
-        logger.debug("Skipping tree-sitter extraction - no language bindings available")
+        logger.debug("Skipping tree-sitter parse - no language bindings available")
         return
 
-    ext = file_path.split('.')[-1].lower()
-    lang_map = {
-        "py": "python",
-        "js": "javascript",
-        "jsx": "javascript",
-        "ts": "typescript",
-        "tsx": "typescript",
-        "go": "go",
-        "java": "java",
-        "rs": "rust"
-    }
-
-    if ext not in lang_map:
+    lang_name = detect_language(file_path)
+    if lang_name is None:
         return
 
-    lang_name = lang_map[ext]
-
     # Check if language is available
     if lang_name not in HAS_LANGUAGES:
         logger.debug(f"Skipping {file_path} - {lang_name} parser not available")
         return
 
-    # Get the language
     try:
-        lang_module = HAS_LANGUAGES[lang_name]
-
-        if lang_name == "python":
-            language = Language(lang_module.language())
-        elif lang_name == "javascript":
-            language = Language(lang_module.language())
-        elif lang_name == "typescript":
-            language = Language(lang_module.language_typescript())
-        elif lang_name == "go":
-            language = Language(lang_module.language())
-        elif lang_name == "java":
-            language = Language(lang_module.language())
-        elif lang_name == "rust":
-            language = Language(lang_module.language())
-        else:
-            logger.warning(f"Unsupported language: {lang_name}")
+        parser = registry.parser(lang_name)
+        if parser is None:
             return
-
-        parser = Parser(language)
-        tree = parser.parse(content.encode())
+        return parser.parse(content.encode())
     except Exception as e:
         # Skip files that fail to parse
         logger.warning(f"Failed to parse {file_path}: {e}")
         return
 
+
+def extract_structure(file_path: str, content: str, repo_id: str, tree=None) -> dict | None:
+    """
+    Parse a file (or reuse an already parsed tree) and collect its graph records.
+
+    Returns a dict with the File properties plus lists of function, class and
+    called names, or None when the file can't be parsed.
+    """
+    if tree is None:
+        tree = parse_source(file_path, content)
+    if tree is None:
+        return
+
     try:
-        with driver.session() as session:
-            # File node - now properly creating it
-            logger.debug(f"Creating File node for {file_path} with repo_id {repo_id}")
-            session.run("MERGE (f:File {path: $path, repo_id: $repo_id}) SET f.language = $lang",
-                        path=file_path, repo_id=repo_id, lang=ext)
-
-            # Extract functions and classes by walking the tree
-            for node in walk_tree(tree.root_node):
-                if lang_name == "python":
-                    if node.type == "function_definition":
-                        # Find the name child
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            func_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=func_name)
-
-                    elif node.type == "class_definition":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            class_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=class_name)
-
-                    elif node.type == "call":
-                        func_node = node.child_by_field_name("function")
-                        if func_node and func_node.type == "identifier":
-                            called_name = func_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (called:Function {name: $name, repo_id: $repo_id})
-                                MERGE (f)-[:CALLS]->(called)
-                            """, path=file_path, repo_id=repo_id, name=called_name)
-
-                elif lang_name in ["javascript", "typescript"]:
-                    if node.type in ["function_declaration", "function"]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            func_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=func_name)
-
-                    elif node.type == "class_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            class_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=class_name)
-
-                    elif node.type == "method_definition":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            method_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=method_name)
-
-                    elif node.type == "variable_declarator":
-                        # Capture const foo = () => {} and const foo = function() {}
-                        name_node = node.child_by_field_name("name")
-                        value_node = node.child_by_field_name("value")
-                        if name_node and value_node and value_node.type in ["arrow_function", "function"]:
-                            func_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=func_name)
-
-                elif lang_name == "go":
-                    if node.type == "function_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            func_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=func_name)
-
-                    elif node.type == "method_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            method_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=method_name)
-
-                    elif node.type == "type_declaration":
-                        # Go structs and interfaces
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            type_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=type_name)
-
-                elif lang_name == "java":
-                    if node.type == "method_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            method_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=method_name)
-
-                    elif node.type == "class_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            class_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=class_name)
-
-                    elif node.type == "interface_declaration":
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            interface_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=interface_name)
-
-                elif lang_name == "rust":
-                    if node.type in ["function_item", "function_signature_item"]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            func_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (func:Function {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(func)
-                            """, path=file_path, repo_id=repo_id, name=func_name)
-
-                    elif node.type in ["struct_item", "enum_item", "trait_item"]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            type_name = name_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=type_name)
-
-                    elif node.type == "impl_item":
-                        # Rust impl blocks
-                        type_node = node.child_by_field_name("type")
-                        if type_node:
-                            impl_name = type_node.text.decode()
-                            session.run("""
-                                MATCH (f:File {path: $path, repo_id: $repo_id})
-                                MERGE (cls:Class {name: $name, file_path: $path, repo_id: $repo_id})
-                                MERGE (f)-[:CONTAINS]->(cls)
-                            """, path=file_path, repo_id=repo_id, name=impl_name)
-
-            logger.info(f"Successfully extracted structure for {file_path}")
+        cursor = registry.cursor(detect_language(file_path))
+        if cursor is None:
+            return
+        captures = cursor.captures(tree.root_node)
     except Exception as e:
-        logger.error(f"Neo4j error while processing {file_path}: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        logger.warning(f"Failed to query {file_path}: {e}")
+        return
+
+    # Records are only collected here; app.services.graph.GraphWriter flushes
+    # them to Neo4j in batches so one file no longer costs one round trip per node.
+    structure = {
+        "path": file_path,
+        "repo_id": repo_id,
+        "language": file_path.rsplit('.', 1)[-1].lower(),
+        "functions": [],
+        "classes": [],
+        "calls": [],
+    }
+    for capture_name, nodes in captures.items():
+        key = CAPTURE_KEYS.get(capture_name)
+        if key is None:
+            continue
+        # Keep source order so records match what the old tree walk produced
+        for node in sorted(nodes, key=lambda n: n.start_byte):
+            structure[key].append(node.text.decode())
+
+    logger.debug(f"Extracted structure for {file_path}")
+    return structure
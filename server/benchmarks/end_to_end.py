@@ -0,0 +1,348 @@
+"""
+END-TO-END benchmark of ingestion and /api/ask, fully offline.
+
+Generates a synthetic repository (see synthetic_repo.py), then runs the real
+ingest_repo and ask_codebase against the in-process fakes in fakes.py
+instead of Supabase, Voyage, Qdrant, Neo4j and Gemini. Each run:
+
+  1. ingests the repo from scratch
+  2. edits --touch of its files and ingests again (the incremental path)
+  3. asks --questions distinct questions, --concurrency at a time
+
+and writes a JSON report: files/s, embeddings/s and graph writes/s per
+ingestion, /api/ask latency and time-to-first-token p50/p95/p99, peak RSS
+and what each fake was asked to do. Use --compare to diff against an
+earlier report:
+
+    python benchmarks/end_to_end.py --size medium
+    python benchmarks/end_to_end.py --size medium --compare benchmarks/results/<earlier>.json
+
+Fake latencies and rate limits default to roughly what the hosted services
+show from a nearby region; every one can be overridden on the command line.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeConfig, Fakes, Latency, install, prepare_environment
+from synthetic_repo import EXTENSIONS, LANGUAGES, SIZES, generate_repo, questions
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Metrics --compare prints, as (section, key, higher is better)
+COMPARED = [
+    ("ingest", "files_per_second", True),
+    ("ingest", "embeddings_per_second", True),
+    ("ingest", "graph_writes_per_second", True),
+    ("ingest", "seconds", False),
+    ("reingest", "seconds", False),
+    ("ask", "latency_ms.p50", False),
+    ("ask", "latency_ms.p95", False),
+    ("ask", "latency_ms.p99", False),
+    ("ask", "ttft_ms.p50", False),
+    ("ask", "ttft_ms.p95", False),
+    ("ask", "ttft_ms.p99", False),
+    ("memory", "peak_rss_bytes", False),
+]
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": round(rank(50), 2),
+        "p95": round(rank(95), 2),
+        "p99": round(rank(99), 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LocalCheckout:
+    """Replaces git_mirrors in ingestion: "checks out" the synthetic repo in place"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @asynccontextmanager
+    async def checkout_async(self, key: str, url: str, branch: str = "main", token: str = ""):
+        yield self.path
+
+
+def touch_files(root: str, fraction: float) -> int:
+    """Append a comment to every 1/fraction-th source file; returns files changed"""
+    comment = {"py": "#"}
+    extensions = {f".{extension}" for extension in EXTENSIONS.values()}
+    paths = sorted(
+        os.path.join(directory, name)
+        for directory, dirs, names in os.walk(root)
+        if "node_modules" not in directory and os.sep + "build" not in directory
+        for name in names if os.path.splitext(name)[1] in extensions
+    )
+    if fraction <= 0 or not paths:
+        return 0
+    step = max(1, round(1 / fraction))
+    touched = paths[::step]
+    for path in touched:
+        extension = os.path.splitext(path)[1][1:]
+        with open(path, "a") as f:
+            f.write(f"\n{comment.get(extension, '//')} touched by benchmark\n")
+    return len(touched)
+
+
+async def run_ingest(fakes: Fakes, repo_id: str) -> dict:
+    from app.services.ingestion import ingest_repo
+
+    before = fakes.stats()
+    progress = {}
+    started = time.perf_counter()
+    await ingest_repo(uuid.UUID(repo_id), progress)
+    seconds = time.perf_counter() - started
+    after = fakes.stats()
+
+    files = progress.get("scan", {}).get("files", 0)
+    embeddings = after["voyage"]["texts"] - before["voyage"]["texts"]
+    graph_rows = after["neo4j"]["rows_written"] - before["neo4j"]["rows_written"]
+    return {
+        "seconds": round(seconds, 3),
+        "files": files,
+        "files_per_second": round(files / seconds, 2),
+        "embeddings": embeddings,
+        "embeddings_per_second": round(embeddings / seconds, 2),
+        "embed_requests": after["voyage"]["requests"] - before["voyage"]["requests"],
+        "rate_limited": after["voyage"]["rate_limited"] - before["voyage"]["rate_limited"],
+        "graph_writes": graph_rows,
+        "graph_writes_per_second": round(graph_rows / seconds, 2),
+        "points_upserted": after["qdrant"]["points_upserted"] - before["qdrant"]["points_upserted"],
+        "scan": progress.get("scan"),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+async def _connected() -> dict:
+    # ASGI receive for a client that stays connected until the answer is done
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def ask_once(repo_id: str, question: str) -> dict:
+    from starlette.requests import Request
+    from app.routes.ask import AskRequest, ask_codebase
+
+    started = time.perf_counter()
+    timings = {"sources_ms": None, "ttft_ms": None, "error": None}
+    try:
+        request = Request({"type": "http", "method": "POST", "path": "/api/ask", "headers": []}, _connected)
+        response = await ask_codebase(AskRequest(repo_id=repo_id, question=question), request)
+        buffer = ""
+        async for part in response.body_iterator:
+            buffer += part if isinstance(part, str) else part.decode()
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if not line:
+                    continue
+                event = json.loads(line)
+                elapsed = (time.perf_counter() - started) * 1000
+                if event["type"] == "sources" and timings["sources_ms"] is None:
+                    timings["sources_ms"] = elapsed
+                elif event["type"] == "content" and timings["ttft_ms"] is None:
+                    timings["ttft_ms"] = elapsed
+                elif event["type"] == "error":
+                    timings["error"] = event["data"]
+    except Exception as e:
+        timings["error"] = f"{type(e).__name__}: {e}"
+    timings["latency_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+async def run_asks(repo_id: str, question_list: list[str], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def limited(question):
+        async with semaphore:
+            return await ask_once(repo_id, question)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(question) for question in question_list))
+    seconds = time.perf_counter() - started
+
+    errors = [result["error"] for result in results if result["error"]]
+    ok = [result for result in results if not result["error"]]
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_errors": list(dict.fromkeys(errors))[:3],
+        "requests_per_second": round(len(results) / seconds, 2),
+        "latency_ms": percentiles([result["latency_ms"] for result in ok]),
+        "ttft_ms": percentiles([result["ttft_ms"] for result in ok if result["ttft_ms"] is not None]),
+        "sources_ms": percentiles([result["sources_ms"] for result in ok if result["sources_ms"] is not None]),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+async def run(args, config: FakeConfig, workdir: str) -> dict:
+    repo_dir = os.path.join(workdir, "repo")
+    files = args.files or SIZES[args.size]
+    repo = generate_repo(repo_dir, files, tuple(args.languages.split(",")), seed=args.seed)
+
+    # Import every module that binds a client, then swap the fakes in
+    import app.services.ingestion as ingestion
+    import app.routes.ask  # noqa: F401
+    from app.services.graph import ensure_graph_schema
+
+    fakes = Fakes(config)
+    install(fakes)
+    ingestion.git_mirrors = LocalCheckout(repo_dir)
+    ensure_graph_schema(fakes.neo4j_driver)
+
+    repo_id = str(uuid.UUID(int=args.seed + 1))
+    fakes.add_repo({
+        "id": repo_id, "owner": "bench", "repo": "synthetic", "branch": "main",
+        "status": "pending", "qdrant_collection": None, "error_message": None,
+    })
+
+    report = {"repo": {"files": repo["files"], "bytes": repo["bytes"], "languages": args.languages.split(",")}}
+    report["ingest"] = await run_ingest(fakes, repo_id)
+    print(f"ingest: {report['ingest']['seconds']}s, {report['ingest']['files_per_second']} files/s", file=sys.stderr)
+
+    touched = touch_files(repo_dir, args.touch)
+    if touched:
+        report["reingest"] = {"files_changed": touched, **await run_ingest(fakes, repo_id)}
+        print(f"reingest: {report['reingest']['seconds']}s for {touched} changed files", file=sys.stderr)
+
+    report["ask"] = await run_asks(repo_id, questions(repo["names"], args.questions, seed=args.seed + 1), args.concurrency)
+    print(f"ask: p50 {report['ask']['latency_ms'].get('p50')}ms, ttft p50 {report['ask']['ttft_ms'].get('p50')}ms", file=sys.stderr)
+
+    report["fakes"] = fakes.stats()
+    report["memory"] = {"peak_rss_bytes": peak_rss_bytes()}
+    return report
+
+
+def lookup(report: dict, section: str, key: str):
+    value = report.get(section, {})
+    for part in key.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\n{'metric':<34} {'baseline':>14} {'current':>14} {'change':>9}")
+    for section, key, higher_is_better in COMPARED:
+        old, new = lookup(baseline, section, key), lookup(current, section, key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        marker = "" if abs(change) < 5 else (" +" if better else " -")
+        print(f"{section + '.' + key:<34} {old:>14,.2f} {new:>14,.2f} {change:>8.1f}%{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--files", type=int, default=0, help="overrides --size")
+    parser.add_argument("--languages", default=",".join(LANGUAGES))
+    parser.add_argument("--touch", type=float, default=0.05, help="fraction of files edited before re-ingesting (0 skips it)")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--voyage-latency", type=float, default=0.15, help="seconds per embedding request")
+    parser.add_argument("--voyage-rpm", type=int, default=2000, help="requests per minute, 0 for unlimited")
+    parser.add_argument("--voyage-tpm", type=int, default=3_000_000, help="tokens per minute, 0 for unlimited")
+    parser.add_argument("--qdrant-latency", type=float, default=0.01)
+    parser.add_argument("--neo4j-latency", type=float, default=0.005)
+    parser.add_argument("--supabase-latency", type=float, default=0.01)
+    parser.add_argument("--gemini-ttft", type=float, default=0.4, help="seconds to the first streamed chunk")
+    parser.add_argument("--gemini-chunk-latency", type=float, default=0.03)
+    parser.add_argument("--gemini-rpm", type=int, default=0)
+    parser.add_argument("--output", help=f"report path (default: {RESULTS_DIR}/end_to_end-<size>-<time>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic repo and DATA_DIR")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    config = FakeConfig(
+        supabase=Latency(base=args.supabase_latency),
+        voyage=Latency(base=args.voyage_latency, per_item=0.001),
+        voyage_requests_per_minute=args.voyage_rpm,
+        voyage_tokens_per_minute=args.voyage_tpm,
+        qdrant_upsert=Latency(base=args.qdrant_latency, per_item=0.0001),
+        qdrant_search=Latency(base=args.qdrant_latency),
+        neo4j=Latency(base=args.neo4j_latency, per_item=0.00005),
+        gemini_first_token=Latency(base=args.gemini_ttft),
+        gemini_chunk=Latency(base=args.gemini_chunk_latency),
+        gemini_requests_per_minute=args.gemini_rpm,
+    )
+
+    workdir = tempfile.mkdtemp(prefix="cip-bench-")
+    prepare_environment(os.path.join(workdir, "data"))
+    try:
+        results = asyncio.run(run(args, config, workdir))
+    finally:
+        if args.keep:
+            print(f"Kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    timestamp = datetime.now(timezone.utc)
+    report = {
+        "benchmark": "end_to_end",
+        "timestamp": timestamp.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        **results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"end_to_end-{args.size if not args.files else args.files}-{timestamp:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,727 @@
+"""
+In-process stand-ins for Supabase, Voyage, Qdrant, Neo4j and Gemini.
+
+Each fake implements just the client surface the app uses, with a
+configurable latency (base + per item, with jitter) and, for Voyage and
+Gemini, requests/tokens per minute limits that raise the same errors the
+real APIs do, so retry paths are exercised too. The sync and async variants
+of a client share one store: what ingestion writes, /api/ask reads.
+
+install() swaps the fakes in for the clients created by app/config.py, in
+app.config itself and in every already imported app module that bound them
+by name. prepare_environment() has to run before anything imports
+app.config so no real client is ever pointed at a live service.
+
+Behaviour worth knowing when reading results:
+  - Voyage vectors are deterministic pseudo-random unit vectors per text.
+  - Qdrant keeps the first SEARCH_DIMS dimensions of each vector and ranks
+    by brute-force cosine, so the fake itself barely shows in peak RSS.
+  - Neo4j understands exactly the statements in app/services/graph.py and
+    graph_snapshot.py; anything else raises NotImplementedError, so a new
+    query fails the benchmark instead of silently doing nothing.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+import asyncio
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+VECTOR_SIZE = 1536
+SEARCH_DIMS = 64
+
+# Client objects created by app/config.py, replaced by install()
+CLIENTS = (
+    "supabase", "get_async_supabase", "vo", "async_vo", "qdrant", "async_qdrant", "neo4j_driver", "async_neo4j_driver",
+)
+
+# Enough for app/config.py to build its clients; none of them connects on creation
+ENVIRONMENT = {
+    "SUPABASE_URL": "http://127.0.0.1:54321",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench.bench.bench",
+    "VOYAGE_API_KEY": "bench",
+    "QDRANT_URL": "http://127.0.0.1:6333",
+    "QDRANT_API_KEY": "",
+    "NEO4J_URI": "bolt://127.0.0.1:7687",
+    "NEO4J_PASSWORD": "bench",
+    "GEMINI_API_KEY": "bench",
+    "GITHUB_TOKEN": "",
+}
+
+
+def prepare_environment(data_dir: str) -> None:
+    """Point app/config.py at dummy endpoints and a scratch DATA_DIR; call before importing app"""
+    os.environ.update(ENVIRONMENT)
+    os.environ["DATA_DIR"] = data_dir
+    # The dummy Qdrant clients are never used, so their plain-http warning is noise
+    warnings.filterwarnings("ignore", message="Api key is used with an insecure connection")
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if server_dir not in sys.path:
+        sys.path.insert(0, server_dir)
+
+
+@dataclass
+class Latency:
+    base: float = 0.0      # seconds per call
+    per_item: float = 0.0  # seconds per text / point / row
+    jitter: float = 0.1    # +- fraction of the total
+
+    def seconds(self, items: int = 0) -> float:
+        total = self.base + self.per_item * items
+        return max(0.0, total * (1 + random.uniform(-self.jitter, self.jitter))) if total else 0.0
+
+
+class RateLimiter:
+    """Sliding one-minute window of requests and tokens; 0 means unlimited"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, tokens: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] >= 60:
+                self._tokens -= self._window.popleft()[1]
+            if (
+                (self.requests_per_minute and len(self._window) + 1 > self.requests_per_minute)
+                or (self.tokens_per_minute and self._tokens + tokens > self.tokens_per_minute)
+            ):
+                self.rejected += 1
+                return False
+            self._window.append((now, tokens))
+            self._tokens += tokens
+            return True
+
+
+@dataclass
+class FakeConfig:
+    supabase: Latency = field(default_factory=lambda: Latency(base=0.01))
+    voyage: Latency = field(default_factory=lambda: Latency(base=0.15, per_item=0.001))
+    voyage_requests_per_minute: int = 2000
+    voyage_tokens_per_minute: int = 3_000_000
+    qdrant_upsert: Latency = field(default_factory=lambda: Latency(base=0.01, per_item=0.0001))
+    qdrant_search: Latency = field(default_factory=lambda: Latency(base=0.01))
+    neo4j: Latency = field(default_factory=lambda: Latency(base=0.005, per_item=0.00005))
+    gemini_first_token: Latency = field(default_factory=lambda: Latency(base=0.4))
+    gemini_chunk: Latency = field(default_factory=lambda: Latency(base=0.03))
+    gemini_chunks: int = 20
+    gemini_requests_per_minute: int = 0
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 3 + 1
+
+
+# Supabase
+
+class _Query:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.operation = ("select", None)
+        self.max_rows = None
+
+    def select(self, *columns):
+        self.operation = ("select", None)
+        return self
+
+    def insert(self, row: dict):
+        self.operation = ("insert", row)
+        return self
+
+    def update(self, fields: dict):
+        self.operation = ("update", fields)
+        return self
+
+    def delete(self):
+        self.operation = ("delete", None)
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append((column, value))
+        return self
+
+    def limit(self, count: int):
+        self.max_rows = count
+        return self
+
+    def _apply(self) -> SimpleNamespace:
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            kind, value = self.operation
+            if kind == "insert":
+                rows.append(dict(value))
+                return SimpleNamespace(data=[dict(value)])
+            matched = [row for row in rows if all(str(row.get(column)) == str(v) for column, v in self.filters)]
+            if kind == "update":
+                for row in matched:
+                    row.update(value)
+            elif kind == "delete":
+                self.client.tables[self.table] = [row for row in rows if row not in matched]
+            if self.max_rows is not None:
+                matched = matched[:self.max_rows]
+            return SimpleNamespace(data=[dict(row) for row in matched])
+
+    def execute(self) -> SimpleNamespace:
+        time.sleep(self.client.latency.seconds())
+        return self._apply()
+
+
+class _AsyncQuery(_Query):
+    async def execute(self) -> SimpleNamespace:
+        await asyncio.sleep(self.client.latency.seconds())
+        return self._apply()
+
+
+class FakeSupabase:
+    def __init__(self, latency: Latency, tables: dict | None = None, query_class=_Query):
+        self.latency = latency
+        self.tables = tables if tables is not None else {}
+        self.lock = threading.Lock()
+        self.query_class = query_class
+
+    def table(self, name: str) -> _Query:
+        return self.query_class(self, name)
+
+
+# Voyage
+
+def fake_vector(text: str, dims: int = VECTOR_SIZE) -> list[float]:
+    seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeVoyage:
+    def __init__(self, latency: Latency, limiter: RateLimiter):
+        self.latency = latency
+        self.limiter = limiter
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _check(self, texts: list[str]) -> None:
+        if not self.limiter.acquire(sum(_tokens(text) for text in texts)):
+            from voyageai.error import RateLimitError
+            raise RateLimitError("Fake Voyage rate limit exceeded")
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+
+    def embed(self, texts: list[str], model: str = "", **kwargs) -> SimpleNamespace:
+        self._check(texts)
+        time.sleep(self.latency.seconds(len(texts)))
+        return SimpleNamespace(embeddings=[fake_vector(text) for text in texts])
+
+
+class FakeAsyncVoyage(FakeVoyage):
+    async def embed(self, texts: list[str], model: str = "", **kwargs) -> SimpleNamespace:
+        self._check(texts)
+        await asyncio.sleep(self.latency.seconds(len(texts)))
+        return SimpleNamespace(embeddings=[fake_vector(text) for text in texts])
+
+
+# Qdrant
+
+class _Collection:
+    def __init__(self):
+        self.points = {}  # id -> (vector, payload)
+        self._matrix = None
+
+    def search(self, query, limit: int, query_filter) -> list[SimpleNamespace]:
+        if self._matrix is None:
+            ids = list(self.points)
+            matrix = np.array([self.points[i][0] for i in ids], dtype=np.float32).reshape(len(ids), SEARCH_DIMS)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = (ids, matrix / np.where(norms == 0, 1, norms))
+        ids, matrix = self._matrix
+        if not ids:
+            return []
+        vector = np.asarray(query[:SEARCH_DIMS], dtype=np.float32)
+        scores = matrix @ (vector / (np.linalg.norm(vector) or 1))
+        hits = []
+        for index in np.argsort(-scores):
+            payload = self.points[ids[index]][1]
+            if _matches(query_filter, payload):
+                hits.append(SimpleNamespace(id=ids[index], score=float(scores[index]), payload=payload))
+                if len(hits) == limit:
+                    break
+        return hits
+
+
+def _point_id(value) -> str | int:
+    # Qdrant returns string ids in canonical UUID form
+    return value if isinstance(value, int) else str(uuid.UUID(str(value)))
+
+
+def _matches(query_filter, payload: dict) -> bool:
+    """Supports the Filter(must=[FieldCondition(key, match=MatchValue)]) filters the app builds"""
+    if query_filter is None:
+        return True
+    return all(payload.get(condition.key) == condition.match.value for condition in (query_filter.must or []))
+
+
+class FakeQdrantStore:
+    def __init__(self, upsert_latency: Latency, search_latency: Latency):
+        self.upsert_latency = upsert_latency
+        self.search_latency = search_latency
+        self.collections = {}
+        self.lock = threading.Lock()
+        self.upserted = 0
+        self.searches = 0
+
+
+class FakeQdrant:
+    def __init__(self, store: FakeQdrantStore):
+        self.store = store
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return collection_name in self.store.collections
+
+    def create_collection(self, collection_name: str, **kwargs) -> bool:
+        with self.store.lock:
+            self.store.collections[collection_name] = _Collection()
+        return True
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self.store.lock:
+            return self.store.collections.pop(collection_name, None) is not None
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs) -> None:
+        if collection_name not in self.store.collections:
+            raise ValueError(f"Collection {collection_name} not found")
+
+    def upsert(self, collection_name: str, points: list, **kwargs) -> None:
+        time.sleep(self.store.upsert_latency.seconds(len(points)))
+        with self.store.lock:
+            collection = self.store.collections[collection_name]
+            for point in points:
+                collection.points[_point_id(point.id)] = (list(point.vector[:SEARCH_DIMS]), point.payload)
+            collection._matrix = None
+            self.store.upserted += len(points)
+
+    def delete(self, collection_name: str, points_selector, **kwargs) -> None:
+        time.sleep(self.store.upsert_latency.seconds())
+        with self.store.lock:
+            collection = self.store.collections.get(collection_name)
+            if collection is None:
+                return
+            if hasattr(points_selector, "points"):
+                for value in points_selector.points:
+                    collection.points.pop(_point_id(value), None)
+            else:
+                for point_id in [i for i, (_, payload) in collection.points.items() if _matches(points_selector.filter, payload)]:
+                    del collection.points[point_id]
+            collection._matrix = None
+
+
+class FakeAsyncQdrant:
+    def __init__(self, store: FakeQdrantStore):
+        self.store = store
+
+    async def collection_exists(self, collection_name: str) -> bool:
+        return collection_name in self.store.collections
+
+    async def query_points(self, collection_name: str, query, limit: int = 10, query_filter=None, **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(self.store.search_latency.seconds())
+        with self.store.lock:
+            self.store.searches += 1
+            collection = self.store.collections.get(collection_name)
+            if collection is None:
+                raise ValueError(f"Collection {collection_name} not found")
+            return SimpleNamespace(points=collection.search(query, limit, query_filter))
+
+
+# Neo4j
+
+def _normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+class FakeGraphStore:
+    """Files with the symbols they CONTAIN and the names they CALL, per repo"""
+
+    def __init__(self, latency: Latency):
+        from app.services.graph import GRAPH_QUERIES, EXPANSION_QUERIES, FILE_UPDATE_QUERIES
+        from app.services.graph_snapshot import EXPORT_QUERY
+
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.files = {}    # (repo_id, path) -> {"contains": {(label, name): None}, "calls": {name: None}}
+        self.defs = {}     # (repo_id, name) -> {path: None} of files defining a Function
+        self.callers = {}  # (repo_id, name) -> {path: None} of files calling it
+        self.statements = 0
+        self.rows_written = 0
+
+        self.handlers = {_normalize(GRAPH_QUERIES[label]): getattr(self, f"_write_{label}") for label in GRAPH_QUERIES}
+        self.handlers.update({_normalize(EXPANSION_QUERIES[kind]): getattr(self, f"_expand_{kind}") for kind in EXPANSION_QUERIES})
+        self.handlers.update({_normalize(FILE_UPDATE_QUERIES[step]): getattr(self, f"_update_{step}", self._update_none) for step in FILE_UPDATE_QUERIES})
+        self.handlers[_normalize(EXPORT_QUERY)] = self._export
+
+    def run(self, query: str, params: dict) -> list[dict]:
+        text = _normalize(query)
+        handler = self.handlers.get(text)
+        if handler is None:
+            if text.startswith("CREATE "):
+                handler = lambda params: []  # schema statements
+            elif "IN TRANSACTIONS OF" in text and "DETACH DELETE n" in text:
+                label = re.search(r"MATCH \(n:(\w+)", text).group(1)
+                handler = lambda params: self._delete_label(label, params)
+            else:
+                raise NotImplementedError(f"Fake Neo4j does not understand: {text[:120]}")
+        with self.lock:
+            self.statements += 1
+            records = handler(params)
+        return records
+
+    def _file(self, repo_id: str, path: str) -> dict | None:
+        return self.files.get((repo_id, path))
+
+    def _write_files(self, params: dict) -> list:
+        for row in params["rows"]:
+            self.files.setdefault((row["repo_id"], row["path"]), {"contains": {}, "calls": {}})
+        self.rows_written += len(params["rows"])
+        return []
+
+    def _write_symbols(self, params: dict, label: str) -> list:
+        for row in params["rows"]:
+            node = self._file(row["repo_id"], row["file_path"])
+            if node is None:
+                continue
+            node["contains"][(label, row["name"])] = None
+            if label == "Function":
+                self.defs.setdefault((row["repo_id"], row["name"]), {})[row["file_path"]] = None
+        self.rows_written += len(params["rows"])
+        return []
+
+    def _write_functions(self, params: dict) -> list:
+        return self._write_symbols(params, "Function")
+
+    def _write_classes(self, params: dict) -> list:
+        return self._write_symbols(params, "Class")
+
+    def _write_calls(self, params: dict) -> list:
+        for row in params["rows"]:
+            node = self._file(row["repo_id"], row["file_path"])
+            if node is None:
+                continue
+            node["calls"][row["name"]] = None
+            self.callers.setdefault((row["repo_id"], row["name"]), {})[row["file_path"]] = None
+        self.rows_written += len(params["rows"])
+        return []
+
+    def _remove_file(self, repo_id: str, path: str) -> int:
+        node = self.files.pop((repo_id, path), None)
+        if node is None:
+            return 0
+        for label, name in node["contains"]:
+            if label == "Function":
+                self.defs.get((repo_id, name), {}).pop(path, None)
+        for name in node["calls"]:
+            self.callers.get((repo_id, name), {}).pop(path, None)
+        return 1
+
+    def _update_calls(self, params: dict) -> list:
+        for path in params["paths"]:
+            node = self._file(params["repo_id"], path)
+            if node is not None:
+                for name in node["calls"]:
+                    self.callers.get((params["repo_id"], name), {}).pop(path, None)
+                node["calls"] = {}
+        return []
+
+    def _update_contains(self, params: dict) -> list:
+        for path in params["paths"]:
+            node = self._file(params["repo_id"], path)
+            if node is not None:
+                for label, name in node["contains"]:
+                    if label == "Function":
+                        self.defs.get((params["repo_id"], name), {}).pop(path, None)
+                node["contains"] = {}
+        return []
+
+    def _update_files(self, params: dict) -> list:
+        deleted = sum(self._remove_file(params["repo_id"], path) for path in params["paths"])
+        return [{"deleted_count": deleted}]
+
+    def _update_none(self, params: dict) -> list:
+        # Symbols only exist as entries of their file here, so pruning has nothing left to do
+        return []
+
+    def _delete_label(self, label: str, params: dict) -> list:
+        repo_id, budget = params["repo_id"], params["max_nodes"]
+        deleted = 0
+        for key in [key for key in self.files if key[0] == repo_id]:
+            if deleted >= budget:
+                break
+            node = self.files[key]
+            if label == "File":
+                deleted += self._remove_file(*key)
+                continue
+            symbols = [symbol for symbol in node["contains"] if symbol[0] == label][:budget - deleted]
+            for symbol in symbols:
+                del node["contains"][symbol]
+                if label == "Function":
+                    self.defs.get((repo_id, symbol[1]), {}).pop(key[1], None)
+            deleted += len(symbols)
+        return [{"deleted_count": deleted}]
+
+    def _export(self, params: dict) -> list:
+        records = []
+        for (repo_id, path), node in self.files.items():
+            if repo_id != params["repo_id"]:
+                continue
+            for label, name in node["contains"]:
+                records.append({"path": path, "rel": "CONTAINS", "label": label, "name": name})
+            for name in node["calls"]:
+                records.append({"path": path, "rel": "CALLS", "label": "Function", "name": name})
+            if not node["contains"] and not node["calls"]:
+                records.append({"path": path, "rel": None, "label": None, "name": None})
+        return records
+
+    def _expand(self, params: dict, rows) -> list:
+        records = []
+        for path in params["files"]:
+            node = self._file(params["repo_id"], path)
+            if node is None:
+                continue
+            for record in rows(path, node):
+                records.append(record)
+                if len(records) == params["limit"]:
+                    return records
+        return records
+
+    def _expand_defines(self, params: dict) -> list:
+        return self._expand(params, lambda path, node: (
+            {"path": path, "label": label, "name": name} for label, name in node["contains"]
+        ))
+
+    def _expand_calls(self, params: dict) -> list:
+        repo_id = params["repo_id"]
+        return self._expand(params, lambda path, node: (
+            {"path": path, "name": name, "defined_in": [p for p in self.defs.get((repo_id, name), {}) if p != path][:3]}
+            for name in node["calls"]
+        ))
+
+    def _expand_callers(self, params: dict) -> list:
+        repo_id = params["repo_id"]
+
+        def rows(path, node):
+            for label, name in node["contains"]:
+                callers = [p for p in self.callers.get((repo_id, name), {}) if p != path][:5] if label == "Function" else []
+                if callers:
+                    yield {"path": path, "name": name, "callers": callers}
+        return self._expand(params, rows)
+
+
+class _Result:
+    def __init__(self, records: list[dict]):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self) -> dict | None:
+        return self.records[0] if self.records else None
+
+    def consume(self) -> None:
+        return None
+
+
+class _Session:
+    def __init__(self, store: FakeGraphStore):
+        self.store = store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _params(self, parameters: dict | None, kwargs: dict) -> tuple[dict, int]:
+        params = {**(parameters or {}), **kwargs}
+        rows = len(params.get("rows") or params.get("paths") or params.get("files") or [])
+        return params, rows
+
+    def run(self, query: str, parameters: dict | None = None, **kwargs) -> _Result:
+        params, rows = self._params(parameters, kwargs)
+        time.sleep(self.store.latency.seconds(rows))
+        return _Result(self.store.run(query, params))
+
+    def begin_transaction(self) -> "_Session":
+        return self
+
+    def commit(self) -> None:
+        return None
+
+    def rollback(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+class _AsyncResult(_Result):
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+
+class _AsyncSession(_Session):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query: str, parameters: dict | None = None, **kwargs) -> _AsyncResult:
+        params, rows = self._params(parameters, kwargs)
+        await asyncio.sleep(self.store.latency.seconds(rows))
+        return _AsyncResult(self.store.run(query, params))
+
+
+class FakeNeo4jDriver:
+    def __init__(self, store: FakeGraphStore, session_class=_Session):
+        self.store = store
+        self.session_class = session_class
+
+    def session(self, **kwargs) -> _Session:
+        return self.session_class(self.store)
+
+    def close(self) -> None:
+        return None
+
+
+# Gemini
+
+class FakeGenAI:
+    """Stands in for the google.generativeai module"""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.limiter = RateLimiter(config.gemini_requests_per_minute)
+        self.requests = 0
+        fake = self
+
+        class GenerativeModel:
+            def __init__(self, model_name: str = "", generation_config=None, **kwargs):
+                self.model_name = model_name
+
+            def _chunks(self, prompt: str) -> list[str]:
+                fake._check()
+                words = [f"word{i % 97}" for i in range(max(1, _tokens(prompt) // 20))]
+                per_chunk = max(1, len(words) // config.gemini_chunks)
+                return [" ".join(words[i:i + per_chunk]) + " " for i in range(0, len(words), per_chunk)][:config.gemini_chunks]
+
+            def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+                chunks = self._chunks(prompt)
+                if not stream:
+                    time.sleep(config.gemini_first_token.seconds() + sum(config.gemini_chunk.seconds() for _ in chunks))
+                    return SimpleNamespace(text="".join(chunks))
+
+                def iterate():
+                    time.sleep(config.gemini_first_token.seconds())
+                    for i, text in enumerate(chunks):
+                        if i:
+                            time.sleep(config.gemini_chunk.seconds())
+                        yield SimpleNamespace(text=text)
+                return iterate()
+
+            async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+                chunks = self._chunks(prompt)
+                if not stream:
+                    await asyncio.sleep(config.gemini_first_token.seconds() + sum(config.gemini_chunk.seconds() for _ in chunks))
+                    return SimpleNamespace(text="".join(chunks))
+
+                async def iterate():
+                    await asyncio.sleep(config.gemini_first_token.seconds())
+                    for i, text in enumerate(chunks):
+                        if i:
+                            await asyncio.sleep(config.gemini_chunk.seconds())
+                        yield SimpleNamespace(text=text)
+                return iterate()
+
+        self.GenerativeModel = GenerativeModel
+
+    def _check(self) -> None:
+        if not self.limiter.acquire(0):
+            from google.api_core.exceptions import ResourceExhausted
+            raise ResourceExhausted("Fake Gemini rate limit exceeded")
+        self.requests += 1
+
+    def configure(self, **kwargs) -> None:
+        return None
+
+
+class Fakes:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        tables = {}
+        self.supabase = FakeSupabase(config.supabase, tables)
+        self.async_supabase = FakeSupabase(config.supabase, tables, query_class=_AsyncQuery)
+        self.async_supabase.lock = self.supabase.lock
+
+        limiter = RateLimiter(config.voyage_requests_per_minute, config.voyage_tokens_per_minute)
+        self.vo = FakeVoyage(config.voyage, limiter)
+        self.async_vo = FakeAsyncVoyage(config.voyage, limiter)
+
+        self.qdrant_store = FakeQdrantStore(config.qdrant_upsert, config.qdrant_search)
+        self.qdrant = FakeQdrant(self.qdrant_store)
+        self.async_qdrant = FakeAsyncQdrant(self.qdrant_store)
+
+        self.graph = FakeGraphStore(config.neo4j)
+        self.neo4j_driver = FakeNeo4jDriver(self.graph)
+        self.async_neo4j_driver = FakeNeo4jDriver(self.graph, session_class=_AsyncSession)
+
+        self.genai = FakeGenAI(config)
+
+    async def get_async_supabase(self) -> FakeSupabase:
+        return self.async_supabase
+
+    def add_repo(self, row: dict) -> None:
+        self.supabase.table("repos").insert(row)._apply()
+
+    def stats(self) -> dict:
+        return {
+            "voyage": {
+                "requests": self.vo.requests + self.async_vo.requests,
+                "texts": self.vo.texts + self.async_vo.texts,
+                "rate_limited": self.vo.limiter.rejected,
+            },
+            "qdrant": {"points_upserted": self.qdrant_store.upserted, "searches": self.qdrant_store.searches},
+            "neo4j": {"statements": self.graph.statements, "rows_written": self.graph.rows_written},
+            "gemini": {"requests": self.genai.requests, "rate_limited": self.genai.limiter.rejected},
+        }
+
+
+def install(fakes: Fakes) -> None:
+    """Replace the app/config.py clients and the Gemini module in every loaded app module"""
+    import app.config as config
+    import google.generativeai as genai
+
+    replacements = {id(getattr(config, name)): getattr(fakes, name) for name in CLIENTS}
+    replacements[id(genai)] = fakes.genai
+    for module_name, module in list(sys.modules.items()):
+        if module is None or not (module_name == "app" or module_name.startswith("app.")):
+            continue
+        for attr, value in list(vars(module).items()):
+            if id(value) in replacements:
+                setattr(module, attr, replacements[id(value)])
@@ -0,0 +1,115 @@
+"""
+PROFILE the /api/ask graph expansion on a synthetic graph.
+
+Writes a synthetic repo (files, functions, classes, calls) into the Neo4j at
+--uri with GraphWriter, then compares total db hits of the old
+variable-length expansion with the ranked EXPANSION_QUERIES, before and
+after ensure_graph_schema():
+
+    python benchmarks/graph_expansion_profile.py --uri bolt://localhost:7688 --files 20000
+
+The "without schema" run drops the graph constraints and indexes, so use a
+dedicated Neo4j instance. Running against the app's NEO4J_URI needs
+--allow-app-database; the schema is restored afterwards either way.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo4j import GraphDatabase
+from app.services.graph import GraphWriter, EXPANSION_QUERIES, GRAPH_SCHEMA, ensure_graph_schema
+
+LEGACY_QUERY = """
+    MATCH (f:File)-[*0..2]-(related)
+    WHERE f.path IN $files AND f.repo_id = $repo_id
+    RETURN f.path AS path, labels(related) AS labels, related.name AS name
+    LIMIT 50
+"""
+
+
+def synthetic_structures(repo_id: str, files: int, symbols: int, calls: int):
+    rng = random.Random(0)
+    names = [f"fn_{i}" for i in range(files * symbols // 2)]
+    for i in range(files):
+        path = f"pkg_{i % 100}/module_{i}.py"
+        yield {
+            "path": path,
+            "repo_id": repo_id,
+            "language": ".py",
+            "functions": [rng.choice(names) for _ in range(symbols)],
+            "classes": [f"Class{i}_{j}" for j in range(max(1, symbols // 4))],
+            "calls": [rng.choice(names) for _ in range(calls)],
+        }
+
+
+def db_hits(plan: dict) -> int:
+    return plan.get("dbHits", 0) + sum(db_hits(child) for child in plan.get("children", []))
+
+
+def profile(driver, query: str, **params) -> int:
+    with driver.session() as session:
+        summary = session.run(f"PROFILE {query}", **params).consume()
+        return db_hits(summary.profile)
+
+
+def drop_schema(driver) -> None:
+    with driver.session() as session:
+        for statement in GRAPH_SCHEMA:
+            kind, name = statement.split()[1:3]
+            session.run(f"DROP {kind} {name} IF EXISTS").consume()
+
+
+def report(driver, label: str, repo_id: str, sample: list[str]) -> None:
+    print(f"\n{label}")
+    print(f"  legacy [*0..2]: {profile(driver, LEGACY_QUERY, files=sample, repo_id=repo_id):>12,} db hits")
+    for kind, query in EXPANSION_QUERIES.items():
+        hits = profile(driver, query, files=sample, repo_id=repo_id, limit=20)
+        print(f"  {kind:<14} {hits:>12,} db hits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", required=True, help="Neo4j instance to profile on; its graph schema is dropped and restored")
+    parser.add_argument("--password", default=os.getenv("NEO4J_PASSWORD"))
+    parser.add_argument("--allow-app-database", action="store_true", help="allow --uri to be the app's NEO4J_URI")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--symbols", type=int, default=8, help="functions per file")
+    parser.add_argument("--calls", type=int, default=12, help="calls per file")
+    parser.add_argument("--sample", type=int, default=10, help="retrieved files per question")
+    parser.add_argument("--repo-id", default="profile-synthetic")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic graph afterwards")
+    args = parser.parse_args()
+    if args.uri == os.getenv("NEO4J_URI") and not args.allow_app_database:
+        parser.error("--uri is the app's NEO4J_URI; this drops its graph schema while it runs, pass --allow-app-database to do it anyway")
+
+    driver = GraphDatabase.driver(args.uri, auth=("neo4j", args.password))
+    try:
+        drop_schema(driver)
+        writer = GraphWriter(driver)
+        for structure in synthetic_structures(args.repo_id, args.files, args.symbols, args.calls):
+            writer.add(structure)
+        writer.flush()
+
+        sample = [f"pkg_{i % 100}/module_{i}.py" for i in random.Random(1).sample(range(args.files), args.sample)]
+        report(driver, "Without schema", args.repo_id, sample)
+        ensure_graph_schema(driver)
+        with driver.session() as session:
+            session.run("CALL db.awaitIndexes(300)").consume()
+        report(driver, "With schema", args.repo_id, sample)
+    finally:
+        # Also after a crash: nothing should be left without its constraints
+        ensure_graph_schema(driver)
+        if not args.keep:
+            with driver.session() as session:
+                session.run("""
+                    MATCH (n) WHERE n.repo_id = $repo_id
+                    CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+                """, repo_id=args.repo_id).consume()
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
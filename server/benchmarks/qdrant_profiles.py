@@ -0,0 +1,117 @@
+"""
+Compare recall and latency of the Qdrant collection profiles.
+
+Loads the same vectors into one collection per profile on a local Qdrant,
+waits for indexing, then runs every query with the profile's search
+parameters and measures recall@k against exact (brute-force) neighbours
+and client-side latency:
+
+    docker run -p 6333:6333 qdrant/qdrant
+    python benchmarks/qdrant_profiles.py --points 100000 --queries 200
+
+Vectors are synthetic clustered unit vectors unless --source-collection
+names an existing collection to copy real embeddings from. Collections are
+created with the same parameters ingestion uses (app/utils/collection_profiles.py),
+without importing app.config, so no service credentials are needed.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from app.utils.collection_profiles import COLLECTION_PROFILES, VECTOR_SIZE, collection_params, search_params
+
+
+def synthetic_vectors(count: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, VECTOR_SIZE)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.35 * rng.normal(size=(count, VECTOR_SIZE)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def source_vectors(client: QdrantClient, collection: str, count: int) -> np.ndarray:
+    vectors, offset = [], None
+    while len(vectors) < count:
+        points, offset = client.scroll(collection, limit=1000, offset=offset, with_vectors=True, with_payload=False)
+        vectors.extend(point.vector for point in points)
+        if offset is None:
+            break
+    vectors = np.asarray(vectors[:count], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def wait_for_index(client: QdrantClient, collection: str, timeout: float = 1800) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(collection)
+        if info.status == models.CollectionStatus.GREEN and info.optimizer_status == models.OptimizersStatusOneOf.OK:
+            return
+        time.sleep(2)
+    raise TimeoutError(f"{collection} was not indexed within {timeout}s")
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_BENCH_URL", "http://localhost:6333"))
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--profiles", nargs="+", default=list(COLLECTION_PROFILES))
+    parser.add_argument("--source-collection", help="copy vectors from this collection instead of generating them")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections afterwards")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, timeout=300)
+    if args.source_collection:
+        data = source_vectors(client, args.source_collection, args.points + args.queries)
+    else:
+        data = synthetic_vectors(args.points + args.queries, args.clusters)
+    vectors, queries = data[:args.points], data[args.points:]
+
+    # Exact neighbours by brute force (vectors are unit length, so dot = cosine)
+    truth = [set(np.argsort(-(vectors @ query))[:args.top_k].tolist()) for query in queries]
+
+    print(f"{len(vectors)} points, {len(queries)} queries, recall@{args.top_k}")
+    print(f"{'profile':<10} {'load s':>8} {'index s':>8} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles:
+        collection = f"bench_profile_{profile}"
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        client.create_collection(collection_name=collection, **collection_params(profile))
+
+        started = time.monotonic()
+        for i in range(0, len(vectors), 1000):
+            batch = vectors[i:i + 1000]
+            client.upsert(collection, points=models.Batch(ids=list(range(i, i + len(batch))), vectors=batch.tolist()), wait=True)
+        loaded = time.monotonic()
+        wait_for_index(client, collection)
+        indexed = time.monotonic()
+
+        params = search_params(profile)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = client.query_points(collection, query=query.tolist(), limit=args.top_k, search_params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(expected & {point.id for point in result.points}) / args.top_k)
+
+        print(
+            f"{profile:<10} {loaded - started:>8.1f} {indexed - loaded:>8.1f} {np.mean(recalls):>8.3f} "
+            f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}"
+        )
+        if not args.keep:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Synthetic repositories for the end-to-end benchmark.
+
+generate_repo() writes a deterministic tree of source files in several
+languages, with functions that call each other across files (so the graph
+has CALLS edges to resolve), a little junk the scanner should skip
+(node_modules, a .gitignore'd build directory, a minified bundle) and a
+README. questions() derives /api/ask questions from the generated names.
+
+    python benchmarks/synthetic_repo.py /tmp/synthetic --files 500
+"""
+import argparse
+import os
+import random
+
+LANGUAGES = ("python", "javascript", "typescript", "go", "java", "rust")
+
+EXTENSIONS = {
+    "python": "py",
+    "javascript": "js",
+    "typescript": "ts",
+    "go": "go",
+    "java": "java",
+    "rust": "rs",
+}
+
+# files per repo for --size
+SIZES = {
+    "small": 200,
+    "medium": 2000,
+    "large": 10000,
+}
+
+WORDS = (
+    "user", "order", "invoice", "session", "token", "cache", "queue", "report", "payment", "account",
+    "profile", "config", "event", "message", "record", "index", "schema", "batch", "stream", "request",
+)
+VERBS = ("get", "load", "save", "update", "validate", "parse", "build", "render", "sync", "resolve")
+
+
+def _name(rng: random.Random, i: int) -> tuple[str, str]:
+    """(snake_case, camelCase) spellings of the i-th function name"""
+    verb, noun, other = rng.choice(VERBS), rng.choice(WORDS), rng.choice(WORDS)
+    return f"{verb}_{noun}_{other}_{i}", f"{verb}{noun.title()}{other.title()}{i}"
+
+
+def _body(rng: random.Random, language: str, callees: list[str], lines: int) -> list[str]:
+    statements = []
+    for j in range(lines):
+        word = rng.choice(WORDS)
+        if language == "python":
+            statements.append(f"{word}_{j} = len(str({rng.randint(0, 999)})) + {j}")
+        elif language == "go":
+            statements.append(f"{word}{j} := {rng.randint(0, 999)} + {j}")
+            statements.append(f"_ = {word}{j}")
+        elif language == "rust":
+            statements.append(f"let _{word}_{j} = {rng.randint(0, 999)} + {j};")
+        elif language == "java":
+            statements.append(f"int {word}{j} = {rng.randint(0, 999)} + {j};")
+        else:
+            statements.append(f"const {word}{j} = {rng.randint(0, 999)} + {j};")
+    for callee in callees:
+        statements.append(f"{callee}()" + ("" if language in ("python", "go") else ";"))
+    return statements
+
+
+def render_file(rng: random.Random, language: str, module: str, functions: list[str], callees: dict, lines: int) -> str:
+    """Source text for one file defining `functions`; callees maps function -> names it calls"""
+    class_name = "".join(part.title() for part in module.split("_"))
+    out = []
+    if language == "python":
+        out.append(f'"""Synthetic module {module}."""\n')
+        out.append(f"class {class_name}:")
+        out.append(f'    """Holds state for {module}."""\n')
+        out.append("    def __init__(self):")
+        out.append("        self.items = []\n")
+        for name in functions:
+            out.append(f"\ndef {name}():")
+            out.append(f'    """{name.replace("_", " ")}"""')
+            out.extend(f"    {line}" for line in _body(rng, language, callees[name], lines))
+            out.append("    return None")
+    elif language in ("javascript", "typescript"):
+        ret = ": number" if language == "typescript" else ""
+        out.append(f"// Synthetic module {module}\n")
+        out.append(f"export class {class_name} {{")
+        out.append("  constructor() {")
+        out.append("    this.items = [];")
+        out.append("  }")
+        out.append("}")
+        for name in functions:
+            out.append(f"\nexport function {name}(){ret} {{")
+            out.extend(f"  {line}" for line in _body(rng, language, callees[name], lines))
+            out.append("  return 0;")
+            out.append("}")
+    elif language == "go":
+        out.append(f"// Package {module} is synthetic.")
+        out.append(f"package {module}\n")
+        out.append(f"type {class_name} struct {{")
+        out.append("\tItems []string")
+        out.append("}")
+        for name in functions:
+            out.append(f"\nfunc {name}() int {{")
+            out.extend(f"\t{line}" for line in _body(rng, language, callees[name], lines))
+            out.append("\treturn 0")
+            out.append("}")
+    elif language == "java":
+        out.append(f"// Synthetic module {module}")
+        out.append(f"public class {class_name} {{")
+        for name in functions:
+            out.append(f"\n    public static int {name}() {{")
+            out.extend(f"        {line}" for line in _body(rng, language, callees[name], lines))
+            out.append("        return 0;")
+            out.append("    }")
+        out.append("}")
+    elif language == "rust":
+        out.append(f"//! Synthetic module {module}\n")
+        out.append(f"pub struct {class_name} {{")
+        out.append("    items: Vec<String>,")
+        out.append("}")
+        for name in functions:
+            out.append(f"\npub fn {name}() -> i32 {{")
+            out.extend(f"    {line}" for line in _body(rng, language, callees[name], lines))
+            out.append("    0")
+            out.append("}")
+    return "\n".join(out) + "\n"
+
+
+def generate_repo(
+    root: str,
+    files: int,
+    languages: tuple[str, ...] = LANGUAGES,
+    functions_per_file: int = 6,
+    calls_per_function: int = 3,
+    lines_per_function: int = 12,
+    seed: int = 0,
+) -> dict:
+    """
+    Write a synthetic repo under root and return a summary with the source
+    file count, total bytes and the generated function names by language.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+
+    # Name every function up front so calls can point at any file
+    plan = []
+    names = {language: [] for language in languages}
+    counter = 0
+    for i in range(files):
+        language = languages[i % len(languages)]
+        package = f"pkg_{i % 50}"
+        module = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}"
+        functions = []
+        for _ in range(functions_per_file):
+            snake, camel = _name(rng, counter)
+            counter += 1
+            functions.append(camel if language in ("javascript", "typescript", "java") else snake)
+        plan.append((language, package, module, functions))
+        names[language].extend(functions)
+
+    total_bytes = 0
+    for language, package, module, functions in plan:
+        # Calls stay within a language, which is what the extractors resolve
+        pool = names[language]
+        callees = {name: rng.sample(pool, min(calls_per_function, len(pool))) for name in functions}
+        content = render_file(rng, language, module, functions, callees, lines_per_function)
+        directory = os.path.join(root, language, package)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{module}.{EXTENSIONS[language]}"), "w") as f:
+            f.write(content)
+        total_bytes += len(content.encode())
+
+    # Things the scanner is expected to skip
+    for junk_dir in ("node_modules/left-pad", "build"):
+        os.makedirs(os.path.join(root, junk_dir), exist_ok=True)
+        with open(os.path.join(root, junk_dir, "index.js"), "w") as f:
+            f.write("module.exports = function () { return 0; };\n")
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n*.log\n")
+    with open(os.path.join(root, "app.min.js"), "w") as f:
+        f.write("var a=" + ",".join(str(n) for n in range(5000)) + ";\n")
+    with open(os.path.join(root, "README.md"), "w") as f:
+        f.write(f"# Synthetic repo\n\n{files} files in {', '.join(languages)}.\n")
+
+    return {"files": files, "bytes": total_bytes, "names": names}
+
+
+def questions(names: dict, count: int, seed: int = 1) -> list[str]:
+    """Distinct questions about generated functions, mixing lexical and vague phrasings"""
+    rng = random.Random(seed)
+    pool = [name for language_names in names.values() for name in language_names]
+    templates = (
+        "What does {name} do?",
+        "Where is {name} called from?",
+        "How does the {word} handling in {name} work?",
+        "Which files deal with {word} {other}?",
+        "Explain how {word} is validated before it is saved",
+    )
+    out = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        out.append(template.format(name=rng.choice(pool), word=rng.choice(WORDS), other=rng.choice(WORDS)) + f" ({i})")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=SIZES["small"])
+    parser.add_argument("--languages", default=",".join(LANGUAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate_repo(args.root, args.files, tuple(args.languages.split(",")), seed=args.seed)
+    print(f"Wrote {summary['files']} files ({summary['bytes']:,} bytes) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
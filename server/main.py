@@ -1,9 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware 
-from app.routes.ask import router as ask_router
+from app.routes.ask import router as ask_router, get_answer_model
 from app.routes.delete import router as delete_router
 from app.routes.analyze import router as analyze_router
+from app.routes.jobs import router as jobs_router
+from app.routes.metrics import router as metrics_router
+from app.config import neo4j_driver
+from app.services.graph import ensure_graph_schema
 import uvicorn
+import asyncio
 import logging
 
 # Configure logging
@@ -18,6 +23,15 @@ app = FastAPI(title="Codebase Intelligence Platform")
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+@app.on_event("startup")
+async def bootstrap_graph_schema():
+    # In the background, so a slow or unreachable Neo4j doesn't hold up startup
+    app.state.graph_schema = asyncio.create_task(asyncio.to_thread(ensure_graph_schema, neo4j_driver))
+
+@app.on_event("startup")
+def create_answer_model():
+    get_answer_model()
+
 @app.get("/api/health")
 async def health():
     return {"status": "healthy", "mode": "modular"}
@@ -26,6 +40,8 @@ async def health():
 app.include_router(analyze_router, prefix="/api")
 app.include_router(ask_router, prefix="/api")
 app.include_router(delete_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,139 @@
+"""
+Move repos from per-repo Qdrant collections into the shared collection.
+
+Copies every point of each repo_<id> collection into QDRANT_SHARED_COLLECTION
+with its vector and payload (no re-embedding), under the repo-scoped point
+IDs ingestion uses, and rewrites the IDs kept in the repo's manifest and
+lexical index to match. The repo row then points at the shared collection
+and the old collection is dropped:
+
+    QDRANT_STORAGE_MODE=shared python migrate_collections.py            # every ready repo
+    QDRANT_STORAGE_MODE=shared python migrate_collections.py <repo_id>  # just these
+    python migrate_collections.py --dry-run
+
+Set QDRANT_STORAGE_MODE=shared for the API and workers as well, or the next
+analysis moves the repo back. Going the other way needs no script: with
+QDRANT_STORAGE_MODE=per_repo, re-analyzing a repo rebuilds its own collection
+and removes its points from the shared one.
+"""
+from app.config import qdrant, supabase, qdrant_shared_collection
+from app.services.vector import point_id, ensure_shared_collection, set_collection_profile, shared_collection_profile, is_shared
+from app.services.manifest import load_manifest, save_manifest
+from app.services.lexical_index import lexical_index
+from app.services.index_version import bump_index_version
+from app.services.repo_cache import repo_cache
+from app.services.jobs import job_queue, ACTIVE_STATUSES
+from qdrant_client.http.models import PointStruct
+import argparse
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("migrate_collections")
+
+SCROLL_BATCH = 256
+
+
+def shared_point_id(repo_id: str, payload: dict) -> str:
+    index = "FULL" if payload.get("type") == "full_file" else payload["chunk_index"]
+    return point_id(repo_id, payload["file_path"], index)
+
+
+def migrate_repo(repo_id: str, collection_name: str, profile_name: str, keep_old: bool = False) -> int:
+    """Copy one repo's points into the shared collection and return how many moved"""
+    moved, offset = 0, None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name, limit=SCROLL_BATCH, offset=offset, with_vectors=True, with_payload=True
+        )
+        if points:
+            qdrant.upsert(qdrant_shared_collection, wait=True, points=[
+                PointStruct(
+                    id=shared_point_id(repo_id, point.payload),
+                    vector=point.vector,
+                    payload={**point.payload, "repo_id": repo_id},
+                )
+                for point in points
+            ])
+            moved += len(points)
+        if offset is None:
+            break
+
+    # Manifest point lists are the file's chunks in order, then its full-file point
+    manifest = load_manifest(repo_id)
+    for rel, entry in manifest["files"].items():
+        chunk_count = len(entry["points"]) - 1
+        entry["points"] = [point_id(repo_id, rel, i) for i in range(chunk_count)] + [point_id(repo_id, rel, "FULL")]
+    save_manifest(repo_id, manifest)
+    lexical_index.rewrite_point_ids(repo_id, lambda payload: shared_point_id(repo_id, payload))
+
+    # The shared collection's profile, not the configured one, so re-analysis
+    # and searches agree with the collection the points are in
+    set_collection_profile(repo_id, profile_name)
+    repo_cache.update(repo_id, {"qdrant_collection": qdrant_shared_collection})
+    bump_index_version(repo_id)
+
+    if not keep_old:
+        qdrant.delete_collection(collection_name)
+    logger.info(f"Moved {moved} points of repo {repo_id} from {collection_name} to {qdrant_shared_collection}")
+    return moved
+
+
+def active_job(repo_id: str) -> dict | None:
+    """A queued or running ingest or delete job for the repo, if any"""
+    for kind in ("ingest", "delete"):
+        job = job_queue.latest_for_repo(repo_id, kind)
+        if job is not None and job["status"] in ACTIVE_STATUSES:
+            return job
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo_ids", nargs="*", help="repos to migrate (default: all ready repos)")
+    parser.add_argument("--keep-old", action="store_true", help="don't drop the per-repo collections")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be migrated")
+    args = parser.parse_args()
+
+    query = supabase.table("repos").select("id, status, qdrant_collection")
+    if args.repo_ids:
+        query = query.in_("id", args.repo_ids)
+    repos = [repo for repo in query.execute().data if repo.get("qdrant_collection") and not is_shared(repo["qdrant_collection"])]
+
+    profile_name = None
+    if not args.dry_run:
+        ensure_shared_collection(qdrant)
+        profile_name = shared_collection_profile(qdrant)
+        if profile_name is None:
+            raise SystemExit(f"Can't tell which collection profile {qdrant_shared_collection} was created with")
+        logger.info(f"Shared collection {qdrant_shared_collection} uses profile {profile_name}")
+
+    total, migrated = 0, 0
+    for repo in repos:
+        repo_id, collection_name = str(repo["id"]), repo["qdrant_collection"]
+        if repo["status"] != "ready":
+            # An ingestion or deletion is writing to it; run again once it's done
+            logger.warning(f"Skipping repo {repo_id}: status is {repo['status']}")
+            continue
+        # Incremental re-indexes keep the status "ready", so check the job queue as well
+        job = active_job(repo_id)
+        if job is not None:
+            logger.warning(f"Skipping repo {repo_id}: {job['kind']} job {job['id']} is {job['status']}")
+            continue
+        if not qdrant.collection_exists(collection_name):
+            logger.warning(f"Skipping repo {repo_id}: collection {collection_name} does not exist")
+            continue
+        if args.dry_run:
+            count = qdrant.count(collection_name, exact=True).count
+            logger.info(f"Would move {count} points of repo {repo_id} from {collection_name}")
+            continue
+        total += migrate_repo(repo_id, collection_name, profile_name, keep_old=args.keep_old)
+        migrated += 1
+
+    logger.info(f"Migrated {migrated} of {len(repos)} repos, {total} points")
+
+
+if __name__ == "__main__":
+    main()
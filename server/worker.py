@@ -0,0 +1,36 @@
+"""
+Ingestion worker pool.
+
+Runs jobs queued by the API (/api/analyze) in separate processes so their
+blocking client calls never stall the API event loop:
+
+    python worker.py            # JOB_WORKERS processes
+    python worker.py 4          # 4 processes
+"""
+from app.config import job_workers
+from app.services.worker import run_worker
+import asyncio
+import logging
+import multiprocessing
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(processName)s - %(levelname)s - %(message)s'
+)
+
+
+def worker_main():
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else job_workers
+    if count <= 1:
+        worker_main()
+    else:
+        processes = [multiprocessing.Process(target=worker_main, name=f"worker-{i}") for i in range(count)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()